@@ -0,0 +1,12 @@
+from django.db.models.signals import m2m_changed
+from django.dispatch import receiver
+
+from .models import Role
+from .utils import invalidate_role_visibility
+
+
+@receiver(m2m_changed, sender=Role.can_view_clients.through)
+@receiver(m2m_changed, sender=Role.can_view_sites.through)
+def handle_role_visibility(sender, action: str, **kwargs):
+    if action in ("post_add", "post_remove", "post_clear"):
+        invalidate_role_visibility()
@@ -1,11 +1,20 @@
 from unittest.mock import patch
 
+from django.core.cache import cache
 from django.test import override_settings
 from model_bakery import baker, seq
 
 from accounts.models import APIKey, User
 from accounts.serializers import APIKeySerializer
+from accounts.utils import get_role_visibility
+from agents.models import Agent
+from clients.models import Client
 from tacticalrmm.constants import AgentDblClick, AgentTableTabs, ClientTreeSort
+from tacticalrmm.permissions import (
+    _has_perm_on_agent,
+    _has_perm_on_client,
+    _has_perm_on_site,
+)
 from tacticalrmm.test import TacticalTestCase
 
 
@@ -432,3 +441,79 @@ class TestAPIAuthentication(TacticalTestCase):
         self.client.credentials(HTTP_X_API_KEY="123456")
         r = self.client.get(url, format="json")
         self.assertEqual(r.status_code, 200)
+
+
+LOCMEM_CACHE = {"default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}}
+
+
+@override_settings(CACHES=LOCMEM_CACHE)
+class TestRoleVisibility(TacticalTestCase):
+    def setUp(self):
+        self.setup_coresettings()
+        cache.clear()
+
+        self.client1, self.client2 = baker.make("clients.Client", _quantity=2)
+        self.site1 = baker.make("clients.Site", client=self.client1)
+        self.site2 = baker.make("clients.Site", client=self.client2)
+        self.site3 = baker.make("clients.Site", client=self.client2)
+        self.role = baker.make("accounts.Role")
+
+    def test_visibility_is_cached(self):
+        self.role.can_view_clients.set([self.client1])
+        self.role.can_view_sites.set([self.site2])
+
+        visibility = get_role_visibility(self.role)
+        self.assertEqual(visibility.client_ids, {self.client1.pk})
+        self.assertEqual(visibility.site_ids, {self.site2.pk})
+        self.assertEqual(visibility.site_client_ids, {self.client2.pk})
+        self.assertEqual(visibility.all_site_ids, {self.site1.pk, self.site2.pk})
+        self.assertFalse(visibility.unrestricted)
+
+        with self.assertNumQueries(0):
+            self.assertEqual(get_role_visibility(self.role), visibility)
+
+    def test_visibility_invalidation(self):
+        self.assertTrue(get_role_visibility(self.role).unrestricted)
+
+        self.role.can_view_clients.add(self.client1)
+        self.assertEqual(get_role_visibility(self.role).all_site_ids, {self.site1.pk})
+
+        # new sites of a viewable client are visible
+        site4 = baker.make("clients.Site", client=self.client1)
+        self.assertEqual(
+            get_role_visibility(self.role).all_site_ids, {self.site1.pk, site4.pk}
+        )
+
+        # moving a site to another client
+        site4.client = self.client2
+        site4.save()
+        self.assertEqual(get_role_visibility(self.role).all_site_ids, {self.site1.pk})
+
+        self.role.can_view_clients.clear()
+        self.assertTrue(get_role_visibility(self.role).unrestricted)
+
+    def test_object_permissions(self):
+        user = baker.make("accounts.User", role=self.role)
+        agent1 = baker.make_recipe("agents.agent", site=self.site1)
+        agent2 = baker.make_recipe("agents.agent", site=self.site2)
+        self.role.can_view_sites.add(self.site1)
+
+        self.assertTrue(_has_perm_on_agent(user, agent1.agent_id))
+        self.assertFalse(_has_perm_on_agent(user, agent2.agent_id))
+        self.assertTrue(_has_perm_on_site(user, self.site1.pk))
+        self.assertFalse(_has_perm_on_site(user, self.site2.pk))
+        # roles limited to sites don't limit clients
+        self.assertTrue(_has_perm_on_client(user, self.client2.pk))
+
+        self.role.can_view_clients.add(self.client2)
+        self.assertTrue(_has_perm_on_agent(user, agent2.agent_id))
+        self.assertTrue(_has_perm_on_site(user, self.site3.pk))
+        self.assertFalse(_has_perm_on_client(user, self.client1.pk))
+
+        self.assertEqual(
+            set(Agent.objects.filter_by_role(user)), {agent1, agent2}  # type: ignore
+        )
+        self.assertEqual(
+            set(Client.objects.filter_by_role(user)),  # type: ignore
+            {self.client1, self.client2},
+        )
@@ -1,11 +1,19 @@
+import dataclasses
+import uuid
 from typing import TYPE_CHECKING
 
 from django.conf import settings
+from django.core.cache import cache
+
+from tacticalrmm.constants import (
+    ROLE_VISIBILITY_CACHE_PREFIX,
+    ROLE_VISIBILITY_VERSION_KEY,
+)
 
 if TYPE_CHECKING:
     from django.http import HttpRequest
 
-    from accounts.models import User
+    from accounts.models import Role, User
 
 
 def is_root_user(*, request: "HttpRequest", user: "User") -> bool:
@@ -22,3 +30,67 @@ def is_root_user(*, request: "HttpRequest", user: "User") -> bool:
 
 def is_superuser(user: "User") -> bool:
     return user.role and getattr(user.role, "is_superuser")
+
+
+@dataclasses.dataclass(frozen=True)
+class RoleVisibility:
+    # clients and sites picked in the role
+    client_ids: frozenset[int]
+    site_ids: frozenset[int]
+    # clients of the picked sites
+    site_client_ids: frozenset[int]
+    # picked sites plus every site of the picked clients
+    all_site_ids: frozenset[int]
+
+    @property
+    def unrestricted(self) -> bool:
+        return not self.client_ids and not self.site_ids
+
+
+def invalidate_role_visibility() -> str:
+    # a new version orphans every cached visibility, they expire on their own
+    version = uuid.uuid4().hex
+    cache.set(ROLE_VISIBILITY_VERSION_KEY, version, None)
+    return version
+
+
+def get_role_visibility(role: "Role") -> RoleVisibility:
+    from accounts.models import Role
+    from clients.models import Site
+
+    version = cache.get(ROLE_VISIBILITY_VERSION_KEY) or invalidate_role_visibility()
+    cache_key = f"{ROLE_VISIBILITY_CACHE_PREFIX}{role.pk}_{version}"
+
+    visibility = cache.get(cache_key)
+    if isinstance(visibility, RoleVisibility):
+        return visibility
+
+    client_ids = frozenset(
+        Role.can_view_clients.through.objects.filter(role_id=role.pk).values_list(
+            "client_id", flat=True
+        )
+    )
+    site_ids = frozenset(
+        Role.can_view_sites.through.objects.filter(role_id=role.pk).values_list(
+            "site_id", flat=True
+        )
+    )
+
+    sites = (
+        Site.objects.filter(pk__in=site_ids)
+        | Site.objects.filter(client_id__in=client_ids)
+        if client_ids or site_ids
+        else Site.objects.none()
+    )
+    site_clients = dict(sites.values_list("pk", "client_id"))
+
+    visibility = RoleVisibility(
+        client_ids=client_ids,
+        site_ids=site_ids,
+        site_client_ids=frozenset(
+            site_clients[pk] for pk in site_ids if pk in site_clients
+        ),
+        all_site_ids=frozenset(site_clients),
+    )
+    cache.set(cache_key, visibility, 600)
+    return visibility
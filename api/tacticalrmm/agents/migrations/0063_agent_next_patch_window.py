@@ -0,0 +1,18 @@
+# Generated by Django 4.2.30 on 2026-10-18 21:49
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("agents", "0062_agent_default_shell_agent_default_shell_custom"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="agent",
+            name="next_patch_window",
+            field=models.DateTimeField(blank=True, db_index=True, null=True),
+        ),
+    ]
@@ -1,13 +1,11 @@
 import asyncio
 import logging
 import random
-import re
-from collections import Counter
+from collections import defaultdict
 from contextlib import suppress
 from typing import TYPE_CHECKING, Any, Dict, List, Optional, Sequence, Union, cast
 
 import msgpack
-import nats
 import validators
 from channels.layers import get_channel_layer
 from django.conf import settings
@@ -17,7 +15,6 @@ from django.db import models
 from django.utils import timezone as djangotime
 from nats.errors import TimeoutError
 from packaging import version as pyver
-from packaging.version import Version as LooseVersion
 
 from agents.utils import (
     calculate_agent_checks,
@@ -48,14 +45,18 @@ from tacticalrmm.constants import (
     PAStatus,
     TerminalShellChoices,
 )
-from tacticalrmm.helpers import has_script_actions, has_webhook, setup_nats_options
+from tacticalrmm.exceptions import NatsDown
+from tacticalrmm.helpers import has_script_actions, has_webhook
 from tacticalrmm.models import PermissionQuerySet
+from tacticalrmm.nats_utils import nats_pool
 
 if TYPE_CHECKING:
+    from nats.aio.client import Client as NClient
+
     from alerts.models import Alert, AlertTemplate
     from automation.models import Policy
-    from autotasks.models import AutomatedTask
-    from checks.models import Check
+    from autotasks.models import AutomatedTask, TaskResult
+    from checks.models import Check, CheckResult
     from clients.models import Client
     from winupdate.models import WinUpdatePolicy
 
@@ -106,6 +107,8 @@ class Agent(BaseAuditModel):
     choco_installed = models.BooleanField(default=False)
     wmi_detail = models.JSONField(null=True, blank=True)
     patches_last_installed = models.DateTimeField(null=True, blank=True)
+    # start of the next patch window, see check_agent_update_schedule_task
+    next_patch_window = models.DateTimeField(null=True, blank=True, db_index=True)
     time_zone = models.CharField(
         max_length=255, choices=TZ_CHOICES, null=True, blank=True
     )
@@ -165,6 +168,24 @@ class Agent(BaseAuditModel):
                 self.set_alert_template()
                 self._processing_set_alert_template = False
 
+            if self.time_zone != orig.time_zone:
+                self.taskresults.update(next_run=None)
+
+            # the patch schedule is recomputed by check_agent_update_schedule_task
+            if (
+                mon_type_changed
+                or site_changed
+                or policy_changed
+                or block_inherit
+                or self.time_zone != orig.time_zone
+            ):
+                self.next_patch_window = None
+                if kwargs.get("update_fields") is not None:
+                    kwargs["update_fields"] = {
+                        *kwargs["update_fields"],
+                        "next_patch_window",
+                    }
+
         super().save(*args, **kwargs)
 
     @property
@@ -560,81 +581,73 @@ class Agent(BaseAuditModel):
         tasks = list(self.autotasks.all()) + self.get_tasks_from_policies()
         return self.add_task_results(tasks)
 
-    def add_task_results(self, tasks: "List[AutomatedTask]") -> "List[AutomatedTask]":
-        results = self.taskresults.all()  # type: ignore
+    def get_task_results_index(self) -> "Dict[int, TaskResult]":
+        return {result.task_id: result for result in self.taskresults.all()}  # type: ignore
+
+    def get_check_results_index(self) -> "Dict[int, CheckResult]":
+        return {
+            result.assigned_check_id: result
+            for result in self.checkresults.all()  # type: ignore
+        }
+
+    def add_task_results(
+        self,
+        tasks: "List[AutomatedTask]",
+        results: "Optional[Dict[int, TaskResult]]" = None,
+    ) -> "List[AutomatedTask]":
+        if results is None:
+            results = self.get_task_results_index()
 
         for task in tasks:
-            for result in results:
-                if result.task.id == task.pk:
-                    task.task_result = result
-                    break
+            if task.pk in results:
+                task.task_result = results[task.pk]
 
         return tasks
 
-    def add_check_results(self, checks: "List[Check]") -> "List[Check]":
-        results = self.checkresults.all()  # type: ignore
+    def add_check_results(
+        self,
+        checks: "List[Check]",
+        results: "Optional[Dict[int, CheckResult]]" = None,
+    ) -> "List[Check]":
+        if results is None:
+            results = self.get_check_results_index()
 
         for check in checks:
-            for result in results:
-                if result.assigned_check.id == check.pk:
-                    check.check_result = result
-                    break
+            if check.pk in results:
+                check.check_result = results[check.pk]
 
         return checks
 
+    def get_agent_policy_ids(self) -> "Dict[str, Optional[int]]":
+        from automation.utils import resolve_agent_policy_ids
+
+        return resolve_agent_policy_ids(self)
+
     def get_agent_policies(self) -> "Dict[str, Optional[Policy]]":
+        from automation.models import Policy
         from checks.models import Check
 
-        site_policy = getattr(self.site, f"{self.monitoring_type}_policy", None)
-        client_policy = getattr(self.client, f"{self.monitoring_type}_policy", None)
-        default_policy = getattr(
-            get_core_settings(), f"{self.monitoring_type}_policy", None
-        )
+        policy_ids = self.get_agent_policy_ids()
 
-        # prefetch excluded objects on polices only if policy is not Non
-        models.prefetch_related_objects(
-            [
-                policy
-                for policy in (self.policy, site_policy, client_policy, default_policy)
-                if policy
-            ],
-            "excluded_agents",
-            "excluded_sites",
-            "excluded_clients",
-            models.Prefetch(
-                "policychecks", queryset=Check.objects.select_related("script")
-            ),
-            "autotasks",
+        pks = {pk for pk in policy_ids.values() if pk}
+        policies = (
+            Policy.objects.select_related("alert_template")
+            .prefetch_related(
+                models.Prefetch(
+                    "policychecks", queryset=Check.objects.select_related("script")
+                ),
+                "autotasks",
+            )
+            .in_bulk(pks)
+            if pks
+            else {}
         )
 
-        return {
-            "agent_policy": (
-                self.policy
-                if self.policy and not self.policy.is_agent_excluded(self)
-                else None
-            ),
-            "site_policy": (
-                site_policy
-                if (site_policy and not site_policy.is_agent_excluded(self))
-                and not self.block_policy_inheritance
-                else None
-            ),
-            "client_policy": (
-                client_policy
-                if (client_policy and not client_policy.is_agent_excluded(self))
-                and not self.block_policy_inheritance
-                and not self.site.block_policy_inheritance
-                else None
-            ),
-            "default_policy": (
-                default_policy
-                if (default_policy and not default_policy.is_agent_excluded(self))
-                and not self.block_policy_inheritance
-                and not self.site.block_policy_inheritance
-                and not self.client.block_policy_inheritance
-                else None
-            ),
-        }
+        return {key: policies.get(pk) if pk else None for key, pk in policy_ids.items()}
+
+    def get_policies_cache_key(self) -> str:
+        # agents resolving to the same policies share the same cache entries
+        return "_".join(str(pk or 0) for pk in self.get_agent_policy_ids().values())
 
     def check_run_interval(self) -> int:
         interval = self.check_interval
@@ -741,6 +754,7 @@ class Agent(BaseAuditModel):
     # returns agent policy merged with a client or site specific policy
     def get_patch_policy(self) -> "WinUpdatePolicy":
         from winupdate.models import WinUpdatePolicy
+        from winupdate.utils import merge_patch_policy
 
         # check if site has a patch policy and if so use it
         patch_policy = None
@@ -759,40 +773,7 @@ class Agent(BaseAuditModel):
                 patch_policy = policy.winupdatepolicy.first()
                 break
 
-        # if policy still doesn't exist return the agent patch policy
-        if not patch_policy:
-            return agent_policy
-
-        # patch policy exists. check if any agent settings are set to override patch policy
-        if agent_policy.critical != "inherit":
-            patch_policy.critical = agent_policy.critical
-
-        if agent_policy.important != "inherit":
-            patch_policy.important = agent_policy.important
-
-        if agent_policy.moderate != "inherit":
-            patch_policy.moderate = agent_policy.moderate
-
-        if agent_policy.low != "inherit":
-            patch_policy.low = agent_policy.low
-
-        if agent_policy.other != "inherit":
-            patch_policy.other = agent_policy.other
-
-        if agent_policy.run_time_frequency != "inherit":
-            patch_policy.run_time_frequency = agent_policy.run_time_frequency
-            patch_policy.run_time_hour = agent_policy.run_time_hour
-            patch_policy.run_time_days = agent_policy.run_time_days
-
-        if agent_policy.reboot_after_install != "inherit":
-            patch_policy.reboot_after_install = agent_policy.reboot_after_install
-
-        if not agent_policy.reprocess_failed_inherit:
-            patch_policy.reprocess_failed = agent_policy.reprocess_failed
-            patch_policy.reprocess_failed_times = agent_policy.reprocess_failed_times
-            patch_policy.email_if_fail = agent_policy.email_if_fail
-
-        return patch_policy
+        return merge_patch_policy(agent_policy, patch_policy)
 
     def get_approved_update_guids(self) -> list[str]:
         return list(
@@ -869,15 +850,13 @@ class Agent(BaseAuditModel):
     def get_checks_from_policies(self) -> "List[Check]":
         from automation.models import Policy
 
-        # check if agent is blocking inheritance
-        if self.block_policy_inheritance or self.agentchecks.exists():
-            cache_key = f"agent_{self.agent_id}_checks"
-
-        elif self.policy:
-            cache_key = f"site_{self.monitoring_type}_{self.plat}_{self.site_id}_policy_{self.policy_id}_checks"
+        policies_key = self.get_policies_cache_key()
 
+        # agent checks can override policy checks
+        if self.agentchecks.exists():
+            cache_key = f"agent_{self.agent_id}_{policies_key}_checks"
         else:
-            cache_key = f"site_{self.monitoring_type}_{self.plat}_{self.site_id}_checks"
+            cache_key = f"site_{self.monitoring_type}_{self.plat}_policies_{policies_key}_checks"
 
         cached_checks = cache.get(cache_key)
         if isinstance(cached_checks, list):
@@ -894,15 +873,7 @@ class Agent(BaseAuditModel):
     def get_tasks_from_policies(self) -> "List[AutomatedTask]":
         from automation.models import Policy
 
-        # check if agent is blocking inheritance
-        if self.block_policy_inheritance:
-            cache_key = f"agent_{self.agent_id}_tasks"
-
-        elif self.policy:
-            cache_key = f"site_{self.monitoring_type}_{self.plat}_{self.site_id}_policy_{self.policy_id}_tasks"
-
-        else:
-            cache_key = f"site_{self.monitoring_type}_{self.plat}_{self.site_id}_tasks"
+        cache_key = f"site_{self.monitoring_type}_{self.plat}_policies_{self.get_policies_cache_key()}_tasks"
 
         cached_tasks = cache.get(cache_key)
         if isinstance(cached_tasks, list):
@@ -916,32 +887,29 @@ class Agent(BaseAuditModel):
     async def nats_cmd(
         self, data: Dict[Any, Any], timeout: int = 30, wait: bool = True
     ) -> Any:
-        opts = setup_nats_options()
-        try:
-            nc = await nats.connect(**opts)
-        except:
-            return "natsdown"
+        async def _cmd(nc: "NClient") -> Any:
+            if not wait:
+                await nc.publish(self.agent_id, msgpack.dumps(data))
+                await nc.flush()
+                return None
 
-        if wait:
             try:
                 msg = await nc.request(
                     self.agent_id, msgpack.dumps(data), timeout=timeout
                 )
             except TimeoutError:
-                ret = "timeout"
-            else:
-                try:
-                    ret = msgpack.loads(msg.data)
-                except Exception as e:
-                    ret = str(e)
-                    logger.error(e)
+                return "timeout"
 
-            await nc.close()
-            return ret
-        else:
-            await nc.publish(self.agent_id, msgpack.dumps(data))
-            await nc.flush()
-            await nc.close()
+            try:
+                return msgpack.loads(msg.data)
+            except Exception as e:
+                logger.error(e)
+                return str(e)
+
+        try:
+            return await nats_pool.arun(_cmd)
+        except NatsDown:
+            return "natsdown"
 
     async def nats_stream_cmd(
         self,
@@ -959,24 +927,38 @@ class Agent(BaseAuditModel):
           - Structured logging instead of print (4)
           - Accept non-string payloads (dict with {line, done, exit_code}) (5)
           - Include cmd_id in WebSocket messages for frontend filtering (6)
+          - Runs on the pooled NATS connection, messages are handed back to the
+            caller's loop through a queue (7)
+          - Subscription is removed on every exit path, including cancellation,
+            since the pooled connection is never closed (8)
         """
-        opts = setup_nats_options()
         channel_layer = get_channel_layer()
         cmd_id = data.get("payload", {}).get("cmd_id", "")
+        caller_loop = asyncio.get_running_loop()
+        queue: asyncio.Queue = asyncio.Queue()
 
-        try:
-            nc = await nats.connect(**opts)
-        except Exception as e:
-            logger.exception("NATS connect failed for agent %s", self.agent_id)
-            await channel_layer.group_send(
-                group,
-                {
-                    "type": "stream_output",
-                    "cmd_id": cmd_id,
-                    "output": f"[ERROR] Could not connect to NATS: {e}",
-                },
-            )
-            return
+        async def forward(msg) -> None:
+            # runs on the pool's loop
+            caller_loop.call_soon_threadsafe(queue.put_nowait, msg)
+
+        # subscriptions live on the shared connection, so they must be removed
+        # explicitly on every exit path. Only touched from the pool's loop.
+        subs: list = []
+
+        async def unsubscribe(nc: "NClient") -> None:
+            while subs:
+                with suppress(Exception):
+                    await subs.pop().unsubscribe()
+
+        async def subscribe_and_publish(nc: "NClient") -> None:
+            subs.append(await nc.subscribe(output_subject, cb=forward))
+            try:
+                await nc.publish(self.agent_id, msgpack.dumps(data))
+                await nc.flush()
+            except BaseException:
+                # includes cancellation of the caller while publishing
+                await unsubscribe(nc)
+                raise
 
         async def message_handler(msg):
             try:
@@ -1009,30 +991,41 @@ class Agent(BaseAuditModel):
                     },
                 )
 
-        sub = None
+        async def drain() -> None:
+            while (msg := await queue.get()) is not None:
+                await message_handler(msg)
+
+        drain_task = asyncio.create_task(drain())
+        subscribed = True
         try:
-            await nc.publish(self.agent_id, msgpack.dumps(data))
-            await nc.flush()
-            sub = await nc.subscribe(output_subject, cb=message_handler)
-        except Exception as e:
-            logger.exception(
-                "NATS publish/subscribe failed for agent %s", self.agent_id
-            )
-            await channel_layer.group_send(
-                group,
-                {
-                    "type": "stream_output",
-                    "cmd_id": cmd_id,
-                    "output": f"[ERROR] NATS publish/subscribe failed: {e}",
-                },
-            )
             try:
-                await nc.close()
-            except Exception:
-                pass
-            return
+                await nats_pool.arun(subscribe_and_publish)
+            except NatsDown as e:
+                subscribed = False
+                logger.exception("NATS connect failed for agent %s", self.agent_id)
+                await channel_layer.group_send(
+                    group,
+                    {
+                        "type": "stream_output",
+                        "cmd_id": cmd_id,
+                        "output": f"[ERROR] Could not connect to NATS: {e}",
+                    },
+                )
+                return
+            except Exception as e:
+                logger.exception(
+                    "NATS publish/subscribe failed for agent %s", self.agent_id
+                )
+                await channel_layer.group_send(
+                    group,
+                    {
+                        "type": "stream_output",
+                        "cmd_id": cmd_id,
+                        "output": f"[ERROR] NATS publish/subscribe failed: {e}",
+                    },
+                )
+                return
 
-        try:
             if stop_evt is None:
                 await asyncio.sleep(timeout)
             else:
@@ -1044,19 +1037,17 @@ class Agent(BaseAuditModel):
                 for p in pending:
                     p.cancel()
         finally:
+            # shielded so the subscription is still removed when we are being cancelled
             try:
-                if sub is not None:
-                    await sub.unsubscribe()
+                if subscribed:
+                    await asyncio.shield(nats_pool.arun(unsubscribe))
             except Exception:
                 logger.debug(
                     "NATS unsubscribe failed for agent %s", self.agent_id, exc_info=True
                 )
-            try:
-                await nc.close()
-            except Exception:
-                logger.debug(
-                    "NATS close failed for agent %s", self.agent_id, exc_info=True
-                )
+            # deliver whatever arrived before the unsubscribe, then stop
+            queue.put_nowait(None)
+            await drain_task
 
     def recover(
         self, mode: str, mesh_uri: str, wait: bool = True, agent_url: str = ""
@@ -1110,33 +1101,22 @@ class Agent(BaseAuditModel):
         return AgentAuditSerializer(agent).data
 
     def delete_superseded_updates(self) -> None:
+        from winupdate.utils import get_superseded_update_pks
+
         with suppress(Exception):
             pks = []  # list of pks to delete
-            kbs = list(self.winupdates.values_list("kb", flat=True))
-            d = Counter(kbs)
-            dupes = [k for k, v in d.items() if v > 1]
-
-            for dupe in dupes:
-                titles = self.winupdates.filter(kb=dupe).values_list("title", flat=True)
-                # extract the version from the title and sort from oldest to newest
-                # skip if no version info is available therefore nothing to parse
-                try:
-                    matches = r"(Version|Versão)"
-                    pattern = r"\(" + matches + r"(.*?)\)"
-                    vers = [
-                        re.search(pattern, i, flags=re.IGNORECASE).group(2).strip()
-                        for i in titles
-                    ]
-                    sorted_vers = sorted(vers, key=LooseVersion)
-                except:
-                    continue
-                # append all but the latest version to our list of pks to delete
-                for ver in sorted_vers[:-1]:
-                    q = self.winupdates.filter(kb=dupe).filter(title__contains=ver)
-                    pks.append(q.first().pk)
+            updates_by_kb = defaultdict(list)
+            for pk, kb, title in self.winupdates.order_by("pk").values_list(
+                "pk", "kb", "title"
+            ):
+                if kb is not None:
+                    updates_by_kb[kb].append((pk, title))
+
+            for updates in updates_by_kb.values():
+                pks.extend(get_superseded_update_pks(updates))
 
-            pks = list(set(pks))
-            self.winupdates.filter(pk__in=pks).delete()
+            if pks:
+                self.winupdates.filter(pk__in=set(pks)).delete()
 
     def should_create_alert(
         self, alert_template: "Optional[AlertTemplate]" = None
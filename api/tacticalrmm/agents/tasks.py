@@ -3,16 +3,19 @@ from time import sleep
 from typing import TYPE_CHECKING, Optional
 
 from django.conf import settings
+from django.core.cache import cache
 from django.core.management import call_command
 from django.utils import timezone as djangotime
 
 from agents.models import Agent
+from agents.utils import agent_status_q
 from core.utils import get_core_settings
 from logs.models import DebugLog
 from scripts.models import Script
 from tacticalrmm.celery import app
 from tacticalrmm.constants import (
     AGENT_DEFER,
+    AGENT_FAILING_DATA_CACHE_PREFIX,
     AGENT_OUTAGES_LOCK,
     AGENT_STATUS_OVERDUE,
     CheckStatus,
@@ -138,11 +141,27 @@ def agent_outages_task(self) -> str:
             return f"{self.app.oid} still running"
 
         from alerts.models import Alert
-        from core.tasks import _get_agent_qs
-
-        for agent in _get_agent_qs():
-            if agent.status == AGENT_STATUS_OVERDUE:
-                Alert.handle_alert_failure(agent)
+        from core.tasks import update_agent_checks_rollup
+
+        # overdue agents are still handled on every run, not just the newly overdue
+        # ones, since periodic notifications and pending actions depend on it
+        agents = (
+            Agent.objects.defer(*AGENT_DEFER)
+            .select_related("site__client", "alert_template")
+            .filter(agent_status_q(AGENT_STATUS_OVERDUE), maintenance_mode=False)
+        )
+        for agent in agents:
+            Alert.handle_alert_failure(agent)
+
+            # an overdue agent only counts as failing when overdue alerts are enabled
+            if (
+                agent.overdue_email_alert
+                or agent.overdue_text_alert
+                or agent.overdue_dashboard_alert
+            ):
+                failing = cache.get(f"{AGENT_FAILING_DATA_CACHE_PREFIX}{agent.pk}")
+                if not failing or not failing["error"]:
+                    update_agent_checks_rollup(agent.pk)
 
         return "completed"
 
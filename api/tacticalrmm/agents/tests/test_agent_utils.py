@@ -1,8 +1,16 @@
 from unittest.mock import patch
 
 from django.conf import settings
+from django.utils import timezone as djangotime
+from model_bakery import baker
 
-from agents.utils import generate_linux_install, get_agent_url
+from agents.models import Agent
+from agents.utils import agent_status_q, generate_linux_install, get_agent_url
+from tacticalrmm.constants import (
+    AGENT_STATUS_OFFLINE,
+    AGENT_STATUS_ONLINE,
+    AGENT_STATUS_OVERDUE,
+)
 from tacticalrmm.test import TacticalTestCase
 
 
@@ -57,3 +65,38 @@ class TestAgentUtils(TacticalTestCase):
         self.assertIn(r"clientID='1'", ret)
         self.assertIn(r"siteID='1'", ret)
         self.assertIn(r"agentType='server'", ret)
+
+    def test_agent_status_q_matches_status_property(self):
+        now = djangotime.now()
+        baker.make_recipe("agents.online_agent")
+        baker.make_recipe("agents.offline_agent")
+        baker.make_recipe("agents.overdue_agent")
+        baker.make_recipe("agents.agent", last_seen=None)
+        # custom thresholds are read per row
+        baker.make_recipe(
+            "agents.agent",
+            last_seen=now - djangotime.timedelta(minutes=20),
+            offline_time=30,
+            overdue_time=60,
+        )
+        baker.make_recipe(
+            "agents.agent",
+            last_seen=now - djangotime.timedelta(minutes=20),
+            offline_time=5,
+            overdue_time=10,
+        )
+
+        for status in (AGENT_STATUS_ONLINE, AGENT_STATUS_OFFLINE, AGENT_STATUS_OVERDUE):
+            expected = {a.pk for a in Agent.objects.all() if a.status == status}
+            self.assertTrue(expected)
+            self.assertEqual(
+                set(
+                    Agent.objects.filter(agent_status_q(status)).values_list(
+                        "pk", flat=True
+                    )
+                ),
+                expected,
+            )
+
+        with self.assertRaises(ValueError):
+            agent_status_q("invalid")
@@ -1,5 +1,6 @@
 import json
 import os
+import time
 from itertools import cycle
 from typing import TYPE_CHECKING
 from unittest.mock import PropertyMock, patch
@@ -7,7 +8,7 @@ from zoneinfo import ZoneInfo
 
 from django.conf import settings
 from django.utils import timezone as djangotime
-from model_bakery import baker
+from model_bakery import baker, seq
 
 from agents.models import Agent, AgentCustomField, AgentHistory, Note
 from agents.serializers import (
@@ -16,6 +17,8 @@ from agents.serializers import (
     AgentNoteSerializer,
     AgentSerializer,
 )
+from autotasks.models import TaskResult
+from checks.models import CheckResult
 from tacticalrmm.constants import (
     AGENT_STATUS_OFFLINE,
     AGENT_STATUS_ONLINE,
@@ -101,6 +104,77 @@ class TestAgentsList(TacticalTestCase):
 
         self.check_not_authenticated("get", url)
 
+    def test_get_agents_paginated(self) -> None:
+        url = f"{base_url}/"
+
+        site1: "Site" = baker.make("clients.Site")
+        site2: "Site" = baker.make("clients.Site")
+        baker.make_recipe(
+            "agents.online_agent",
+            site=site1,
+            hostname=seq("online-"),
+            _quantity=12,
+        )
+        baker.make_recipe(
+            "agents.overdue_agent",
+            site=site2,
+            hostname=seq("overdue-"),
+            _quantity=3,
+        )
+        pending = baker.make_recipe("agents.online_agent", site=site2, hostname="box")
+        baker.make(
+            "winupdate.WinUpdate", agent=pending, action="approve", installed=False
+        )
+
+        def get_page(query: str) -> dict:
+            r = self.client.get(f"{url}?{query}", format="json")
+            self.assertEqual(r.status_code, 200)
+            return json.loads(b"".join(r.streaming_content))
+
+        # walk all pages
+        hostnames = []
+        cursor = ""
+        while True:
+            page = get_page(f"page_size=5&cursor={cursor}")
+            hostnames += [agent["hostname"] for agent in page["results"]]
+            if not page["next"]:
+                break
+            cursor = page["next"]
+
+        self.assertEqual(len(hostnames), 16)
+        self.assertEqual(hostnames, sorted(hostnames))
+
+        page = get_page("page_size=20&ordering=-hostname")
+        self.assertEqual(
+            [agent["hostname"] for agent in page["results"]],
+            sorted(hostnames, reverse=True),
+        )
+        self.assertIsNone(page["next"])
+
+        page = get_page("page_size=2&ordering=-last_seen&status=overdue")
+        self.assertEqual(len(page["results"]), 2)
+        page = get_page(
+            f"page_size=2&ordering=-last_seen&status=overdue&cursor={page['next']}"
+        )
+        self.assertEqual(len(page["results"]), 1)
+        self.assertIsNone(page["next"])
+
+        page = get_page("page_size=20&status=overdue")
+        self.assertEqual(len(page["results"]), 3)
+
+        page = get_page(f"page_size=20&site={site2.pk}&search=BOX")
+        self.assertEqual([a["hostname"] for a in page["results"]], ["box"])
+
+        page = get_page("page_size=20&patches_pending=true")
+        self.assertEqual([a["hostname"] for a in page["results"]], ["box"])
+
+        r = self.client.get(f"{url}?page_size=5&ordering=services", format="json")
+        self.assertEqual(r.status_code, 400)
+        r = self.client.get(f"{url}?page_size=5&cursor=garbage", format="json")
+        self.assertEqual(r.status_code, 400)
+        r = self.client.get(f"{url}?status=missing", format="json")
+        self.assertEqual(r.status_code, 400)
+
 
 class TestAgentViews(TacticalTestCase):
     def setUp(self):
@@ -1413,3 +1487,62 @@ class TestAgentTasks(TacticalTestCase):
         prune_agent_history(30)
 
         self.assertEqual(AgentHistory.objects.filter(agent=agent).count(), 6)
+
+
+class TestAgentResultAttachment(TacticalTestCase):
+    def setUp(self):
+        self.setup_coresettings()
+        self.policy = baker.make("automation.Policy", active=True)
+        self.agent = baker.make_recipe("agents.agent", policy=self.policy)
+
+    def test_add_check_results_many_policy_checks(self):
+        ips = [f"10.0.{i // 250}.{i % 250}" for i in range(400)]
+        checks = baker.make_recipe(
+            "checks.ping_check", policy=self.policy, ip=cycle(ips), _quantity=400
+        )
+        # results for every other check
+        baker.make(
+            "checks.CheckResult",
+            agent=self.agent,
+            assigned_check=cycle(checks[::2]),
+            _quantity=200,
+        )
+
+        policy_checks = self.agent.get_checks_from_policies()
+        self.assertEqual(len(policy_checks), 400)
+
+        start = time.perf_counter()
+        with self.assertNumQueries(1):
+            attached = self.agent.add_check_results(policy_checks)
+        elapsed = time.perf_counter() - start
+
+        with_result = [c for c in attached if isinstance(c.check_result, CheckResult)]
+        self.assertEqual(len(with_result), 200)
+        for check in with_result:
+            self.assertEqual(check.check_result.assigned_check_id, check.pk)
+        self.assertLess(elapsed, 1)
+
+        # a prebuilt index is reused without hitting the db
+        index = self.agent.get_check_results_index()
+        with self.assertNumQueries(0):
+            self.agent.add_check_results(policy_checks, results=index)
+
+    def test_add_task_results_many_policy_tasks(self):
+        tasks = baker.make_recipe("autotasks.task", policy=self.policy, _quantity=300)
+        baker.make(
+            "autotasks.TaskResult",
+            agent=self.agent,
+            task=cycle(tasks[::3]),
+            _quantity=100,
+        )
+
+        start = time.perf_counter()
+        with self.assertNumQueries(1):
+            attached = self.agent.add_task_results(tasks)
+        elapsed = time.perf_counter() - start
+
+        with_result = [t for t in attached if isinstance(t.task_result, TaskResult)]
+        self.assertEqual(len(with_result), 100)
+        for task in with_result:
+            self.assertEqual(task.task_result.task_id, task.pk)
+        self.assertLess(elapsed, 1)
@@ -15,6 +15,7 @@ from django.contrib.auth import get_user_model
 from django.contrib.auth.models import AnonymousUser
 from logs.models import AuditLog
 from model_bakery import baker
+from tacticalrmm.nats_utils import nats_pool
 from tacticalrmm.test import TacticalTestCase
 
 User = get_user_model()
@@ -188,6 +189,20 @@ class TestNatsStreamCmd:
         agent.save()
         return agent
 
+    @pytest.fixture(autouse=True)
+    def reset_nats_pool(self):
+        nats_pool.close()
+        yield
+        nats_pool.close()
+
+    @staticmethod
+    def _fake_nc():
+        fake_nc = AsyncMock()
+        fake_nc.is_closed = False
+        fake_nc.is_connected = True
+        fake_nc.options = {}
+        return fake_nc
+
     # helper used to assert group_send was called either awaited or sync
     def _assert_group_send_called(mock_layer, expected_group, expected_payload):
         """
@@ -204,7 +219,7 @@ class TestNatsStreamCmd:
             )
 
     @patch("agents.models.get_channel_layer")
-    @patch("agents.models.nats.connect")
+    @patch("tacticalrmm.nats_utils.nats.connect")
     def test_connect_failure_sends_error(self, mock_connect, mock_layer, agent):
         mock_connect.side_effect = Exception("boom")
         mock_layer.return_value.group_send = AsyncMock()
@@ -221,11 +236,11 @@ class TestNatsStreamCmd:
 
     @patch("agents.models.get_channel_layer")
     @patch("agents.models.msgpack.loads")
-    @patch("agents.models.nats.connect")
+    @patch("tacticalrmm.nats_utils.nats.connect")
     def test_message_handler_str_payload(
         self, mock_connect, mock_loads, mock_layer, agent
     ):
-        fake_nc = AsyncMock()
+        fake_nc = self._fake_nc()
         mock_connect.return_value = fake_nc
         mock_loads.return_value = "hello world"
         mock_layer.return_value.group_send = AsyncMock()
@@ -254,11 +269,11 @@ class TestNatsStreamCmd:
 
     @patch("agents.models.get_channel_layer")
     @patch("agents.models.msgpack.loads")
-    @patch("agents.models.nats.connect")
+    @patch("tacticalrmm.nats_utils.nats.connect")
     def test_message_handler_dict_payload(
         self, mock_connect, mock_loads, mock_layer, agent
     ):
-        fake_nc = AsyncMock()
+        fake_nc = self._fake_nc()
         mock_connect.return_value = fake_nc
         mock_loads.return_value = {"line": "out", "done": True, "exit_code": 5}
         mock_layer.return_value.group_send = AsyncMock()
@@ -292,11 +307,12 @@ class TestNatsStreamCmd:
         )
 
     @patch("agents.models.get_channel_layer")
-    @patch("agents.models.nats.connect")
+    @patch("tacticalrmm.nats_utils.nats.connect")
     def test_stop_event_triggers_early_exit(self, mock_connect, mock_layer, agent):
-        fake_nc = AsyncMock()
+        fake_nc = self._fake_nc()
         mock_connect.return_value = fake_nc
-        fake_nc.subscribe.return_value = AsyncMock(unsubscribe=AsyncMock())
+        sub = AsyncMock()
+        fake_nc.subscribe.return_value = sub
         stop_evt = asyncio.Event()
         stop_evt.set()
 
@@ -304,15 +320,19 @@ class TestNatsStreamCmd:
             {"payload": {"cmd_id": "early"}}, timeout=5, stop_evt=stop_evt
         )
 
-        fake_nc.close.assert_awaited_once()
+        sub.unsubscribe.assert_awaited_once()
+        # pooled connection stays open for the next command
+        fake_nc.close.assert_not_awaited()
 
     @patch("agents.models.get_channel_layer")
-    @patch("agents.models.nats.connect")
+    @patch("tacticalrmm.nats_utils.nats.connect")
     def test_publish_subscribe_failure_sends_error(
         self, mock_connect, mock_layer, agent
     ):
-        fake_nc = AsyncMock()
+        fake_nc = self._fake_nc()
         mock_connect.return_value = fake_nc
+        sub = AsyncMock()
+        fake_nc.subscribe.return_value = sub
         fake_nc.publish.side_effect = Exception("publish failed")
         mock_layer.return_value.group_send = AsyncMock()
 
@@ -334,15 +354,16 @@ class TestNatsStreamCmd:
             },
         )
 
-        fake_nc.close.assert_awaited_once()
+        sub.unsubscribe.assert_awaited_once()
+        fake_nc.close.assert_not_awaited()
 
     @patch("agents.models.get_channel_layer")
     @patch("agents.models.msgpack.loads")
-    @patch("agents.models.nats.connect")
+    @patch("tacticalrmm.nats_utils.nats.connect")
     def test_message_handler_payload_decoding_failure(
         self, mock_connect, mock_loads, mock_layer, agent
     ):
-        fake_nc = AsyncMock()
+        fake_nc = self._fake_nc()
         mock_connect.return_value = fake_nc
         mock_loads.side_effect = Exception("bad data")
         mock_layer.return_value.group_send = AsyncMock()
@@ -374,9 +395,9 @@ class TestNatsStreamCmd:
         )
 
     @patch("agents.models.get_channel_layer")
-    @patch("agents.models.nats.connect")
+    @patch("tacticalrmm.nats_utils.nats.connect")
     def test_timeout_triggers_cleanup(self, mock_connect, mock_layer, agent):
-        fake_nc = AsyncMock()
+        fake_nc = self._fake_nc()
         mock_connect.return_value = fake_nc
         sub = AsyncMock()
         fake_nc.subscribe.return_value = sub
@@ -387,7 +408,52 @@ class TestNatsStreamCmd:
         )
 
         sub.unsubscribe.assert_awaited_once()
-        fake_nc.close.assert_awaited_once()
+        fake_nc.close.assert_not_awaited()
+
+    @patch("agents.models.get_channel_layer")
+    @patch("tacticalrmm.nats_utils.nats.connect")
+    def test_cancel_during_publish_unsubscribes(self, mock_connect, mock_layer, agent):
+        fake_nc = self._fake_nc()
+        mock_connect.return_value = fake_nc
+        sub = AsyncMock()
+        fake_nc.subscribe.return_value = sub
+
+        async def slow_publish(*args, **kwargs):
+            await asyncio.sleep(30)
+
+        fake_nc.publish.side_effect = slow_publish
+
+        async def run():
+            task = asyncio.create_task(
+                agent.nats_stream_cmd({"payload": {"cmd_id": "cancel"}}, timeout=30)
+            )
+            # publish runs on the pool's loop, wait for it from this one
+            while not fake_nc.publish.await_count:
+                await asyncio.sleep(0.01)
+            task.cancel()
+            with pytest.raises(asyncio.CancelledError):
+                await task
+
+        async_to_sync(run)()
+
+        sub.unsubscribe.assert_awaited_once()
+        fake_nc.close.assert_not_awaited()
+
+    @patch("agents.models.get_channel_layer")
+    @patch("tacticalrmm.nats_utils.nats.connect")
+    def test_connection_is_reused(self, mock_connect, mock_layer, agent):
+        fake_nc = self._fake_nc()
+        mock_connect.return_value = fake_nc
+        fake_nc.subscribe.return_value = AsyncMock()
+        mock_layer.return_value.group_send = AsyncMock()
+
+        for cmd_id in ("one", "two"):
+            async_to_sync(agent.nats_stream_cmd)(
+                {"payload": {"cmd_id": cmd_id}}, timeout=0
+            )
+
+        mock_connect.assert_awaited_once()
+        assert fake_nc.publish.await_count == 2
 
 
 class TestTerminalStreamConsumer(TacticalTestCase):
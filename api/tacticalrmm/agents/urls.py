@@ -40,6 +40,7 @@ urlpatterns = [
     # bulk actions
     path("maintenance/bulk/", views.agent_maintenance),
     path("actions/bulk/", views.bulk),
+    path("actions/bulk/progress/", views.bulk_progress),
     path("versions/", views.get_agent_versions),
     path("update/", views.update_agents),
     path("installer/", views.install_agent),
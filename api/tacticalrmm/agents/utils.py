@@ -1,18 +1,33 @@
 import asyncio
+import base64
+import datetime as dt
+import json
 import re
 import urllib.parse
+import uuid
 from io import StringIO
 from pathlib import Path
+from typing import Any
 
 from django.conf import settings
+from django.core.cache import cache
+from django.db.models import F, Q
 from django.http import FileResponse
 from django.shortcuts import get_object_or_404
+from django.utils import timezone as djangotime
+from django.utils.dateparse import parse_datetime
 from packaging import version as pyver
 
 from checks.models import CheckResult
 from core.utils import get_core_settings, get_mesh_device_id, get_mesh_ws_url
 from tacticalrmm.constants import (
     AGENT_DEFER,
+    AGENT_STATUS_OFFLINE,
+    AGENT_STATUS_ONLINE,
+    AGENT_STATUS_OVERDUE,
+    BULK_DISPATCH_CACHE_PREFIX,
+    BULK_DISPATCH_CACHE_TIMEOUT,
+    BULK_DISPATCH_HISTORY,
     AlertSeverity,
     CheckStatus,
     CheckType,
@@ -36,6 +51,122 @@ def get_agent_url(*, goarch: str, plat: str, token: str = "") -> str:
     return f"https://github.com/amidaware/rmmagent/releases/download/v{ver}/tacticalagent-v{ver}-{plat}-{goarch}.exe"
 
 
+def agent_status_q(status: str) -> Q:
+    """
+    SQL equivalent of Agent.status, lets fleet sweeps filter on status
+    instead of loading every agent to evaluate the property in python.
+    """
+    now = djangotime.now()
+    offline = now - djangotime.timedelta(minutes=1) * F("offline_time")
+    overdue = now - djangotime.timedelta(minutes=1) * F("overdue_time")
+
+    if status == AGENT_STATUS_ONLINE:
+        return Q(last_seen__gte=offline)
+    elif status == AGENT_STATUS_OVERDUE:
+        return Q(last_seen__lt=offline) & Q(last_seen__lt=overdue)
+    elif status == AGENT_STATUS_OFFLINE:
+        return Q(last_seen__isnull=True) | Q(
+            last_seen__lt=offline, last_seen__gt=overdue
+        )
+
+    raise ValueError(f"Invalid agent status: {status}")
+
+
+def _bulk_dispatch_key(dispatch_id: str) -> str:
+    return f"{BULK_DISPATCH_CACHE_PREFIX}{dispatch_id}"
+
+
+def _bulk_dispatch_user_key(username: str) -> str:
+    return f"{BULK_DISPATCH_CACHE_PREFIX}user_{username}"
+
+
+def start_bulk_dispatch(*, username: str, mode: str, total: int) -> str:
+    """
+    Registers a bulk action run for the user and returns its id,
+    the task running it reports its progress with update_bulk_dispatch().
+    """
+    dispatch_id = uuid.uuid4().hex
+    cache.set(
+        _bulk_dispatch_key(dispatch_id),
+        {
+            "id": dispatch_id,
+            "mode": mode,
+            "status": "queued",
+            "total": total,
+            "dispatched": 0,
+            "failed": 0,
+            "started": djangotime.now().isoformat(),
+            "finished": None,
+        },
+        BULK_DISPATCH_CACHE_TIMEOUT,
+    )
+
+    user_key = _bulk_dispatch_user_key(username)
+    recent = [dispatch_id, *(cache.get(user_key) or [])][:BULK_DISPATCH_HISTORY]
+    cache.set(user_key, recent, BULK_DISPATCH_CACHE_TIMEOUT)
+    return dispatch_id
+
+
+def update_bulk_dispatch(dispatch_id: str, **progress: Any) -> None:
+    key = _bulk_dispatch_key(dispatch_id)
+    current = cache.get(key)
+    if current is None:
+        return
+
+    current.update(progress)
+    if current["status"] == "completed":
+        current["finished"] = djangotime.now().isoformat()
+
+    cache.set(key, current, BULK_DISPATCH_CACHE_TIMEOUT)
+
+
+def get_bulk_dispatches(username: str) -> list[dict[str, Any]]:
+    """Progress of the user's recent bulk action runs, newest first."""
+    keys = [
+        _bulk_dispatch_key(i)
+        for i in cache.get(_bulk_dispatch_user_key(username)) or []
+    ]
+    found = cache.get_many(keys)
+    return [found[key] for key in keys if key in found]
+
+
+AGENT_TABLE_MAX_PAGE_SIZE = 1000
+
+# sort keys accepted by the paginated agent table, mapped to their model field
+AGENT_TABLE_ORDERING = {
+    "hostname": "hostname",
+    "client_name": "site__client__name",
+    "site_name": "site__name",
+    "last_seen": "last_seen",
+    "version": "version",
+}
+
+
+def encode_agent_table_cursor(value: Any, pk: int) -> str:
+    if isinstance(value, dt.datetime):
+        value = value.isoformat()
+
+    return base64.urlsafe_b64encode(json.dumps([value, pk]).encode()).decode()
+
+
+def decode_agent_table_cursor(cursor: str, ordering: str) -> tuple[Any, int]:
+    """Raises ValueError if the cursor is malformed"""
+    try:
+        value, pk = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+    except Exception as e:
+        raise ValueError("invalid cursor") from e
+
+    if not isinstance(pk, int):
+        raise ValueError("invalid cursor")
+
+    if AGENT_TABLE_ORDERING[ordering] == "last_seen":
+        value = parse_datetime(value) if isinstance(value, str) else None
+        if value is None:
+            raise ValueError("invalid cursor")
+
+    return value, pk
+
+
 def generate_linux_install(
     client: str,
     site: str,
@@ -1,5 +1,6 @@
 import asyncio
 import datetime as dt
+import json
 import random
 import string
 import time
@@ -7,8 +8,9 @@ from io import StringIO
 from pathlib import Path
 
 from django.conf import settings
-from django.db.models import Count, Exists, OuterRef, Prefetch, Q
-from django.http import HttpResponse
+from django.db.models import Count, Exists, OuterRef, Prefetch, Q, QuerySet, Value
+from django.db.models.functions import Coalesce
+from django.http import HttpResponse, StreamingHttpResponse
 from django.shortcuts import get_object_or_404
 from django.utils import timezone as djangotime
 from django.utils.dateparse import parse_datetime
@@ -19,9 +21,20 @@ from rest_framework.decorators import api_view, permission_classes
 from rest_framework.exceptions import PermissionDenied
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.response import Response
+from rest_framework.utils.encoders import JSONEncoder
 from rest_framework.views import APIView
 
-from agents.utils import get_agent_url
+from agents.utils import (
+    AGENT_TABLE_MAX_PAGE_SIZE,
+    AGENT_TABLE_ORDERING,
+    agent_status_q,
+    decode_agent_table_cursor,
+    encode_agent_table_cursor,
+    get_agent_url,
+    get_bulk_dispatches,
+    start_bulk_dispatch,
+)
+from checks.models import CheckResult
 from core.models import CoreSettings
 from core.tasks import sync_mesh_perms_task
 from core.utils import (
@@ -45,6 +58,7 @@ from tacticalrmm.constants import (
     AgentMonType,
     AgentPlat,
     AgentTerminalShellChoices,
+    CheckStatus,
     CustomFieldModel,
     DebugLogType,
     EvtLogNames,
@@ -123,10 +137,20 @@ class GetAgents(APIView):
             or "detail" in request.query_params.keys()
             and request.query_params["detail"] == "true"
         ):
+            status = request.query_params.get("status", None)
+            if status:
+                try:
+                    status_filter = agent_status_q(status)
+                except ValueError:
+                    return notify_error("agent status does not exist")
+            else:
+                status_filter = Q()
+
             agents = (
                 Agent.objects.filter_by_role(request.user)  # type: ignore
                 .filter(monitoring_type_filter)
                 .filter(client_site_filter)
+                .filter(status_filter)
                 .select_related(
                     "site__client",
                     "policy",
@@ -157,6 +181,11 @@ class GetAgents(APIView):
                     "modified_time",
                 )
             )
+
+            # without page_size the whole table is returned at once
+            if "page_size" in request.query_params.keys():
+                return self.get_page(request, agents)
+
             serializer = AgentTableSerializer(agents, many=True)
 
         # if detail=false
@@ -172,6 +201,92 @@ class GetAgents(APIView):
 
         return Response(serializer.data)
 
+    def get_page(self, request, agents: "QuerySet[Agent]"):
+        params = request.query_params
+
+        try:
+            page_size = min(int(params["page_size"]), AGENT_TABLE_MAX_PAGE_SIZE)
+        except ValueError:
+            return notify_error("page_size must be a number")
+
+        if page_size < 1:
+            return notify_error("page_size must be a positive number")
+
+        ordering = params.get("ordering", "hostname")
+        descending = ordering.startswith("-")
+        ordering = ordering.removeprefix("-")
+        if ordering not in AGENT_TABLE_ORDERING:
+            return notify_error("invalid ordering")
+
+        if params.get("failing_checks", None) == "true":
+            agents = agents.filter(
+                Exists(
+                    CheckResult.objects.filter(
+                        agent_id=OuterRef("pk"), status=CheckStatus.FAILING
+                    )
+                )
+            )
+
+        if params.get("patches_pending", None) == "true":
+            agents = agents.filter(has_patches_pending=True)
+
+        if search := params.get("search", None):
+            agents = agents.filter(
+                Q(hostname__icontains=search)
+                | Q(description__icontains=search)
+                | Q(logged_in_username__icontains=search)
+                | Q(last_logged_in_user__icontains=search)
+                | Q(public_ip__icontains=search)
+                | Q(site__name__icontains=search)
+                | Q(site__client__name__icontains=search)
+            )
+
+        # keyset pagination on (sort value, pk), nulls sort as the lowest value
+        field = AGENT_TABLE_ORDERING[ordering]
+        lowest = dt.datetime.min.replace(tzinfo=dt.timezone.utc)
+        agents = agents.annotate(
+            _sort=Coalesce(field, Value(lowest if field == "last_seen" else ""))
+        )
+
+        if cursor := params.get("cursor", None):
+            try:
+                value, pk = decode_agent_table_cursor(cursor, ordering)
+            except ValueError:
+                return notify_error("invalid cursor")
+
+            if descending:
+                agents = agents.filter(Q(_sort__lt=value) | Q(_sort=value, pk__lt=pk))
+            else:
+                agents = agents.filter(Q(_sort__gt=value) | Q(_sort=value, pk__gt=pk))
+
+        if descending:
+            agents = agents.order_by("-_sort", "-pk")
+        else:
+            agents = agents.order_by("_sort", "pk")
+
+        page = agents[: page_size + 1]
+
+        def stream():
+            # rows are serialized one at a time, next is sent once they are all out
+            yield '{"results":['
+            last, has_more = None, False
+            for i, agent in enumerate(page.iterator(chunk_size=500)):
+                if i == page_size:
+                    has_more = True
+                    break
+
+                if i:
+                    yield ","
+                yield json.dumps(AgentTableSerializer(agent).data, cls=JSONEncoder)
+                last = agent
+
+            next_cursor = (
+                encode_agent_table_cursor(last._sort, last.pk) if has_more else None
+            )
+            yield f'],"next":{json.dumps(next_cursor)}}}'
+
+        return StreamingHttpResponse(stream(), content_type="application/json")
+
 
 class GetUpdateDeleteAgent(APIView):
     permission_classes = [IsAuthenticated, AgentPerms]
@@ -1127,6 +1242,14 @@ def bulk(request):
 
     ht = "Check the History tab on the agent to view the results."
 
+    if request.data["mode"] in ("command", "script"):
+        # lets the dashboard poll how far the run got, see bulk_progress
+        dispatch_id = start_bulk_dispatch(
+            username=request.user.username,
+            mode=request.data["mode"],
+            total=len(agents),
+        )
+
     if request.data["mode"] == "command":
         if request.data["shell"] == "custom" and request.data["custom_shell"]:
             shell = request.data["custom_shell"]
@@ -1140,6 +1263,7 @@ def bulk(request):
             timeout=request.data["timeout"],
             username=request.user.username[:50],
             run_as_user=request.data["run_as_user"],
+            dispatch_id=dispatch_id,
         )
         return Response(f"Command will now be run on {len(agents)} agents. {ht}")
 
@@ -1167,6 +1291,7 @@ def bulk(request):
             custom_field_pk=custom_field_pk,
             collector_all_output=collector_all_output,
             save_to_agent_note=save_to_agent_note,
+            dispatch_id=dispatch_id,
         )
 
         return Response(f"{script.name} will now be run on {len(agents)} agents. {ht}")
@@ -1184,6 +1309,12 @@ def bulk(request):
     return notify_error("Something went wrong")
 
 
+@api_view(["GET"])
+@permission_classes([IsAuthenticated, RunBulkPerms])
+def bulk_progress(request):
+    return Response(get_bulk_dispatches(request.user.username))
+
+
 @api_view(["POST"])
 @permission_classes([IsAuthenticated, AgentPerms])
 def agent_maintenance(request):
@@ -729,6 +729,61 @@ class TestAlertTasks(TacticalTestCase):
             Alert.objects.get(agent=agent_template_email).resolved_email_sent
         )
 
+    @patch("alerts.models.Alert.handle_alert_failure")
+    def test_agent_outages_task_only_handles_overdue_agents(self, handle_failure):
+        from agents.tasks import agent_outages_task
+
+        overdue = baker.make_recipe("agents.overdue_agent")
+        baker.make_recipe("agents.online_agent")
+        baker.make_recipe("agents.offline_agent")
+        baker.make_recipe("agents.agent", last_seen=None)
+        baker.make_recipe("agents.overdue_agent", maintenance_mode=True)
+        # custom overdue threshold not reached yet, agent is only offline
+        baker.make_recipe("agents.overdue_agent", overdue_time=60)
+
+        agent_outages_task()
+
+        self.assertEqual(
+            [c.args[0].pk for c in handle_failure.call_args_list], [overdue.pk]
+        )
+
+    @patch("alerts.models.Alert.handle_alert_resolve")
+    def test_resolve_alerts_task_only_handles_online_agents_with_open_alert(
+        self, handle_resolve
+    ):
+        def make_alert(agent, resolved=False, alert_type=AlertType.AVAILABILITY):
+            baker.make(
+                "alerts.Alert", agent=agent, alert_type=alert_type, resolved=resolved
+            )
+
+        version = settings.LATEST_AGENT_VER
+
+        expected = baker.make_recipe("agents.online_agent", version=version)
+        make_alert(expected)
+
+        # online without any open availability alert
+        baker.make_recipe("agents.online_agent", version=version)
+        resolved_alert = baker.make_recipe("agents.online_agent", version=version)
+        make_alert(resolved_alert, resolved=True)
+        check_alert = baker.make_recipe("agents.online_agent", version=version)
+        make_alert(check_alert, alert_type=AlertType.CHECK)
+
+        # open alert but not eligible
+        overdue = baker.make_recipe("agents.overdue_agent", version=version)
+        make_alert(overdue)
+        maintenance = baker.make_recipe(
+            "agents.online_agent", version=version, maintenance_mode=True
+        )
+        make_alert(maintenance)
+        old_version = baker.make_recipe("agents.online_agent", version="1.5.0")
+        make_alert(old_version)
+
+        resolve_alerts_task()
+
+        self.assertEqual(
+            [c.args[0].pk for c in handle_resolve.call_args_list], [expected.pk]
+        )
+
     @patch("checks.tasks.sleep")
     @patch("core.models.CoreSettings.send_mail")
     @patch("core.models.CoreSettings.send_sms")
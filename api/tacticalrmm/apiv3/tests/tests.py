@@ -1,5 +1,8 @@
+import time
 from unittest.mock import patch
 
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
 from django.utils import timezone as djangotime
 from model_bakery import baker
 
@@ -313,3 +316,111 @@ class TestAPIv3(TacticalTestCase):
         url = f"/api/v3/{agent.agent_id}/config/"
         r = self.client.get(url)
         self.assertEqual(r.status_code, 200)
+
+
+def make_wua_update(n: int, **kwargs) -> dict:
+    # shaped like an update reported by the agent's windows update scan
+    update = {
+        "guid": f"0b1e3a5c-6f7d-4e8a-9b0c-{n:012d}",
+        "kb_article_ids": [str(5030000 + n)],
+        "title": f"2025-10 Cumulative Update for Windows 11 (KB{5030000 + n})",
+        "installed": False,
+        "downloaded": False,
+        "description": "Install this update to resolve issues in Windows. "
+        "For a complete listing of the issues that are included in this update, "
+        "see the associated Microsoft Knowledge Base article for more information.",
+        "severity": "Critical",
+        "categories": ["Security Updates", "Windows 11"],
+        "category_ids": [
+            "0fa1201d-4330-4fa8-8ae9-b877473b6441",
+            "72e7624a-5b00-45d2-b92f-e561c0a6a160",
+        ],
+        "more_info_urls": [f"https://support.microsoft.com/help/{5030000 + n}"],
+        "support_url": "https://support.microsoft.com/help",
+        "revision_number": 200,
+    }
+    update.update(kwargs)
+    return update
+
+
+class TestWinUpdateScan(TacticalTestCase):
+    def setUp(self):
+        self.authenticate()
+        self.setup_coresettings()
+        self.agent = baker.make_recipe("agents.agent")
+        self.authenticate_agent(self.agent)
+        self.url = "/api/v3/winupdates/"
+
+    def test_scan_upserts_updates(self):
+        baker.make(
+            "winupdate.WinUpdate",
+            agent=self.agent,
+            guid=make_wua_update(0)["guid"],
+            installed=False,
+            downloaded=False,
+        )
+
+        updates = [make_wua_update(i) for i in range(5)]
+        updates[0]["installed"] = True
+        # no kb, skipped
+        updates.append(make_wua_update(5, kb_article_ids=[]))
+        # reported twice in the same scan
+        updates.append(make_wua_update(4, downloaded=True))
+
+        r = self.client.post(self.url, {"wua_updates": updates}, format="json")
+        self.assertEqual(r.status_code, 200)
+
+        winupdates = {u.guid: u for u in self.agent.winupdates.all()}
+        self.assertEqual(len(winupdates), 5)
+        self.assertTrue(winupdates[updates[0]["guid"]].installed)
+        self.assertTrue(winupdates[updates[4]["guid"]].downloaded)
+
+        # rescanning doesn't duplicate anything
+        r = self.client.post(self.url, {"wua_updates": updates}, format="json")
+        self.assertEqual(r.status_code, 200)
+        self.assertEqual(self.agent.winupdates.count(), 5)
+
+    def test_scan_removes_superseded_updates(self):
+        defender = "Security Intelligence Update for Microsoft Defender Antivirus"
+        updates = [
+            make_wua_update(
+                1, kb_article_ids=["2267602"], title=f"{defender} (Version 1.439.1.0)"
+            ),
+            make_wua_update(
+                2, kb_article_ids=["2267602"], title=f"{defender} (Version 1.439.10.0)"
+            ),
+            make_wua_update(3),
+        ]
+
+        r = self.client.post(self.url, {"wua_updates": updates}, format="json")
+        self.assertEqual(r.status_code, 200)
+        self.assertEqual(
+            set(self.agent.winupdates.values_list("guid", flat=True)),
+            {updates[1]["guid"], updates[2]["guid"]},
+        )
+
+    def test_scan_benchmark(self):
+        # replays a patch tuesday scan: 150 updates, 100 already known with 30 changed
+        updates = [make_wua_update(i) for i in range(150)]
+        for update in updates[:100]:
+            baker.make(
+                "winupdate.WinUpdate",
+                agent=self.agent,
+                guid=update["guid"],
+                kb="KB" + update["kb_article_ids"][0],
+                title=update["title"],
+            )
+        for update in updates[:30]:
+            update["installed"] = True
+            update["downloaded"] = True
+
+        start = time.perf_counter()
+        with CaptureQueriesContext(connection) as ctx:
+            r = self.client.post(self.url, {"wua_updates": updates}, format="json")
+        elapsed = time.perf_counter() - start
+
+        self.assertEqual(r.status_code, 200)
+        self.assertLessEqual(len(ctx.captured_queries), 8)
+        self.assertLess(elapsed, 2)
+        self.assertEqual(self.agent.winupdates.count(), 150)
+        self.assertEqual(self.agent.winupdates.filter(installed=True).count(), 30)
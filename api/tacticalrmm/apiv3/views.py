@@ -179,21 +179,37 @@ class WinUpdates(APIView):
             user=request.user,
         )
 
+        # diff the scan against the agent's updates in a single query
+        existing = {
+            u.guid: u
+            for u in WinUpdate.objects.filter(
+                agent=agent, guid__in={update["guid"] for update in updates}
+            ).only("pk", "guid", "downloaded", "installed")
+        }
+        to_create: dict[str, WinUpdate] = {}
+        to_update: dict[str, WinUpdate] = {}
+
         for update in updates:
-            if agent.winupdates.filter(guid=update["guid"]).exists():  # type: ignore
-                u = agent.winupdates.filter(guid=update["guid"]).last()  # type: ignore
-                u.downloaded = update["downloaded"]
-                u.installed = update["installed"]
-                u.save(update_fields=["downloaded", "installed"])
+            guid = update["guid"]
+            if guid in existing or guid in to_create:
+                u = existing.get(guid) or to_create[guid]
+                if (u.downloaded, u.installed) != (
+                    update["downloaded"],
+                    update["installed"],
+                ):
+                    u.downloaded = update["downloaded"]
+                    u.installed = update["installed"]
+                    if guid in existing:
+                        to_update[guid] = u
             else:
                 try:
                     kb = "KB" + update["kb_article_ids"][0]
                 except:
                     continue
 
-                WinUpdate(
+                to_create[guid] = WinUpdate(
                     agent=agent,
-                    guid=update["guid"],
+                    guid=guid,
                     kb=kb,
                     title=update["title"],
                     installed=update["installed"],
@@ -206,7 +222,15 @@ class WinUpdates(APIView):
                     more_info_urls=update["more_info_urls"],
                     support_url=update["support_url"],
                     revision_number=update["revision_number"],
-                ).save()
+                )
+
+        # a concurrent scan of the same agent may have inserted some already
+        WinUpdate.objects.bulk_create(
+            to_create.values(), batch_size=500, ignore_conflicts=True
+        )
+        WinUpdate.objects.bulk_update(
+            to_update.values(), fields=["downloaded", "installed"], batch_size=500
+        )
 
         agent.delete_superseded_updates()
         return Response("ok")
@@ -363,6 +387,7 @@ class TaskRunner(APIView):
 
     def patch(self, request, pk, agentid):
         from alerts.models import Alert
+        from core.tasks import update_agent_checks_rollup_task
 
         agent = get_object_or_404(Agent.objects.defer(*AGENT_DEFER), user=request.user)
         task = get_object_or_404(
@@ -376,12 +401,14 @@ class TaskRunner(APIView):
             request.data["retcode"] = 1
 
         # get task result or create if doesn't exist
+        prev_status = None
         try:
             task_result = (
                 TaskResult.objects.select_related("agent")
                 .defer("agent__services", "agent__wmi_detail")
                 .get(task=task, agent=agent)
             )
+            prev_status = task_result.status
             serializer = TaskResultSerializer(
                 data=request.data, instance=task_result, partial=True
             )
@@ -416,6 +443,9 @@ class TaskRunner(APIView):
         task_result.status = status
         task_result.save(update_fields=["status"])
 
+        if status != prev_status:
+            update_agent_checks_rollup_task.delay(agent.pk)
+
         if status == CheckStatus.PASSING:
             if Alert.create_or_return_task_alert(task, agent=agent, skip_create=True):
                 Alert.handle_alert_resolve(task_result)
@@ -3,3 +3,6 @@ from django.apps import AppConfig
 
 class AutomationConfig(AppConfig):
     name = "automation"
+
+    def ready(self):
+        from . import signals  # noqa
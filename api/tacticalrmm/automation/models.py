@@ -1,4 +1,4 @@
-from typing import TYPE_CHECKING, Any, Dict, List, Optional
+from typing import TYPE_CHECKING, Any, Dict, List, Optional, Set, Tuple
 
 from django.core.cache import cache
 from django.db import models
@@ -42,13 +42,17 @@ class Policy(BaseAuditModel):
 
     def save(self, *args: Any, **kwargs: Any) -> None:
         from alerts.tasks import cache_agents_alert_template
+        from winupdate.utils import invalidate_patch_windows
+
+        from .utils import refresh_policy_index
 
         # get old policy if exists
-        old_policy: Optional[Policy] = (
-            type(self).objects.get(pk=self.pk) if self.pk else None
-        )
+        old_policy: Optional[Policy] = self.get_old_instance()  # type: ignore
         super().save(old_model=old_policy, *args, **kwargs)
 
+        if not old_policy:
+            refresh_policy_index(policies=[self.pk])
+
         # check if alert template was changes and cache on agents
         if old_policy:
             if old_policy.alert_template != self.alert_template:
@@ -62,7 +66,14 @@ class Policy(BaseAuditModel):
                 cache.delete_many_pattern("site_server_*")
                 cache.delete_many_pattern("agent_*")
 
+            if old_policy.active != self.active:
+                invalidate_patch_windows()
+
     def delete(self, *args, **kwargs):
+        from winupdate.utils import invalidate_patch_windows
+
+        from .utils import invalidate_policy_index
+
         cache.delete(CORESETTINGS_CACHE_KEY)
         cache.delete_many_pattern("site_workstation_*")
         cache.delete_many_pattern("site_server_*")
@@ -70,6 +81,10 @@ class Policy(BaseAuditModel):
 
         super().delete(*args, **kwargs)
 
+        # sites, clients and core settings pointing to it were updated as well
+        invalidate_policy_index()
+        invalidate_patch_windows()
+
     def __str__(self) -> str:
         return self.name
 
@@ -82,11 +97,9 @@ class Policy(BaseAuditModel):
         return self.default_workstation_policy.exists()
 
     def is_agent_excluded(self, agent: "Agent") -> bool:
-        return (
-            agent in self.excluded_agents.all()
-            or agent.site in self.excluded_sites.all()
-            or agent.client in self.excluded_clients.all()
-        )
+        from .utils import is_agent_excluded
+
+        return is_agent_excluded(self.pk, agent)
 
     def related_agents(
         self, mon_type: Optional[str] = None
@@ -261,11 +274,11 @@ class Policy(BaseAuditModel):
             return []
 
         # Sorted Checks already added
-        added_diskspace_checks: List[str] = []
-        added_ping_checks: List[str] = []
-        added_winsvc_checks: List[str] = []
-        added_script_checks: List[int] = []
-        added_eventlog_checks: List[List[str]] = []
+        added_diskspace_checks: Set[str] = set()
+        added_ping_checks: Set[str] = set()
+        added_winsvc_checks: Set[str] = set()
+        added_script_checks: Set[int] = set()
+        added_eventlog_checks: Set[Tuple[str, Optional[int]]] = set()
         added_cpuload_checks: List[int] = []
         added_memory_checks: List[int] = []
 
@@ -288,7 +301,7 @@ class Policy(BaseAuditModel):
             ):
                 # Check if drive letter was already added
                 if check.disk not in added_diskspace_checks:
-                    added_diskspace_checks.append(check.disk)
+                    added_diskspace_checks.add(check.disk)
                     # Dont add if check if it is an agent check
                     if not check.agent:
                         diskspace_checks.append(check)
@@ -298,7 +311,7 @@ class Policy(BaseAuditModel):
             elif check.check_type == CheckType.PING:
                 # Check if IP/host was already added
                 if check.ip not in added_ping_checks:
-                    added_ping_checks.append(check.ip)
+                    added_ping_checks.add(check.ip)
                     # Dont add if the check if it is an agent check
                     if not check.agent:
                         ping_checks.append(check)
@@ -335,7 +348,7 @@ class Policy(BaseAuditModel):
             ):
                 # Check if service name was already added
                 if check.svc_name not in added_winsvc_checks:
-                    added_winsvc_checks.append(check.svc_name)
+                    added_winsvc_checks.add(check.svc_name)
                     # Dont create the check if it is an agent check
                     if not check.agent:
                         winsvc_checks.append(check)
@@ -346,8 +359,8 @@ class Policy(BaseAuditModel):
                 check.script.supported_platforms
             ):
                 # Check if script id was already added
-                if check.script.id not in added_script_checks:
-                    added_script_checks.append(check.script.id)
+                if check.script_id not in added_script_checks:
+                    added_script_checks.add(check.script_id)
                     # Dont create the check if it is an agent check
                     if not check.agent:
                         script_checks.append(check)
@@ -359,19 +372,19 @@ class Policy(BaseAuditModel):
                 and agent.plat == AgentPlat.WINDOWS
             ):
                 # Check if events were already added
-                if [check.log_name, check.event_id] not in added_eventlog_checks:
-                    added_eventlog_checks.append([check.log_name, check.event_id])
+                if (check.log_name, check.event_id) not in added_eventlog_checks:
+                    added_eventlog_checks.add((check.log_name, check.event_id))
                     if not check.agent:
                         eventlog_checks.append(check)
                 elif check.agent:
                     overridden_checks.append(check.pk)
 
-            if overridden_checks:
-                from checks.models import Check
+        if overridden_checks:
+            from checks.models import Check
 
-                Check.objects.filter(pk__in=overridden_checks).update(
-                    overridden_by_policy=True
-                )
+            Check.objects.filter(pk__in=overridden_checks).update(
+                overridden_by_policy=True
+            )
 
         return (
             diskspace_checks
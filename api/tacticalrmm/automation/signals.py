@@ -0,0 +1,25 @@
+from django.db.models.signals import m2m_changed
+from django.dispatch import receiver
+
+from winupdate.utils import invalidate_patch_windows
+
+from .models import Policy
+from .utils import invalidate_policy_index, refresh_policy_index
+
+
+@receiver(m2m_changed, sender=Policy.excluded_agents.through)
+@receiver(m2m_changed, sender=Policy.excluded_sites.through)
+@receiver(m2m_changed, sender=Policy.excluded_clients.through)
+def handle_policy_exclusions(sender, instance, action: str, reverse: bool, **kwargs):
+    if action not in ("post_add", "post_remove", "post_clear"):
+        return
+
+    if not reverse:
+        refresh_policy_index(policies=[instance.pk])
+    elif kwargs["pk_set"]:
+        refresh_policy_index(policies=kwargs["pk_set"])
+    else:
+        # cleared from the agent/site/client side, the affected policies are unknown
+        invalidate_policy_index()
+
+    invalidate_patch_windows()
@@ -704,3 +704,64 @@ class TestPolicyTasks(TacticalTestCase):
         # should get policies from agent policy
         self.assertTrue(tasks)
         self.assertTrue(checks)
+
+
+LOCMEM_CACHE = {"default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}}
+
+
+class TestPolicyIndex(TacticalTestCase):
+    def setUp(self):
+        self.setup_coresettings()
+
+    def test_index_is_refreshed_incrementally(self):
+        from .utils import get_policy_index, resolve_agent_policy_ids
+
+        policy = baker.make("automation.Policy", active=True)
+        site = baker.make("clients.Site")
+        agent = baker.make_recipe(
+            "agents.agent", site=site, monitoring_type=AgentMonType.SERVER
+        )
+
+        with self.settings(CACHES=LOCMEM_CACHE):
+            self.assertIsNone(resolve_agent_policy_ids(agent)["site_policy"])
+
+            site.server_policy = policy
+            site.save()
+            self.assertEqual(resolve_agent_policy_ids(agent)["site_policy"], policy.pk)
+
+            policy.excluded_agents.add(agent)
+            self.assertIn(agent.pk, get_policy_index()["policies"][policy.pk]["agents"])
+            self.assertIsNone(resolve_agent_policy_ids(agent)["site_policy"])
+
+            policy.excluded_agents.remove(agent)
+            site.client.block_policy_inheritance = True
+            site.client.save()
+            self.assertEqual(resolve_agent_policy_ids(agent)["site_policy"], policy.pk)
+
+            # a site created after the index was built
+            new_agent = baker.make_recipe(
+                "agents.agent", monitoring_type=AgentMonType.SERVER, policy=policy
+            )
+            self.assertEqual(
+                resolve_agent_policy_ids(new_agent)["agent_policy"], policy.pk
+            )
+
+    def test_excluded_agent_does_not_share_site_checks(self):
+        policy = baker.make("automation.Policy", active=True)
+        baker.make_recipe("checks.memory_check", policy=policy)
+        site = baker.make("clients.Site", server_policy=policy)
+        agent, excluded = baker.make_recipe(
+            "agents.agent",
+            site=site,
+            monitoring_type=AgentMonType.SERVER,
+            _quantity=2,
+        )
+        policy.excluded_agents.add(excluded)
+
+        with self.settings(CACHES=LOCMEM_CACHE):
+            self.assertEqual(len(agent.get_checks_from_policies()), 1)
+            self.assertEqual(len(excluded.get_checks_from_policies()), 0)
+
+            # only the lookup for the agent's own checks
+            with self.assertNumQueries(1):
+                self.assertEqual(len(agent.get_checks_from_policies()), 1)
@@ -0,0 +1,210 @@
+from typing import TYPE_CHECKING, Any, Dict, Iterable, Optional
+
+from django.core.cache import cache
+
+from clients.models import Client, Site
+from core.utils import get_core_settings
+from tacticalrmm.constants import POLICY_INDEX_CACHE_KEY, AgentMonType
+
+from .models import Policy
+
+if TYPE_CHECKING:
+    from agents.models import Agent
+
+# (client_id, block_policy_inheritance, server_policy_id, workstation_policy_id)
+SiteEntry = tuple[int, bool, Optional[int], Optional[int]]
+# (block_policy_inheritance, server_policy_id, workstation_policy_id)
+ClientEntry = tuple[bool, Optional[int], Optional[int]]
+
+
+def _policy_entries(pks: Optional[Iterable[int]] = None) -> Dict[int, Dict[str, set]]:
+    policies = Policy.objects.all()
+    if pks is not None:
+        policies = policies.filter(pk__in=pks)
+
+    entries: Dict[int, Dict[str, set]] = {
+        pk: {"agents": set(), "sites": set(), "clients": set()}
+        for pk in policies.values_list("pk", flat=True)
+    }
+
+    for key, field in (
+        ("agents", "excluded_agents"),
+        ("sites", "excluded_sites"),
+        ("clients", "excluded_clients"),
+    ):
+        through = getattr(Policy, field).through.objects.all()
+        if pks is not None:
+            through = through.filter(policy_id__in=pks)
+
+        related = f"{key[:-1]}_id"
+        for policy_id, related_id in through.values_list("policy_id", related):
+            if policy_id in entries:
+                entries[policy_id][key].add(related_id)
+
+    return entries
+
+
+def _site_entries(pks: Optional[Iterable[int]] = None) -> Dict[int, SiteEntry]:
+    sites = Site.objects.all()
+    if pks is not None:
+        sites = sites.filter(pk__in=pks)
+
+    return {
+        pk: (client_id, block, server, workstation)
+        for pk, client_id, block, server, workstation in sites.values_list(
+            "pk",
+            "client_id",
+            "block_policy_inheritance",
+            "server_policy_id",
+            "workstation_policy_id",
+        )
+    }
+
+
+def _client_entries(pks: Optional[Iterable[int]] = None) -> Dict[int, ClientEntry]:
+    clients = Client.objects.all()
+    if pks is not None:
+        clients = clients.filter(pk__in=pks)
+
+    return {
+        pk: (block, server, workstation)
+        for pk, block, server, workstation in clients.values_list(
+            "pk",
+            "block_policy_inheritance",
+            "server_policy_id",
+            "workstation_policy_id",
+        )
+    }
+
+
+def _default_entries() -> Dict[str, Optional[int]]:
+    core = get_core_settings()
+    return {
+        AgentMonType.SERVER: core.server_policy_id,
+        AgentMonType.WORKSTATION: core.workstation_policy_id,
+    }
+
+
+def build_policy_index() -> Dict[str, Any]:
+    index = {
+        "policies": _policy_entries(),
+        "sites": _site_entries(),
+        "clients": _client_entries(),
+        "default": _default_entries(),
+    }
+    cache.set(POLICY_INDEX_CACHE_KEY, index, 600)
+    return index
+
+
+def get_policy_index() -> Dict[str, Any]:
+    index = cache.get(POLICY_INDEX_CACHE_KEY)
+    if isinstance(index, dict):
+        return index
+
+    return build_policy_index()
+
+
+def refresh_policy_index(
+    *,
+    policies: Iterable[int] = (),
+    sites: Iterable[int] = (),
+    clients: Iterable[int] = (),
+    default: bool = False,
+) -> None:
+    """
+    Updates only the given entries of the cached policy index. Entries whose
+    rows no longer exist are removed. Nothing is done if the index isn't
+    cached since it will be built on the next read.
+    """
+    index = cache.get(POLICY_INDEX_CACHE_KEY)
+    if not isinstance(index, dict):
+        return
+
+    for key, pks, func in (
+        ("policies", set(policies), _policy_entries),
+        ("sites", set(sites), _site_entries),
+        ("clients", set(clients), _client_entries),
+    ):
+        if not pks:
+            continue
+
+        entries = func(pks)
+        for pk in pks:
+            if pk in entries:
+                index[key][pk] = entries[pk]
+            else:
+                index[key].pop(pk, None)
+
+    if default:
+        index["default"] = _default_entries()
+
+    cache.set(POLICY_INDEX_CACHE_KEY, index, 600)
+
+
+def invalidate_policy_index() -> None:
+    cache.delete(POLICY_INDEX_CACHE_KEY)
+
+
+def _is_excluded(
+    index: Dict[str, Any], policy_id: int, agent: "Agent", client_id: int
+) -> bool:
+    policy = index["policies"].get(policy_id)
+    return (
+        policy is None
+        or agent.pk in policy["agents"]
+        or agent.site_id in policy["sites"]
+        or client_id in policy["clients"]
+    )
+
+
+def is_agent_excluded(policy_id: int, agent: "Agent") -> bool:
+    index = get_policy_index()
+    if agent.site_id not in index["sites"]:
+        index = build_policy_index()
+
+    client_id = index["sites"][agent.site_id][0]
+    return _is_excluded(index, policy_id, agent, client_id)
+
+
+def resolve_agent_policy_ids(agent: "Agent") -> Dict[str, Optional[int]]:
+    """
+    Returns the pks of the policies applied to the agent in order of priority,
+    with exclusions and blocked inheritance taken into account.
+    """
+    index = get_policy_index()
+    site = index["sites"].get(agent.site_id)
+    client = index["clients"].get(site[0]) if site else None
+    if site is None or client is None:
+        # new site or client since the index was built
+        index = build_policy_index()
+        site = index["sites"][agent.site_id]
+        client = index["clients"][site[0]]
+
+    client_id, site_blocked, site_server, site_workstation = site
+    client_blocked, client_server, client_workstation = client
+    server = agent.monitoring_type == AgentMonType.SERVER
+
+    def applied(pk: Optional[int]) -> Optional[int]:
+        if pk and not _is_excluded(index, pk, agent, client_id):
+            return pk
+        return None
+
+    agent_blocked = agent.block_policy_inheritance
+    return {
+        "agent_policy": applied(agent.policy_id),
+        "site_policy": (
+            applied(site_server if server else site_workstation)
+            if not agent_blocked
+            else None
+        ),
+        "client_policy": (
+            applied(client_server if server else client_workstation)
+            if not agent_blocked and not site_blocked
+            else None
+        ),
+        "default_policy": (
+            applied(index["default"].get(agent.monitoring_type))
+            if not agent_blocked and not site_blocked and not client_blocked
+            else None
+        ),
+    }
@@ -0,0 +1,18 @@
+# Generated by Django 4.2.30 on 2026-10-18 21:08
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("autotasks", "0041_automatedtask_task_supported_platforms_and_more"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="taskresult",
+            name="next_run",
+            field=models.DateTimeField(blank=True, db_index=True, null=True),
+        ),
+    ]
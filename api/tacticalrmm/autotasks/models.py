@@ -19,6 +19,7 @@ from logs.models import BaseAuditModel
 from tacticalrmm.constants import (
     FIELDS_TRIGGER_TASK_UPDATE_AGENT,
     POLICY_TASK_FIELDS_TO_COPY,
+    TASK_SCHEDULE_FIELDS,
     AgentPlat,
     AlertSeverity,
     TaskRunStatus,
@@ -163,9 +164,16 @@ class AutomatedTask(BaseAuditModel):
             cache.delete_many_pattern("agent_*_tasks")
 
         # get old task if exists
-        old_task = AutomatedTask.objects.get(pk=self.pk) if self.pk else None
+        old_task = self.get_old_instance()
         super().save(old_model=old_task, *args, **kwargs)
 
+        # the runner recomputes the next run of results that don't have one
+        if old_task and any(
+            getattr(self, field) != getattr(old_task, field)
+            for field in TASK_SCHEDULE_FIELDS
+        ):
+            TaskResult.objects.filter(task=self).update(next_run=None)
+
         # check if fields were updated that require a sync to the agent and set status to notsynced
         if old_task:
             for field in self.fields_that_trigger_task_update_on_agent:
@@ -534,6 +542,8 @@ class TaskResult(models.Model):
     run_status = models.CharField(
         max_length=30, choices=TaskRunStatus.choices, null=True, blank=True
     )
+    # next time scheduled_task_runner runs the task on a non windows agent
+    next_run = models.DateTimeField(null=True, blank=True, db_index=True)
 
     def __str__(self):
         return f"{self.task}"
@@ -193,3 +193,63 @@ def test_monthly_DOW_3(setup_instance, mock_abulk_nats_command):
     ret = scheduled_task_runner()
     mock_abulk_nats_command.assert_not_called()
     assert len(ret) == 0
+
+
+@time_machine.travel(dt.datetime(2025, 3, 22, 11, 33, tzinfo=los_angeles))
+@pytest.mark.django_db
+def test_next_run_index(setup_instance, mock_abulk_nats_command):
+    from autotasks.models import TaskResult
+
+    scheduled_task_runner()
+
+    results = TaskResult.objects.select_related("task", "agent")
+    assert not results.filter(
+        agent__plat=AgentPlat.WINDOWS, next_run__isnull=False
+    ).exists()
+
+    expected = {
+        TaskType.DAILY: dt.datetime(2025, 3, 23, 11, 33, tzinfo=los_angeles),
+        TaskType.WEEKLY: dt.datetime(2025, 3, 25, 17, 55, tzinfo=los_angeles),
+        TaskType.MONTHLY: dt.datetime(2025, 3, 29, 1, 23, tzinfo=los_angeles),
+    }
+    for result in results.exclude(agent__plat=AgentPlat.WINDOWS):
+        if result.task.task_type in expected:
+            assert result.next_run == expected[result.task.task_type]
+
+    # the results that ran already point at their next run
+    assert scheduled_task_runner() == []
+
+    # changing the schedule invalidates the stored next run
+    task = results.get(agent__plat=AgentPlat.LINUX, task__task_type=TaskType.DAILY).task
+    task.run_time_date = dt.datetime(2025, 3, 22, 11, 33, tzinfo=utc_time)
+    task.save()
+    assert TaskResult.objects.get(task=task).next_run == expected[TaskType.DAILY]
+
+    task.run_time_date = dt.datetime(2025, 3, 22, 11, 40, tzinfo=utc_time)
+    task.save()
+    assert TaskResult.objects.get(task=task).next_run is None
+
+    assert scheduled_task_runner() == []
+    assert TaskResult.objects.get(task=task).next_run == dt.datetime(
+        2025, 3, 22, 11, 40, tzinfo=los_angeles
+    )
+
+
+@time_machine.travel(dt.datetime(2025, 11, 2, 1, 0, tzinfo=los_angeles))
+@pytest.mark.django_db
+def test_next_run_dst(setup_instance):
+    from autotasks.models import TaskResult
+    from tacticalrmm.scheduler import get_next_run
+
+    result = TaskResult.objects.select_related("task", "agent").get(
+        agent__plat=AgentPlat.LINUX, task__task_type=TaskType.DAILY
+    )
+    result.task.run_time_date = dt.datetime(2025, 1, 1, 1, 30, tzinfo=utc_time)
+
+    # 1:30 happens twice when dst ends
+    first = get_next_run(result.task, result.agent, result, djangotime.now())
+    assert first == dt.datetime(2025, 11, 2, 8, 30, tzinfo=utc_time)
+    second = get_next_run(
+        result.task, result.agent, result, first + dt.timedelta(minutes=1)
+    )
+    assert second == dt.datetime(2025, 11, 2, 9, 30, tzinfo=utc_time)
@@ -0,0 +1,18 @@
+from django.core.management.base import BaseCommand
+
+from checks.utils import check_history_is_partitioned, partition_check_history
+
+
+class Command(BaseCommand):
+    help = "Convert the check history table to daily partitions so pruning drops partitions instead of deleting rows"
+
+    def handle(self, *args, **kwargs):
+        if check_history_is_partitioned():
+            self.stdout.write(
+                self.style.WARNING("Check history is already partitioned")
+            )
+            return
+
+        self.stdout.write("Partitioning check history, this might take a while...")
+        partition_check_history()
+        self.stdout.write(self.style.SUCCESS("Check history was partitioned"))
@@ -10,6 +10,8 @@ from django.utils import timezone as djangotime
 from core.utils import get_core_settings
 from logs.models import BaseAuditModel
 from tacticalrmm.constants import (
+    CHECK_HISTORY_BUFFER_KEY,
+    CHECK_HISTORY_FLUSH_BATCH,
     CHECKS_NON_EDITABLE_FIELDS,
     POLICY_CHECK_FIELDS_TO_COPY,
     AlertSeverity,
@@ -173,7 +175,9 @@ class Check(BaseAuditModel):
 
         # if check is an agent check
         elif self.agent:
-            cache.delete(f"agent_{self.agent.agent_id}_checks")
+            cache.delete(
+                f"agent_{self.agent.agent_id}_{self.agent.get_policies_cache_key()}_checks"
+            )
 
         super().save(*args, **kwargs)
 
@@ -185,7 +189,9 @@ class Check(BaseAuditModel):
 
         # if check is an agent check
         elif self.agent:
-            cache.delete(f"agent_{self.agent.agent_id}_checks")
+            cache.delete(
+                f"agent_{self.agent.agent_id}_{self.agent.get_policies_cache_key()}_checks"
+            )
 
         super().delete(*args, **kwargs)
 
@@ -255,9 +261,22 @@ class Check(BaseAuditModel):
     def add_check_history(
         self, value: int, agent_id: str, more_info: Any = None
     ) -> None:
-        CheckHistory.objects.create(
-            check_id=self.pk, y=value, results=more_info, agent_id=agent_id
-        )
+        row = {
+            "check_id": self.pk,
+            "agent_id": agent_id,
+            "x": djangotime.now(),
+            "y": value,
+            "results": more_info,
+        }
+
+        # rows are buffered in redis and written in bulk by flush_check_history_task
+        length = cache.list_push(CHECK_HISTORY_BUFFER_KEY, row)
+        if not length:
+            CheckHistory.objects.create(**row)
+        elif length % CHECK_HISTORY_FLUSH_BATCH == 0:
+            from checks.tasks import flush_check_history_task
+
+            flush_check_history_task.delay()
 
     @staticmethod
     def serialize(check):
@@ -362,7 +381,9 @@ class CheckResult(models.Model):
 
     def handle_check(self, data, check: "Check", agent: "Agent"):
         from alerts.models import Alert
+        from core.tasks import update_agent_checks_rollup_task
 
+        prev_state = (self.status, self.alert_severity)
         update_fields = []
         # cpuload or mem checks
         if check.check_type in (CheckType.CPU_LOAD, CheckType.MEMORY):
@@ -531,6 +552,10 @@ class CheckResult(models.Model):
             update_fields.extend(["last_run"])
             self.save(update_fields=update_fields)
 
+        # only a status/severity change can move the agent, site and client rollups
+        if (self.status, self.alert_severity) != prev_state:
+            update_agent_checks_rollup_task.delay(agent.pk)
+
         return self.status
 
     def send_email(self):
@@ -680,7 +705,7 @@ class CheckHistory(models.Model):
     id = models.BigAutoField(primary_key=True)
     check_id = models.PositiveIntegerField(default=0)
     agent_id = models.CharField(max_length=200, null=True, blank=True)
-    x = models.DateTimeField(auto_now_add=True)
+    x = models.DateTimeField(default=djangotime.now)
     y = models.PositiveIntegerField(null=True, blank=True, default=None)
     results = models.JSONField(null=True, blank=True)
 
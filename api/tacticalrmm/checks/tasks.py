@@ -2,13 +2,21 @@ import datetime as dt
 from time import sleep
 from typing import Optional
 
+from django.core.cache import cache
 from django.utils import timezone as djangotime
 
 from alerts.models import Alert
-from checks.models import CheckResult
+from checks.models import CheckHistory, CheckResult
+from checks.utils import check_history_is_partitioned, drop_check_history_partitions
 from tacticalrmm.celery import app
+from tacticalrmm.constants import (
+    CHECK_HISTORY_BUFFER_KEY,
+    CHECK_HISTORY_FLUSH_BATCH,
+    FLUSH_CHECK_HISTORY_LOCK,
+)
 from tacticalrmm.helpers import rand_range
 from tacticalrmm.logger import logger
+from tacticalrmm.utils import redis_lock
 
 
 @app.task
@@ -119,11 +127,35 @@ def handle_resolved_check_email_alert_task(pk: int) -> str:
 
 @app.task
 def prune_check_history(older_than_days: int) -> str:
-    from .models import CheckHistory
+    older_than = djangotime.now() - djangotime.timedelta(days=older_than_days)
 
-    c, _ = CheckHistory.objects.filter(
-        x__lt=djangotime.now() - djangotime.timedelta(days=older_than_days)
-    ).delete()
+    if check_history_is_partitioned():
+        dropped = drop_check_history_partitions(older_than)
+        logger.info(f"Dropped {dropped} check history partitions")
+
+    c, _ = CheckHistory.objects.filter(x__lt=older_than).delete()
     logger.info(f"Pruned {c} check history objects")
 
     return "ok"
+
+
+@app.task(bind=True)
+def flush_check_history_task(self) -> str:
+    with redis_lock(FLUSH_CHECK_HISTORY_LOCK, self.app.oid) as acquired:
+        if not acquired:
+            return f"{self.app.oid} still running"
+
+        while rows := cache.list_pop_many(
+            CHECK_HISTORY_BUFFER_KEY, CHECK_HISTORY_FLUSH_BATCH
+        ):
+            try:
+                CheckHistory.objects.bulk_create([CheckHistory(**row) for row in rows])
+            except Exception:
+                # put the rows back so the next run can retry them
+                cache.list_push(CHECK_HISTORY_BUFFER_KEY, *rows)
+                raise
+
+            if len(rows) < CHECK_HISTORY_FLUSH_BATCH:
+                break
+
+    return "ok"
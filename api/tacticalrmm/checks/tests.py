@@ -1,6 +1,8 @@
+from itertools import cycle
 from unittest.mock import patch
 
 from django.conf import settings
+from django.db import connection
 from django.utils import timezone as djangotime
 from model_bakery import baker
 
@@ -350,6 +352,86 @@ class TestCheckTasks(TacticalTestCase):
         prune_check_history(0)
         self.assertEqual(CheckHistory.objects.count(), 0)
 
+    def test_prune_partitioned_check_history(self):
+        from .tasks import prune_check_history
+        from .utils import (
+            CHECK_HISTORY_TABLE,
+            check_history_is_partitioned,
+            partition_check_history,
+        )
+
+        check = baker.make_recipe("checks.diskspace_check")
+        now = djangotime.now()
+        baker.make(
+            "checks.CheckHistory",
+            check_id=check.id,
+            x=cycle([now - djangotime.timedelta(days=d) for d in (0, 10, 35, 40)]),
+            _quantity=40,
+        )
+
+        self.assertFalse(check_history_is_partitioned())
+        partition_check_history()
+        self.assertTrue(check_history_is_partitioned())
+        self.assertEqual(CheckHistory.objects.count(), 40)
+
+        # new rows keep getting unique ids
+        max_id = max(CheckHistory.objects.values_list("id", flat=True))
+        self.assertGreater(CheckHistory.objects.create(check_id=check.id).id, max_id)
+
+        prune_check_history(30)
+        self.assertEqual(CheckHistory.objects.count(), 21)
+        self.assertFalse(
+            CheckHistory.objects.filter(
+                x__lt=now - djangotime.timedelta(days=30)
+            ).exists()
+        )
+
+        with connection.cursor() as cursor:
+            cursor.execute(
+                "SELECT count(*) FROM pg_inherits WHERE inhparent = to_regclass(%s)",
+                [CHECK_HISTORY_TABLE],
+            )
+            # default partition and the days from the cutoff up to 3 days ahead
+            self.assertEqual(cursor.fetchone()[0], 1 + 31 + 3)
+
+    @patch("checks.models.cache")
+    def test_add_check_history_buffered(self, mock_cache):
+        check = baker.make_recipe("checks.diskspace_check", agent=self.agent)
+
+        mock_cache.list_push.return_value = 1
+        check.add_check_history(50, self.agent.agent_id, "more info")
+        self.assertFalse(CheckHistory.objects.exists())
+        row = mock_cache.list_push.call_args.args[1]
+        self.assertEqual(row["check_id"], check.pk)
+        self.assertEqual(row["y"], 50)
+
+        # falls back to a direct write when buffering is unavailable
+        mock_cache.list_push.return_value = 0
+        check.add_check_history(60, self.agent.agent_id)
+        self.assertEqual(CheckHistory.objects.get().y, 60)
+
+    @patch("checks.tasks.cache")
+    def test_flush_check_history_task(self, mock_cache):
+        from .tasks import flush_check_history_task
+
+        check = baker.make_recipe("checks.diskspace_check", agent=self.agent)
+        x = djangotime.now() - djangotime.timedelta(minutes=5)
+        rows = [
+            {
+                "check_id": check.pk,
+                "agent_id": self.agent.agent_id,
+                "x": x,
+                "y": i,
+                "results": None,
+            }
+            for i in range(5)
+        ]
+        mock_cache.list_pop_many.side_effect = [rows, []]
+
+        flush_check_history_task()
+        self.assertEqual(CheckHistory.objects.count(), 5)
+        self.assertEqual(CheckHistory.objects.filter(x=x).count(), 5)
+
     def test_handle_script_check(self):
         url = "/api/v3/checkrunner/"
 
@@ -777,6 +859,28 @@ class TestCheckTasks(TacticalTestCase):
         check_result = CheckResult.objects.get(assigned_check=check, agent=self.agent)
         self.assertEqual(check_result.status, CheckStatus.PASSING)
 
+    @patch("core.tasks.update_agent_checks_rollup_task.delay")
+    def test_handle_check_updates_rollup_on_status_change(self, rollup):
+        url = "/api/v3/checkrunner/"
+        check = baker.make_recipe("checks.ping_check", agent=self.agent)
+        data = {
+            "id": check.id,
+            "agent_id": self.agent.agent_id,
+            "status": CheckStatus.FAILING,
+            "output": "reply from a.com",
+        }
+
+        self.client.patch(url, data, format="json")
+        rollup.assert_called_once_with(self.agent.pk)
+
+        # same status again, nothing to propagate
+        self.client.patch(url, data, format="json")
+        rollup.assert_called_once()
+
+        data["status"] = CheckStatus.PASSING
+        self.client.patch(url, data, format="json")
+        self.assertEqual(rollup.call_count, 2)
+
     @patch("agents.models.Agent.nats_cmd")
     def test_handle_winsvc_check(self, nats_cmd):
         url = "/api/v3/checkrunner/"
@@ -1,3 +1,12 @@
+import datetime as dt
+from typing import Optional
+
+from django.db import DatabaseError, connection, transaction
+from django.utils import timezone as djangotime
+
+from tacticalrmm.logger import logger
+
+
 def bytes2human(n: int) -> str:
     # http://code.activestate.com/recipes/578019
     symbols = ("K", "M", "G", "T", "P", "E", "Z", "Y")
@@ -9,3 +18,143 @@ def bytes2human(n: int) -> str:
             value = float(n) / prefix[s]
             return "%.1f%s" % (value, s)
     return "%sB" % n
+
+
+CHECK_HISTORY_TABLE = "checks_checkhistory"
+
+
+def _check_history_partition_name(day: dt.date) -> str:
+    return f"{CHECK_HISTORY_TABLE}_p{day:%Y%m%d}"
+
+
+def _day_start(day: dt.date) -> dt.datetime:
+    return dt.datetime.combine(day, dt.time.min, tzinfo=dt.timezone.utc)
+
+
+def check_history_is_partitioned() -> bool:
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT 1 FROM pg_partitioned_table WHERE partrelid = to_regclass(%s)",
+            [CHECK_HISTORY_TABLE],
+        )
+        return cursor.fetchone() is not None
+
+
+def create_check_history_partitions(
+    start: Optional[dt.date] = None, days_ahead: int = 3
+) -> int:
+    """
+    Creates the daily partitions from start (defaults to today) up to days_ahead
+    days in the future. Rows outside of them land in the default partition.
+    """
+    today = djangotime.now().astimezone(dt.timezone.utc).date()
+    day = start or today
+    created = 0
+    with connection.cursor() as cursor:
+        while day <= today + dt.timedelta(days=days_ahead):
+            name = _check_history_partition_name(day)
+            cursor.execute("SELECT to_regclass(%s)", [name])
+            if cursor.fetchone()[0] is None:
+                try:
+                    with transaction.atomic():
+                        cursor.execute(
+                            f"CREATE TABLE {connection.ops.quote_name(name)} "
+                            f"PARTITION OF {CHECK_HISTORY_TABLE} "
+                            "FOR VALUES FROM (%s) TO (%s)",
+                            [_day_start(day), _day_start(day + dt.timedelta(days=1))],
+                        )
+                    created += 1
+                except DatabaseError as e:
+                    # the default partition already holds rows for this day
+                    logger.error(f"Unable to create partition {name}: {e}")
+            day += dt.timedelta(days=1)
+
+    return created
+
+
+def drop_check_history_partitions(older_than: dt.datetime) -> int:
+    """Drops the daily partitions that only hold rows older than older_than"""
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT c.relname FROM pg_inherits i "
+            "JOIN pg_class c ON c.oid = i.inhrelid "
+            "WHERE i.inhparent = to_regclass(%s)",
+            [CHECK_HISTORY_TABLE],
+        )
+        names = [row[0] for row in cursor.fetchall()]
+
+        dropped = 0
+        prefix = f"{CHECK_HISTORY_TABLE}_p"
+        for name in names:
+            if not name.startswith(prefix):
+                continue
+
+            day = dt.datetime.strptime(name[len(prefix) :], "%Y%m%d").date()
+            if _day_start(day + dt.timedelta(days=1)) <= older_than:
+                cursor.execute(f"DROP TABLE {connection.ops.quote_name(name)}")
+                dropped += 1
+
+    return dropped
+
+
+def partition_check_history() -> None:
+    """
+    Converts the check history table into a table range partitioned by day on x,
+    so pruning can drop whole partitions. Existing rows are copied over.
+    """
+    qn = connection.ops.quote_name
+    old_table = f"{CHECK_HISTORY_TABLE}_unpartitioned"
+
+    with transaction.atomic(), connection.cursor() as cursor:
+        cursor.execute(f"LOCK TABLE {CHECK_HISTORY_TABLE} IN ACCESS EXCLUSIVE MODE")
+        cursor.execute(
+            "SELECT pg_get_serial_sequence(%s, 'id'), "
+            "(SELECT min(x) FROM checks_checkhistory)",
+            [CHECK_HISTORY_TABLE],
+        )
+        sequence, first_x = cursor.fetchone()
+        cursor.execute(
+            "SELECT is_identity FROM information_schema.columns "
+            "WHERE table_name = %s AND column_name = 'id'",
+            [CHECK_HISTORY_TABLE],
+        )
+        is_identity = cursor.fetchone()[0] == "YES"
+
+        cursor.execute(f"ALTER TABLE {CHECK_HISTORY_TABLE} RENAME TO {qn(old_table)}")
+        cursor.execute(
+            f"ALTER TABLE {qn(old_table)} "
+            f"RENAME CONSTRAINT {CHECK_HISTORY_TABLE}_pkey TO {qn(old_table + '_pkey')}"
+        )
+        cursor.execute(
+            f"CREATE TABLE {CHECK_HISTORY_TABLE} (LIKE {qn(old_table)} "
+            "INCLUDING DEFAULTS INCLUDING IDENTITY INCLUDING CONSTRAINTS) "
+            "PARTITION BY RANGE (x)"
+        )
+        # the partition key has to be part of the primary key
+        cursor.execute(
+            f"ALTER TABLE {CHECK_HISTORY_TABLE} "
+            f"ADD CONSTRAINT {CHECK_HISTORY_TABLE}_pkey PRIMARY KEY (id, x)"
+        )
+        if not is_identity:
+            # keep the serial sequence when the old table is dropped
+            cursor.execute(
+                f"ALTER SEQUENCE {sequence} OWNED BY {CHECK_HISTORY_TABLE}.id"
+            )
+        cursor.execute(
+            f"CREATE TABLE {CHECK_HISTORY_TABLE}_default "
+            f"PARTITION OF {CHECK_HISTORY_TABLE} DEFAULT"
+        )
+
+        first_day = first_x.astimezone(dt.timezone.utc).date() if first_x else None
+        create_check_history_partitions(start=first_day)
+
+        cursor.execute(
+            f"INSERT INTO {CHECK_HISTORY_TABLE} SELECT * FROM {qn(old_table)}"
+        )
+        if is_identity:
+            cursor.execute(
+                "SELECT setval(pg_get_serial_sequence(%s, 'id'), "
+                "coalesce(max(id), 0) + 1, false) FROM checks_checkhistory",
+                [CHECK_HISTORY_TABLE],
+            )
+        cursor.execute(f"DROP TABLE {qn(old_table)}")
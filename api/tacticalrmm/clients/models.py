@@ -2,7 +2,6 @@ import uuid
 from typing import Dict
 
 from django.contrib.postgres.fields import ArrayField
-from django.core.cache import cache
 from django.db import models
 
 from agents.models import Agent
@@ -46,9 +45,11 @@ class Client(BaseAuditModel):
 
     def save(self, *args, **kwargs):
         from alerts.tasks import cache_agents_alert_template
+        from automation.utils import refresh_policy_index
+        from winupdate.utils import invalidate_patch_windows
 
         # get old client if exists
-        old_client = Client.objects.get(pk=self.pk) if self.pk else None
+        old_client = self.get_old_instance()
         super().save(old_model=old_client, *args, **kwargs)
 
         # check if polcies have changed and initiate task to reapply policies if so
@@ -59,18 +60,14 @@ class Client(BaseAuditModel):
         ):
             cache_agents_alert_template.delay()
 
-        if old_client and (
-            old_client.workstation_policy != self.workstation_policy
-            or old_client.server_policy != self.server_policy
+        if not old_client or (
+            old_client.workstation_policy_id != self.workstation_policy_id
+            or old_client.server_policy_id != self.server_policy_id
+            or old_client.block_policy_inheritance != self.block_policy_inheritance
         ):
-            sites = self.sites.all()
-            if old_client.workstation_policy != self.workstation_policy:
-                for site in sites:
-                    cache.delete_many_pattern(f"site_workstation_*{site.pk}_*")
-
-            if old_client.server_policy != self.server_policy:
-                for site in sites:
-                    cache.delete_many_pattern(f"site_server_*{site.pk}_*")
+            refresh_policy_index(clients=[self.pk])
+            if old_client:
+                invalidate_patch_windows(Agent.objects.filter(site__client=self))
 
     class Meta:
         ordering = ("name",)
@@ -121,12 +118,19 @@ class Site(BaseAuditModel):
     )
 
     def save(self, *args, **kwargs):
+        from accounts.utils import invalidate_role_visibility
         from alerts.tasks import cache_agents_alert_template
+        from automation.utils import refresh_policy_index
+        from winupdate.utils import invalidate_patch_windows
 
         # get old client if exists
-        old_site = Site.objects.get(pk=self.pk) if self.pk else None
+        old_site = self.get_old_instance()
         super().save(old_model=old_site, *args, **kwargs)
 
+        # roles that can view the client can view its new sites
+        if not old_site or old_site.client_id != self.client_id:
+            invalidate_role_visibility()
+
         # check if polcies have changed and initiate task to reapply policies if so
         if old_site:
             if (
@@ -137,11 +141,15 @@ class Site(BaseAuditModel):
             ):
                 cache_agents_alert_template.delay()
 
-            if old_site.workstation_policy != self.workstation_policy:
-                cache.delete_many_pattern(f"site_workstation_*{self.pk}_*")
-
-            if old_site.server_policy != self.server_policy:
-                cache.delete_many_pattern(f"site_server_*{self.pk}_*")
+        if not old_site or (
+            old_site.workstation_policy_id != self.workstation_policy_id
+            or old_site.server_policy_id != self.server_policy_id
+            or old_site.block_policy_inheritance != self.block_policy_inheritance
+            or old_site.client_id != self.client_id
+        ):
+            refresh_policy_index(sites=[self.pk])
+            if old_site:
+                invalidate_patch_windows(self.agents.all())
 
     class Meta:
         ordering = ("name",)
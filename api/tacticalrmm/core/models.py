@@ -12,6 +12,7 @@ from django.contrib.postgres.fields import ArrayField
 from django.core.cache import cache
 from django.core.exceptions import ValidationError
 from django.db import models
+from django.db.models import Q
 from twilio.base.exceptions import TwilioRestException
 from twilio.rest import Client as TwClient
 
@@ -197,17 +198,27 @@ class CoreSettings(BaseAuditModel):
             ):
                 cache_agents_alert_template.delay()
 
-            if old_settings.workstation_policy != self.workstation_policy:
-                cache.delete_many_pattern("site_workstation_*")
-
-            if old_settings.server_policy != self.server_policy:
-                cache.delete_many_pattern("site_server_*")
-
             if (
                 old_settings.server_policy != self.server_policy
                 or old_settings.workstation_policy != self.workstation_policy
             ):
-                cache.delete_many_pattern("agent_*")
+                from automation.utils import refresh_policy_index
+                from winupdate.utils import invalidate_patch_windows
+
+                refresh_policy_index(default=True)
+                invalidate_patch_windows()
+
+            if old_settings.default_time_zone != self.default_time_zone:
+                from agents.models import Agent
+                from autotasks.models import TaskResult
+                from winupdate.utils import invalidate_patch_windows
+
+                TaskResult.objects.filter(
+                    Q(agent__time_zone__isnull=True) | Q(agent__time_zone="")
+                ).update(next_run=None)
+                invalidate_patch_windows(
+                    Agent.objects.filter(Q(time_zone__isnull=True) | Q(time_zone=""))
+                )
 
     def __str__(self) -> str:
         return "Global Site Settings"
@@ -1,5 +1,7 @@
 import asyncio
+import time
 import traceback
+from collections import defaultdict
 from contextlib import suppress
 from time import sleep
 from typing import TYPE_CHECKING, Any
@@ -8,7 +10,7 @@ import nats
 from django.conf import settings
 from django.core.cache import cache
 from django.db import transaction
-from django.db.models import Prefetch
+from django.db.models import Exists, OuterRef, Prefetch, Q
 from django.db.utils import DatabaseError
 from django.utils import timezone as djangotime
 from packaging import version as pyver
@@ -17,12 +19,16 @@ from accounts.models import User
 from accounts.utils import is_superuser
 from agents.models import Agent
 from agents.tasks import clear_faults_task, prune_agent_history
-from agents.utils import calculate_agent_checks
+from agents.utils import agent_status_q, calculate_agent_checks
 from alerts.models import Alert
 from alerts.tasks import prune_resolved_alerts
 from autotasks.models import AutomatedTask, TaskResult
 from checks.models import Check, CheckHistory, CheckResult
 from checks.tasks import prune_check_history
+from checks.utils import (
+    check_history_is_partitioned,
+    create_check_history_partitions,
+)
 from clients.models import Client, Site
 from core.mesh_utils import (
     MeshSync,
@@ -40,11 +46,13 @@ from tacticalrmm.celery import app
 from tacticalrmm.constants import (
     AGENT_CHECKS_CACHE_PREFIX,
     AGENT_DEFER,
+    AGENT_FAILING_DATA_CACHE_PREFIX,
     AGENT_STATUS_ONLINE,
     AGENT_STATUS_OVERDUE,
     CACHE_DB_FIELDS_TASK_LOCK,
     RESOLVE_ALERTS_LOCK,
     SYNC_MESH_PERMS_TASK_LOCK,
+    SYNC_SCHED_TASK_CONCURRENCY,
     SYNC_SCHED_TASK_LOCK,
     AgentPlat,
     AlertSeverity,
@@ -60,16 +68,12 @@ from tacticalrmm.helpers import make_random_password, setup_nats_options
 from tacticalrmm.logger import logger
 from tacticalrmm.nats_utils import a_nats_cmd, abulk_nats_command
 from tacticalrmm.permissions import _has_perm_on_agent
-from tacticalrmm.scheduler import (
-    should_run_daily_task,
-    should_run_monthly_dow_task,
-    should_run_monthly_task,
-    should_run_once_task,
-    should_run_weekly_task,
-)
+from tacticalrmm.scheduler import get_next_run
 from tacticalrmm.utils import redis_lock
 
 if TYPE_CHECKING:
+    from collections.abc import Iterable
+
     from django.db.models import QuerySet
     from nats.aio.client import Client as NATSClient
 
@@ -101,6 +105,9 @@ def core_maintenance_tasks() -> None:
 
     remove_orphaned_history_results()
 
+    if check_history_is_partitioned():
+        create_check_history_partitions()
+
     core = get_core_settings()
 
     # remove old CheckHistory data
@@ -187,17 +194,21 @@ def resolve_alerts_task(self) -> str:
         if not acquired:
             return f"{self.app.oid} still running"
 
-        # TODO rework this to not use an agent queryset, use Alerts
-        for agent in _get_agent_qs():
-            if (
-                pyver.parse(agent.version) >= pyver.parse("1.6.0")
-                and agent.status == AGENT_STATUS_ONLINE
-            ):
+        # only agents that are back online but still have an open availability alert
+        unresolved = Alert.objects.filter(
+            agent=OuterRef("pk"), alert_type=AlertType.AVAILABILITY, resolved=False
+        )
+        agents = (
+            Agent.objects.defer(*AGENT_DEFER)
+            .select_related("site__client", "alert_template")
+            .filter(agent_status_q(AGENT_STATUS_ONLINE), maintenance_mode=False)
+            .filter(Exists(unresolved))
+        )
+        for agent in agents:
+            if pyver.parse(agent.version) >= pyver.parse("1.6.0"):
                 # handles any alerting actions
-                if Alert.objects.filter(
-                    alert_type=AlertType.AVAILABILITY, agent=agent, resolved=False
-                ).exists():
-                    Alert.handle_alert_resolve(agent)
+                Alert.handle_alert_resolve(agent)
+                update_agent_checks_rollup(agent.pk)
 
         return "completed"
 
@@ -208,16 +219,21 @@ def sync_scheduled_tasks(self) -> str:
         if not acquired:
             return f"{self.app.oid} still running"
 
-        actions: list[tuple[str, int, Agent, Any, str, str]] = []  # list of tuples
+        start = time.monotonic()
+        # (action, task, task result or None, agent)
+        actions: list[tuple[str, "AutomatedTask", TaskResult | None, Agent]] = []
+        missing_results: list[TaskResult] = []
 
         for agent in _get_agent_qs():
             if agent.is_posix:
                 for task in agent.get_tasks_with_policies():
-                    try:
-                        _ = TaskResult.objects.get(agent=agent, task=task)
-                    except TaskResult.DoesNotExist:
-                        TaskResult.objects.create(
-                            agent=agent, task=task, sync_status=TaskSyncStatus.SYNCED
+                    if not isinstance(task.task_result, TaskResult):
+                        missing_results.append(
+                            TaskResult(
+                                agent=agent,
+                                task=task,
+                                sync_status=TaskSyncStatus.SYNCED,
+                            )
                         )
 
             elif (
@@ -226,122 +242,117 @@ def sync_scheduled_tasks(self) -> str:
             ):
                 # create a list of tasks to be synced so we can run them asynchronously
                 for task in agent.get_tasks_with_policies():
-                    # TODO can we just use agent??
-                    agent_obj: "Agent" = agent if task.policy else task.agent
-
                     # onboarding tasks require agent >= 2.6.0
                     if task.task_type == TaskType.ONBOARDING and pyver.parse(
                         agent.version
                     ) < pyver.parse("2.6.0"):
                         continue
 
+                    task_result = (
+                        task.task_result
+                        if isinstance(task.task_result, TaskResult)
+                        else None
+                    )
+
                     # policy tasks will be an empty dict on initial
-                    if (not task.task_result) or (
-                        isinstance(task.task_result, TaskResult)
-                        and task.task_result.sync_status == TaskSyncStatus.INITIAL
-                    ):
-                        actions.append(
-                            (
-                                "create",
-                                task.id,
-                                agent_obj,
-                                task.generate_nats_task_payload(),
-                                agent.agent_id,
-                                agent.hostname,
-                            )
-                        )
-                    elif (
-                        isinstance(task.task_result, TaskResult)
-                        and task.task_result.sync_status
-                        == TaskSyncStatus.PENDING_DELETION
-                    ):
-                        actions.append(
-                            (
-                                "delete",
-                                task.id,
-                                agent_obj,
-                                {},
-                                agent.agent_id,
-                                agent.hostname,
-                            )
-                        )
-                    elif (
-                        isinstance(task.task_result, TaskResult)
-                        and task.task_result.sync_status == TaskSyncStatus.NOT_SYNCED
+                    if (
+                        not task_result
+                        or task_result.sync_status == TaskSyncStatus.INITIAL
                     ):
-                        actions.append(
-                            (
-                                "modify",
-                                task.id,
-                                agent_obj,
-                                task.generate_nats_task_payload(),
-                                agent.agent_id,
-                                agent.hostname,
-                            )
-                        )
+                        actions.append(("create", task, task_result, agent))
+                    elif task_result.sync_status == TaskSyncStatus.PENDING_DELETION:
+                        actions.append(("delete", task, task_result, agent))
+                    elif task_result.sync_status == TaskSyncStatus.NOT_SYNCED:
+                        actions.append(("modify", task, task_result, agent))
+
+        if missing_results:
+            TaskResult.objects.bulk_create(
+                missing_results, batch_size=500, ignore_conflicts=True
+            )
+
+        # create the missing results of the actions in one go and reload them
+        if new_results := [
+            TaskResult(agent=agent, task=task)
+            for _, task, task_result, agent in actions
+            if not task_result
+        ]:
+            TaskResult.objects.bulk_create(
+                new_results, batch_size=500, ignore_conflicts=True
+            )
+            results = {
+                (r.agent_id, r.task_id): r
+                for r in TaskResult.objects.filter(
+                    agent_id__in={r.agent_id for r in new_results},
+                    task_id__in={r.task_id for r in new_results},
+                )
+            }
+            actions = [
+                (action, task, task_result or results[(agent.pk, task.pk)], agent)
+                for action, task, task_result, agent in actions
+            ]
+
+        updated: list[TaskResult] = []
+        deleted: list[tuple["AutomatedTask", str]] = []
+        metrics = {"create": 0, "modify": 0, "delete": 0, "failed": 0, "timeout": 0}
 
         async def _handle_task_on_agent(
-            nc: "NATSClient", actions: tuple[str, int, Agent, Any, str, str]
+            nc: "NATSClient",
+            sem: asyncio.Semaphore,
+            action: str,
+            task: "AutomatedTask",
+            task_result: TaskResult,
+            agent: Agent,
         ) -> None:
-            # tuple: (0: action, 1: task.id, 2: agent object, 3: nats task payload, 4: agent_id, 5: agent hostname)
-            action = actions[0]
-            task_id = actions[1]
-            agent = actions[2]
-            payload = actions[3]
-            agent_id = actions[4]
-            hostname = actions[5]
-
-            task: "AutomatedTask" = await AutomatedTask.objects.aget(id=task_id)
-            try:
-                task_result = await TaskResult.objects.aget(agent=agent, task=task)
-            except TaskResult.DoesNotExist:
-                task_result = await TaskResult.objects.acreate(agent=agent, task=task)
-
             if action in ("create", "modify"):
-                logger.debug(payload)
+                logger.debug(task.generate_nats_task_payload())
                 nats_data = {
                     "func": "schedtask",
-                    "schedtaskpayload": payload,
+                    "schedtaskpayload": task.generate_nats_task_payload(),
                 }
+            else:
+                nats_data = {
+                    "func": "delschedtask",
+                    "schedtaskpayload": {"name": task.win_task_name},
+                }
+
+            async with sem:
+                r = await a_nats_cmd(
+                    nc=nc, sub=agent.agent_id, data=nats_data, timeout=10
+                )
+
+            metrics[action] += 1
+            if r == "timeout":
+                metrics["timeout"] += 1
 
-                r = await a_nats_cmd(nc=nc, sub=agent_id, data=nats_data, timeout=10)
+            if action in ("create", "modify"):
                 if r != "ok":
+                    metrics["failed"] += 1
                     if action == "create":
                         task_result.sync_status = TaskSyncStatus.INITIAL
                     else:
                         task_result.sync_status = TaskSyncStatus.NOT_SYNCED
 
                     logger.error(
-                        f"Unable to {action} scheduled task {task.name} on {hostname}: {r}"
+                        f"Unable to {action} scheduled task {task.name} on {agent.hostname}: {r}"
                     )
                 else:
                     task_result.sync_status = TaskSyncStatus.SYNCED
                     logger.info(
-                        f"{hostname} task {task.name} was {'created' if action == 'create' else 'modified'}"
+                        f"{agent.hostname} task {task.name} was {'created' if action == 'create' else 'modified'}"
                     )
 
-                await task_result.asave(update_fields=["sync_status"])
+                updated.append(task_result)
             # delete
-            else:
-                nats_data = {
-                    "func": "delschedtask",
-                    "schedtaskpayload": {"name": task.win_task_name},
-                }
-                r = await a_nats_cmd(nc=nc, sub=agent_id, data=nats_data, timeout=10)
-
-                if r != "ok" and "The system cannot find the file specified" not in r:
-                    task_result.sync_status = TaskSyncStatus.PENDING_DELETION
+            elif r != "ok" and "The system cannot find the file specified" not in r:
+                metrics["failed"] += 1
+                task_result.sync_status = TaskSyncStatus.PENDING_DELETION
+                updated.append(task_result)
 
-                    with suppress(DatabaseError):
-                        await task_result.asave(update_fields=["sync_status"])
-
-                    logger.error(
-                        f"Unable to {action} scheduled task {task.name} on {hostname}: {r}"
-                    )
-                else:
-                    task_name = task.name
-                    await task.adelete()
-                    logger.info(f"{hostname} task {task_name} was deleted.")
+                logger.error(
+                    f"Unable to {action} scheduled task {task.name} on {agent.hostname}: {r}"
+                )
+            else:
+                deleted.append((task, agent.hostname))
 
         async def _run():
             opts = setup_nats_options()
@@ -352,82 +363,172 @@ def sync_scheduled_tasks(self) -> str:
                 logger.error(ret)
                 return ret
 
-            if tasks := [_handle_task_on_agent(nc, task) for task in actions]:
+            # bound the number of in flight requests to the agents
+            sem = asyncio.Semaphore(SYNC_SCHED_TASK_CONCURRENCY)
+            if tasks := [_handle_task_on_agent(nc, sem, *action) for action in actions]:
                 await asyncio.gather(*tasks)
 
             await nc.flush()
             await nc.close()
 
-        asyncio.run(_run())
-        return "ok"
+        if actions and (err := asyncio.run(_run())):
+            return err
 
+        with suppress(DatabaseError):
+            TaskResult.objects.bulk_update(updated, ["sync_status"], batch_size=500)
 
-def _get_failing_data(agents: "QuerySet[Agent]") -> dict[str, bool]:
-    data = {"error": False, "warning": False}
-    for agent in agents:
-        if agent.maintenance_mode:
-            break
+        for task, hostname in deleted:
+            task_name = task.name
+            task.delete()
+            logger.info(f"{hostname} task {task_name} was deleted.")
 
-        if (
-            agent.overdue_email_alert
-            or agent.overdue_text_alert
-            or agent.overdue_dashboard_alert
-        ):
-            if agent.status == AGENT_STATUS_OVERDUE:
-                data["error"] = True
-                break
+        ret = (
+            f"{len(actions)} actions (created: {metrics['create']}, "
+            f"modified: {metrics['modify']}, deleted: {metrics['delete']}), "
+            f"{metrics['failed']} failed, {metrics['timeout']} timed out, "
+            f"{len(missing_results)} posix results in {time.monotonic() - start:.2f}s"
+        )
+        logger.info(f"sync_scheduled_tasks: {ret}")
+        return ret
 
-        if agent.checks["has_failing_checks"]:
-            if agent.checks["warning"]:
-                data["warning"] = True
 
-            if agent.checks["failing"]:
-                data["error"] = True
+def _get_agent_failing_data(agent: "Agent", checks: dict[str, Any]) -> dict[str, bool]:
+    data = {"error": False, "warning": False}
+    if agent.maintenance_mode:
+        return data
+
+    if (
+        agent.overdue_email_alert
+        or agent.overdue_text_alert
+        or agent.overdue_dashboard_alert
+    ):
+        if agent.status == AGENT_STATUS_OVERDUE:
+            data["error"] = True
+            return data
+
+    if checks["has_failing_checks"]:
+        if checks["warning"]:
+            data["warning"] = True
+
+        if checks["failing"]:
+            data["error"] = True
+            return data
+
+    if not data["error"] and not data["warning"]:
+        for task in agent.get_tasks_with_policies():
+            if data["error"] and data["warning"]:
                 break
+            elif not isinstance(task.task_result, TaskResult):
+                continue
+            elif (
+                not data["error"]
+                and task.task_result.status == TaskStatus.FAILING
+                and task.alert_severity == AlertSeverity.ERROR
+            ):
+                data["error"] = True
+            elif (
+                not data["warning"]
+                and task.task_result.status == TaskStatus.FAILING
+                and task.alert_severity == AlertSeverity.WARNING
+            ):
+                data["warning"] = True
 
-        if not data["error"] and not data["warning"]:
-            for task in agent.get_tasks_with_policies():
-                if data["error"] and data["warning"]:
-                    break
-                elif not isinstance(task.task_result, TaskResult):
-                    continue
-                elif (
-                    not data["error"]
-                    and task.task_result.status == TaskStatus.FAILING
-                    and task.alert_severity == AlertSeverity.ERROR
-                ):
-                    data["error"] = True
-                elif (
-                    not data["warning"]
-                    and task.task_result.status == TaskStatus.FAILING
-                    and task.alert_severity == AlertSeverity.WARNING
-                ):
-                    data["warning"] = True
+    return data
+
+
+def _merge_failing_data(items: "Iterable[dict[str, bool]]") -> dict[str, bool]:
+    data = {"error": False, "warning": False}
+    for item in items:
+        data["error"] |= item.get("error", False)
+        data["warning"] |= item.get("warning", False)
 
     return data
 
 
+def _cache_agent_rollup(agent: "Agent") -> dict[str, bool]:
+    """
+    Caches the agent's check summary used by the agent table and its
+    failing data used for the site/client rollup.
+    """
+    checks = calculate_agent_checks(agent)
+    cache.set(f"{AGENT_CHECKS_CACHE_PREFIX}{agent.pk}", checks, 86400)
+
+    failing = _get_agent_failing_data(agent, checks=checks)
+    cache.set(f"{AGENT_FAILING_DATA_CACHE_PREFIX}{agent.pk}", failing, 86400)
+    return failing
+
+
+def _save_failing_checks(obj: "Site | Client", data: dict[str, bool]) -> None:
+    if obj.failing_checks != data:
+        obj.failing_checks = data
+        type(obj).objects.filter(pk=obj.pk).update(failing_checks=data)
+
+
+def update_agent_checks_rollup(agent_pk: int) -> None:
+    """
+    Recomputes a single agent's check summary and propagates it to its site and
+    client. The other agents of the site are read from cache and only
+    recomputed when their entry is missing.
+    """
+    agent = _get_agent_qs().filter(pk=agent_pk).first()
+    if not agent:
+        return
+
+    items = [_cache_agent_rollup(agent)]
+
+    other_pks = (
+        Agent.objects.filter(site_id=agent.site_id)
+        .exclude(pk=agent.pk)
+        .values_list("pk", flat=True)
+    )
+    keys = {f"{AGENT_FAILING_DATA_CACHE_PREFIX}{pk}": pk for pk in other_pks}
+    cached = cache.get_many(list(keys))
+    items.extend(cached.values())
+
+    if missing := [pk for key, pk in keys.items() if key not in cached]:
+        items.extend(
+            _cache_agent_rollup(i) for i in _get_agent_qs().filter(pk__in=missing)
+        )
+
+    site = Site.objects.only("pk", "client_id", "failing_checks").get(pk=agent.site_id)
+    _save_failing_checks(site, _merge_failing_data(items))
+
+    client = Client.objects.only("pk", "failing_checks").get(pk=site.client_id)
+    site_data = Site.objects.filter(client_id=client.pk).values_list(
+        "failing_checks", flat=True
+    )
+    _save_failing_checks(client, _merge_failing_data(site_data))
+
+
+@app.task
+def update_agent_checks_rollup_task(agent_pk: int) -> None:
+    update_agent_checks_rollup(agent_pk)
+
+
 @app.task(bind=True)
 def cache_db_fields_task(self) -> None | str:
+    """
+    Periodic reconciliation of the rollups that are otherwise kept up to date
+    by update_agent_checks_rollup when a check or task changes status. Catches
+    time and config driven changes (overdue agents, policy edits, deletions).
+    """
     with redis_lock(CACHE_DB_FIELDS_TASK_LOCK, self.app.oid) as acquired:
         if not acquired:
             return f"{self.app.oid} still running"
 
-        qs = _get_agent_qs()
-        # update client/site failing check fields and agent counts
-        for site in Site.objects.all():
-            agents = qs.filter(site=site)
-            site.failing_checks = _get_failing_data(agents)
-            site.save(update_fields=["failing_checks"])
+        # single pass over the fleet, sites and clients are aggregated from it
+        site_items: defaultdict[int, list[dict[str, bool]]] = defaultdict(list)
+        for agent in _get_agent_qs().iterator(chunk_size=100):
+            site_items[agent.site_id].append(_cache_agent_rollup(agent))
 
-        for client in Client.objects.all():
-            agents = qs.filter(site__client=client)
-            client.failing_checks = _get_failing_data(agents)
-            client.save(update_fields=["failing_checks"])
+        client_items: defaultdict[int, list[dict[str, bool]]] = defaultdict(list)
+        for site in Site.objects.only("pk", "client_id", "failing_checks"):
+            data = _merge_failing_data(site_items[site.pk])
+            _save_failing_checks(site, data)
+            client_items[site.client_id].append(data)
 
-        for agent in qs.iterator(chunk_size=100):
-            data = calculate_agent_checks(agent)
-            cache.set(f"{AGENT_CHECKS_CACHE_PREFIX}{agent.pk}", data, 86400)
+        for client in Client.objects.only("pk", "failing_checks"):
+            _save_failing_checks(client, _merge_failing_data(client_items[client.pk]))
 
 
 @app.task(bind=True)
@@ -606,14 +707,20 @@ def sync_mesh_perms_task(self):
 @app.task
 def scheduled_task_runner():
     now = djangotime.now()
+    minute = now.replace(second=0, microsecond=0)
+    next_minute = minute + djangotime.timedelta(minutes=1)
 
+    # only results due this minute, results whose next run was missed and
+    # results whose next run was invalidated by a task or timezone change
     task_results = (
         TaskResult.objects.filter(task__enabled=True)
+        .filter(Q(next_run__lt=next_minute) | Q(next_run__isnull=True))
         .select_related("task", "agent")
         .only(
             "last_run",
             "run_status",
             "locked_at",
+            "next_run",
             "agent__time_zone",
             "agent__agent_id",
             "agent__hostname",
@@ -632,12 +739,19 @@ def scheduled_task_runner():
 
     items = []
     task_result_pks = []
+    next_runs = {}
     payload = {"func": "runtask"}
 
     for task_result in task_results:
         task = task_result.task
         agent = task_result.agent
-        run = False
+
+        if task_result.next_run is None or task_result.next_run < minute:
+            task_result.next_run = get_next_run(task, agent, task_result, minute)
+            next_runs[task_result.pk] = task_result
+
+        if task_result.next_run >= next_minute:
+            continue
 
         if (
             task_result.locked_at
@@ -649,37 +763,15 @@ def scheduled_task_runner():
             )
             continue
 
-        if task.task_type == TaskType.DAILY:
-            run = should_run_daily_task(task, agent, now)
-
-        elif task.task_type == TaskType.WEEKLY:
-            run = should_run_weekly_task(task, agent, now)
-
-        elif task.task_type == TaskType.MONTHLY:
-            run = should_run_monthly_task(task, agent, now)
+        tmp = {**payload}
+        tmp["taskpk"] = task.pk
+        items.append((agent.agent_id, tmp))
+        task_result_pks.append(task_result.pk)
+        logger.debug(f"Running {task.task_type} task {task.name} on {agent.hostname}")
 
-        elif task.task_type == TaskType.MONTHLY_DOW:
-            run = should_run_monthly_dow_task(task, agent, now)
-
-        elif task.task_type == TaskType.RUN_ONCE:
-            if not task_result.last_run:
-                run = should_run_once_task(task, agent, now)
-
-        elif task.task_type == TaskType.ONBOARDING:
-            if not task_result.last_run and task_result.run_status not in {
-                TaskRunStatus.RUNNING,
-                TaskRunStatus.COMPLETED,
-            }:
-                run = True
-
-        if run:
-            tmp = {**payload}
-            tmp["taskpk"] = task.pk
-            items.append((agent.agent_id, tmp))
-            task_result_pks.append(task_result.pk)
-            logger.debug(
-                f"Running {task.task_type} task {task.name} on {agent.hostname}"
-            )
+        task_result.run_status = TaskRunStatus.RUNNING
+        task_result.next_run = get_next_run(task, agent, task_result, next_minute)
+        next_runs[task_result.pk] = task_result
 
     if items:
         with transaction.atomic():
@@ -690,4 +782,9 @@ def scheduled_task_runner():
                 asyncio.run(abulk_nats_command(items=items))
                 logger.debug(items)
 
+    if next_runs:
+        TaskResult.objects.bulk_update(
+            next_runs.values(), fields=["next_run"], batch_size=500
+        )
+
     return items
@@ -1,5 +1,5 @@
 import os
-from unittest.mock import patch
+from unittest.mock import AsyncMock, patch
 
 import requests
 from channels.db import database_sync_to_async
@@ -12,13 +12,18 @@ from model_bakery import baker
 from rest_framework.authtoken.models import Token
 
 # from agents.models import Agent
+from autotasks.models import AutomatedTask, TaskResult
 from core.utils import get_core_settings, get_mesh_ws_url, get_meshagent_url
 
 # from logs.models import PendingAction
 from tacticalrmm.constants import (  # PAAction,; PAStatus,
     CONFIG_MGMT_CMDS,
+    AgentPlat,
+    AlertSeverity,
+    CheckStatus,
     CustomFieldModel,
     MeshAgentIdent,
+    TaskSyncStatus,
 )
 from tacticalrmm.helpers import get_nats_hosts, get_nats_url
 from tacticalrmm.test import TacticalTestCase
@@ -26,7 +31,12 @@ from tacticalrmm.test import TacticalTestCase
 from .consumers import DashInfo
 from .models import CustomField, GlobalKVStore, URLAction
 from .serializers import CustomFieldSerializer, KeyStoreSerializer, URLActionSerializer
-from .tasks import core_maintenance_tasks  # , resolve_pending_actions
+from .tasks import (  # , resolve_pending_actions
+    cache_db_fields_task,
+    core_maintenance_tasks,
+    sync_scheduled_tasks,
+    update_agent_checks_rollup,
+)
 
 
 class TestCodeSign(TacticalTestCase):
@@ -480,6 +490,132 @@ class TestCoreTasks(TacticalTestCase):
     #     self.assertEqual(complete, 20)
     #     self.assertEqual(old, 20)
 
+    def _make_failing_ping_check(self, agent, severity=AlertSeverity.ERROR):
+        check = baker.make_recipe(
+            "checks.ping_check", agent=agent, alert_severity=severity
+        )
+        return baker.make(
+            "checks.CheckResult",
+            assigned_check=check,
+            agent=agent,
+            status=CheckStatus.FAILING,
+        )
+
+    def test_update_agent_checks_rollup(self):
+        client = baker.make("clients.Client")
+        site1 = baker.make("clients.Site", client=client)
+        site2 = baker.make("clients.Site", client=client)
+        agent = baker.make_recipe("agents.online_agent", site=site1)
+        baker.make_recipe("agents.online_agent", site=site1)
+        baker.make_recipe("agents.online_agent", site=site2)
+
+        result = self._make_failing_ping_check(agent)
+        update_agent_checks_rollup(agent.pk)
+
+        site1.refresh_from_db()
+        site2.refresh_from_db()
+        client.refresh_from_db()
+        self.assertEqual(site1.failing_checks, {"error": True, "warning": False})
+        self.assertEqual(site2.failing_checks, {"error": False, "warning": False})
+        self.assertEqual(client.failing_checks, {"error": True, "warning": False})
+
+        result.status = CheckStatus.PASSING
+        result.save()
+        update_agent_checks_rollup(agent.pk)
+
+        site1.refresh_from_db()
+        client.refresh_from_db()
+        self.assertEqual(site1.failing_checks, {"error": False, "warning": False})
+        self.assertEqual(client.failing_checks, {"error": False, "warning": False})
+
+    def test_update_agent_checks_rollup_skips_maintenance_agents(self):
+        site = baker.make("clients.Site")
+        agent = baker.make_recipe(
+            "agents.online_agent", site=site, maintenance_mode=True
+        )
+        self._make_failing_ping_check(agent)
+
+        update_agent_checks_rollup(agent.pk)
+
+        site.refresh_from_db()
+        self.assertEqual(site.failing_checks, {"error": False, "warning": False})
+
+    def test_cache_db_fields_task(self):
+        client1 = baker.make("clients.Client")
+        client2 = baker.make("clients.Client")
+        site1 = baker.make("clients.Site", client=client1)
+        site2 = baker.make("clients.Site", client=client1)
+        site3 = baker.make("clients.Site", client=client2)
+        agent1 = baker.make_recipe("agents.online_agent", site=site1)
+        agent2 = baker.make_recipe("agents.online_agent", site=site2)
+        baker.make_recipe("agents.online_agent", site=site3)
+        self._make_failing_ping_check(agent1, severity=AlertSeverity.WARNING)
+        self._make_failing_ping_check(agent2)
+
+        cache_db_fields_task()
+
+        expected = {
+            site1: {"error": False, "warning": True},
+            site2: {"error": True, "warning": False},
+            site3: {"error": False, "warning": False},
+            client1: {"error": True, "warning": True},
+            client2: {"error": False, "warning": False},
+        }
+        for obj, data in expected.items():
+            obj.refresh_from_db()
+            self.assertEqual(obj.failing_checks, data)
+
+    @patch("core.tasks.a_nats_cmd")
+    @patch("core.tasks.nats.connect")
+    def test_sync_scheduled_tasks(self, nats_connect, a_nats_cmd):
+        nats_connect.return_value = AsyncMock()
+        policy = baker.make("automation.Policy", active=True)
+        agent = baker.make_recipe("agents.online_agent", version="2.8.0", policy=policy)
+        linux_agent = baker.make_recipe(
+            "agents.online_agent", version="2.8.0", plat=AgentPlat.LINUX
+        )
+
+        policy_task = baker.make_recipe("autotasks.task", policy=policy, name="p")
+        initial, modified, deleted = baker.make_recipe(
+            "autotasks.task", agent=agent, name=iter(["i", "m", "d"]), _quantity=3
+        )
+        for task, status in (
+            (initial, TaskSyncStatus.INITIAL),
+            (modified, TaskSyncStatus.NOT_SYNCED),
+            (deleted, TaskSyncStatus.PENDING_DELETION),
+        ):
+            baker.make(
+                "autotasks.TaskResult", agent=agent, task=task, sync_status=status
+            )
+        linux_task = baker.make_recipe("autotasks.task", agent=linux_agent)
+
+        replies = {"p": "ok", "i": "ok", "m": "timeout"}
+
+        async def reply(*, nc, sub, data, timeout):
+            if data["func"] == "delschedtask":
+                return "ok"
+            return replies[data["schedtaskpayload"]["name"]]
+
+        a_nats_cmd.side_effect = reply
+        with patch.object(
+            AutomatedTask,
+            "generate_nats_task_payload",
+            lambda task: {"name": task.name},
+        ):
+            ret = sync_scheduled_tasks()
+
+        self.assertEqual(a_nats_cmd.call_count, 4)
+        self.assertIn("1 failed, 1 timed out", ret)
+
+        def status(task, agent=agent):
+            return TaskResult.objects.get(agent=agent, task=task).sync_status
+
+        self.assertEqual(status(policy_task), TaskSyncStatus.SYNCED)
+        self.assertEqual(status(initial), TaskSyncStatus.SYNCED)
+        self.assertEqual(status(modified), TaskSyncStatus.NOT_SYNCED)
+        self.assertFalse(AutomatedTask.objects.filter(pk=deleted.pk).exists())
+        self.assertEqual(status(linux_task, agent=linux_agent), TaskSyncStatus.SYNCED)
+
 
 class TestCoreMgmtCommands(TacticalTestCase):
     def setUp(self):
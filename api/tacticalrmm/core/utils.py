@@ -22,9 +22,14 @@ from requests.utils import requote_uri
 
 from tacticalrmm.constants import (
     AGENT_CHECKS_CACHE_PREFIX,
+    AGENT_FAILING_DATA_CACHE_PREFIX,
     AGENT_TBL_PEND_ACTION_CNT_CACHE_PREFIX,
     CORESETTINGS_CACHE_KEY,
+    POLICY_INDEX_CACHE_KEY,
     ROLE_CACHE_PREFIX,
+    ROLE_VISIBILITY_CACHE_PREFIX,
+    ROLE_VISIBILITY_VERSION_KEY,
+    SCRIPT_SNIPPETS_CACHE_PREFIX,
     TRMM_WS_MAX_SIZE,
     AgentPlat,
     GoArch,
@@ -42,9 +47,14 @@ class CoreSettingsNotFound(Exception):
 
 def clear_entire_cache() -> None:
     cache.delete_many_pattern(f"{ROLE_CACHE_PREFIX}*")
+    cache.delete_many_pattern(f"{ROLE_VISIBILITY_CACHE_PREFIX}*")
+    cache.delete(ROLE_VISIBILITY_VERSION_KEY)
+    cache.delete_many_pattern(f"{SCRIPT_SNIPPETS_CACHE_PREFIX}*")
     cache.delete_many_pattern(f"{AGENT_TBL_PEND_ACTION_CNT_CACHE_PREFIX}*")
     cache.delete_many_pattern(f"{AGENT_CHECKS_CACHE_PREFIX}*")
+    cache.delete_many_pattern(f"{AGENT_FAILING_DATA_CACHE_PREFIX}*")
     cache.delete(CORESETTINGS_CACHE_KEY)
+    cache.delete(POLICY_INDEX_CACHE_KEY)
     cache.delete_many_pattern("site_*")
     cache.delete_many_pattern("agent_*")
     cache.delete_many_pattern("throttle_*")
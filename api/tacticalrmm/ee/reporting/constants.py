@@ -6,6 +6,17 @@ For details, see: https://license.tacticalrmm.com/ee
 
 import inspect
 
+REPORT_RENDER_CACHE_PREFIX = "reporting_render_"
+REPORT_RUN_SLOT_LOCK = "reporting-run-slot-lock-key-"
+REPORT_TEMPLATE_VERSION_KEY = "reporting_template_version"
+REPORT_DATA_SOURCE_CACHE_PREFIX = "reporting_data_source_"
+REPORT_COMPILED_TEMPLATE_CACHE_SIZE = 128
+REPORT_STREAM_CHUNK_SIZE = 2000
+REPORT_STREAM_CONTENT_TYPES = {
+    "csv": "text/csv",
+    "ndjson": "application/x-ndjson",
+}
+
 
 def get_property_fields(model_class):
     """
@@ -0,0 +1,47 @@
+"""
+Copyright (c) 2023-present Amidaware Inc.
+This file is subject to the EE License Agreement.
+For details, see: https://license.tacticalrmm.com/ee
+"""
+
+import json
+from typing import Any
+
+from django.core.management.base import BaseCommand, CommandError
+
+from ...constants import REPORT_STREAM_CONTENT_TYPES
+from ...models import ReportDataQuery
+from ...utils import stream_data_source
+
+
+class Command(BaseCommand):
+    help = "Streams the rows of a report data query to a csv or ndjson file"
+
+    def add_arguments(self, parser) -> None:
+        parser.add_argument(
+            "query", type=str, help="Name of a saved data query or a json query"
+        )
+        parser.add_argument(
+            "--format", choices=list(REPORT_STREAM_CONTENT_TYPES), default="csv"
+        )
+        parser.add_argument(
+            "--output", type=str, help="File to write to, defaults to stdout"
+        )
+
+    def handle(self, *args: tuple[Any, Any], **kwargs: Any) -> None:
+        try:
+            data_source = ReportDataQuery.objects.get(name=kwargs["query"]).json_query
+        except ReportDataQuery.DoesNotExist:
+            try:
+                data_source = json.loads(kwargs["query"])
+            except json.JSONDecodeError:
+                raise CommandError(f"No data query named {kwargs['query']}")
+
+        rows = stream_data_source(data_source=data_source, format=kwargs["format"])
+        if not kwargs["output"]:
+            for chunk in rows:
+                self.stdout.write(chunk, ending="")
+            return
+
+        with open(kwargs["output"], "w", newline="") as f:
+            f.writelines(rows)
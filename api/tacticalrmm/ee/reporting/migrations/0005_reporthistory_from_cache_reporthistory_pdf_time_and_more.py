@@ -0,0 +1,28 @@
+# Generated by Django 4.2.30 on 2026-10-18 22:04
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("reporting", "0004_reportdataquery_created_by_and_more"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="reporthistory",
+            name="from_cache",
+            field=models.BooleanField(default=False),
+        ),
+        migrations.AddField(
+            model_name="reporthistory",
+            name="pdf_time",
+            field=models.FloatField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name="reporthistory",
+            name="render_time",
+            field=models.FloatField(blank=True, null=True),
+        ),
+    ]
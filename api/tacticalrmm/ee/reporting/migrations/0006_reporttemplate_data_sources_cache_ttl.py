@@ -0,0 +1,18 @@
+# Generated by Django 4.2.30 on 2026-10-18 22:11
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("reporting", "0005_reporthistory_from_cache_reporthistory_pdf_time_and_more"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="reporttemplate",
+            name="data_sources_cache_ttl",
+            field=models.PositiveIntegerField(default=0),
+        ),
+    ]
@@ -38,10 +38,26 @@ class ReportTemplate(BaseAuditModel):
     depends_on = ArrayField(
         models.CharField(max_length=20, blank=True), blank=True, default=list
     )
+    # seconds to reuse data source results across runs, 0 disables
+    data_sources_cache_ttl = models.PositiveIntegerField(default=0)
 
     def __str__(self) -> str:
         return self.name
 
+    def save(self, *args, **kwargs) -> None:
+        from .utils import invalidate_report_templates
+
+        super().save(*args, **kwargs)
+        # it can be extended by other templates
+        invalidate_report_templates()
+
+    def delete(self, *args, **kwargs):
+        from .utils import invalidate_report_templates
+
+        ret = super().delete(*args, **kwargs)
+        invalidate_report_templates()
+        return ret
+
 
 class ReportHTMLTemplate(BaseAuditModel):
     name = models.CharField(max_length=200, unique=True)
@@ -50,6 +66,19 @@ class ReportHTMLTemplate(BaseAuditModel):
     def __str__(self) -> str:
         return self.name
 
+    def save(self, *args, **kwargs) -> None:
+        from .utils import invalidate_report_templates
+
+        super().save(*args, **kwargs)
+        invalidate_report_templates()
+
+    def delete(self, *args, **kwargs):
+        from .utils import invalidate_report_templates
+
+        ret = super().delete(*args, **kwargs)
+        invalidate_report_templates()
+        return ret
+
 
 class ReportAsset(models.Model):
     id = models.UUIDField(
@@ -131,6 +160,11 @@ class ReportHistory(BaseAuditModel):
     report_data = models.TextField()
     error_data = models.TextField(null=True, blank=True)
     date_created = models.DateTimeField(auto_now_add=True)
+    # seconds spent rendering the html and converting it to pdf
+    render_time = models.FloatField(null=True, blank=True)
+    pdf_time = models.FloatField(null=True, blank=True)
+    # the output was reused from an identical run in the same cache window
+    from_cache = models.BooleanField(default=False)
 
     def __str__(self):
         return f"{self.report_template} - {self.date_created}"
@@ -27,6 +27,20 @@ class Settings:
             f"https://{djangosettings.ALLOWED_HOSTS[0]}",
         )
 
+    @property
+    def REPORTING_QUEUE(self) -> str:
+        # dedicated workers can be started with -Q <queue>
+        return getattr(self.settings, "REPORTING_QUEUE", "celery")
+
+    @property
+    def REPORTING_MAX_CONCURRENT_RUNS(self) -> int:
+        return getattr(self.settings, "REPORTING_MAX_CONCURRENT_RUNS", 2)
+
+    @property
+    def REPORTING_RENDER_CACHE_WINDOW(self) -> int:
+        # seconds, 0 disables caching of rendered scheduled reports
+        return getattr(self.settings, "REPORTING_RENDER_CACHE_WINDOW", 60)
+
 
 # import this to load initialized settings during runtime
 settings = Settings()
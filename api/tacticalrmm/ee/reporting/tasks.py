@@ -1,10 +1,12 @@
-from typing import List, Optional
+from contextlib import contextmanager
+from typing import Generator, List, Optional
 from zoneinfo import ZoneInfo
 
 from django.utils import timezone as djangotime
 
 from tacticalrmm.celery import app
 from tacticalrmm.logger import logger
+from tacticalrmm.utils import redis_lock
 from tacticalrmm.scheduler import (
     should_run_daily,
     should_run_monthly,
@@ -25,12 +27,59 @@ def prune_report_history_task(older_than_days: int) -> str:
     return "ok"
 
 
+@contextmanager
+def _report_run_slot(oid: str) -> Generator[bool, None, None]:
+    """
+    Takes one of the REPORTING_MAX_CONCURRENT_RUNS slots so that reports
+    due at the same time don't all render at once on every worker.
+    """
+    from .constants import REPORT_RUN_SLOT_LOCK
+    from .settings import settings
+
+    for slot in range(settings.REPORTING_MAX_CONCURRENT_RUNS):
+        with redis_lock(f"{REPORT_RUN_SLOT_LOCK}{slot}", oid) as acquired:
+            if acquired:
+                yield True
+                return
+
+    yield False
+
+
+@app.task(bind=True, max_retries=120, default_retry_delay=30)
+def run_report_schedule_task(self, pk: int) -> str:
+    from .models import ReportSchedule
+    from .utils import run_scheduled_report
+
+    with _report_run_slot(self.app.oid) as acquired:
+        if not acquired:
+            raise self.retry()
+
+        try:
+            report = ReportSchedule.objects.select_related(
+                "report_template", "report_template__template_html"
+            ).get(pk=pk)
+        except ReportSchedule.DoesNotExist:
+            return "not found"
+
+        try:
+            _, error = run_scheduled_report(schedule=report)
+        except Exception as e:
+            logger.error(str(e))
+            return "error"
+
+        if error:
+            logger.error(error)
+            return "error"
+
+    return "ok"
+
+
 @app.task
 def scheduled_reports_runner():
     from tacticalrmm.constants import MonthlyType, ScheduleType
 
     from .models import ReportSchedule
-    from .utils import run_scheduled_report
+    from .settings import settings
 
     now = djangotime.now()
     tz = get_default_timezone()
@@ -39,8 +88,6 @@ def scheduled_reports_runner():
         "report_template", "schedule"
     ).filter(enabled=True)
 
-    run_list = []
-
     for report in reports:
         schedule = report.schedule
         try:
@@ -102,16 +149,10 @@ def scheduled_reports_runner():
         if run:
             report.locked_at = djangotime.now()
             report.save(update_fields=["locked_at"])
-            run_list.append(report)
-
-    for report in run_list:
-        try:
-            _, error = run_scheduled_report(schedule=report)
-        except Exception as e:
-            logger.error(str(e))
-        else:
-            if error:
-                logger.error(error)
+            # each report runs on its own so a slow one doesn't hold up the rest
+            run_report_schedule_task.apply_async(
+                args=(report.pk,), queue=settings.REPORTING_QUEUE
+            )
 
 
 @app.task
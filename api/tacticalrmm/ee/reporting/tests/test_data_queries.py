@@ -4,6 +4,7 @@ This file is subject to the EE License Agreement.
 For details, see: https://license.tacticalrmm.com/ee
 """
 
+import json
 from unittest.mock import patch
 
 import pytest
@@ -18,6 +19,7 @@ from ..utils import (
     build_queryset,
     resolve_model,
     add_fields,
+    stream_data_source,
 )
 
 
@@ -686,3 +688,82 @@ class TestAddingCustomFields:
 
         # Assert that the default value is used
         assert result["custom_fields"]["field1"] == default_value
+
+
+@pytest.mark.django_db()
+class TestStreamDataSource:
+    @pytest.fixture
+    def setup_agents(self):
+        field = baker.make(
+            "core.CustomField",
+            name="custom1",
+            model="agent",
+            type="text",
+            default_value_string="Default",
+        )
+        agents = [
+            baker.make_recipe("agents.agent", hostname=f"Agent{i}", plat="windows")
+            for i in range(5)
+        ]
+        baker.make(
+            "agents.AgentCustomField",
+            agent=agents[0],
+            field=field,
+            string_value="Agent0 value",
+        )
+        return agents
+
+    def test_stream_csv(self, setup_agents, django_assert_max_num_queries):
+        data_source = {
+            "model": "agent",
+            "only": ["hostname", "plat"],
+            "custom_fields": ["custom1", "missing"],
+            "order_by": ["hostname"],
+            "csv": {"hostname": "Hostname"},
+        }
+
+        # one custom field lookup per chunk of two rows
+        with django_assert_max_num_queries(8):
+            chunks = list(
+                stream_data_source(data_source=data_source, format="csv", chunk_size=2)
+            )
+
+        assert len(chunks) == 3
+        lines = "".join(chunks).splitlines()
+        assert lines[0] == "Hostname,plat,custom_fields.custom1"
+        assert lines[1] == "Agent0,windows,Agent0 value"
+        assert lines[5] == "Agent4,windows,Default"
+        assert len(lines) == 6
+
+        # the data source isn't modified
+        assert data_source["model"] == "agent"
+
+    def test_stream_ndjson(self, setup_agents):
+        data_source = {
+            "model": "agent",
+            "only": ["hostname"],
+            "filter": {"hostname__in": ["Agent1", "Agent3"]},
+            "order_by": ["hostname"],
+        }
+
+        rows = [
+            json.loads(line)
+            for line in "".join(
+                stream_data_source(data_source=data_source, format="ndjson")
+            ).splitlines()
+        ]
+
+        assert [row["hostname"] for row in rows] == ["Agent1", "Agent3"]
+
+    def test_stream_limit(self, setup_agents):
+        data_source = {"model": "agent", "only": ["hostname"], "limit": 3}
+
+        rows = "".join(stream_data_source(data_source=data_source, format="ndjson"))
+        assert len(rows.splitlines()) == 3
+
+    @pytest.mark.parametrize("operation", ["count", "first", "get", "aggregate"])
+    def test_stream_non_row_operations(self, operation):
+        data_source = {"model": "agent", operation: True}
+
+        with pytest.raises(InvalidDBOperationException):
+            list(stream_data_source(data_source=data_source, format="csv"))
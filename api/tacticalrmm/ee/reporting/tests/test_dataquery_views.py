@@ -175,3 +175,54 @@ class TestQuerySchema:
     def test_unauthenticated_query_schema_view(self, unauthenticated_client):
         response = unauthenticated_client.delete("/reporting/queryschema/")
         assert response.status_code == status.HTTP_401_UNAUTHORIZED
+
+
+@pytest.mark.django_db
+class TestExportReportDataQuery:
+    url = "/reporting/dataqueries/export/"
+
+    def test_export_json_query(self, authenticated_client):
+        baker.make_recipe("agents.agent", hostname="ExportAgent")
+
+        response = authenticated_client.post(
+            self.url,
+            {"json_query": {"model": "agent", "only": ["hostname"]}, "format": "csv"},
+            format="json",
+        )
+
+        assert response.status_code == status.HTTP_200_OK
+        assert response["Content-Type"] == "text/csv"
+        assert b"".join(response.streaming_content).decode().splitlines() == [
+            "hostname",
+            "ExportAgent",
+        ]
+
+    def test_export_saved_query(self, authenticated_client):
+        baker.make_recipe("agents.agent", hostname="ExportAgent")
+        baker.make(
+            "reporting.ReportDataQuery",
+            name="agents",
+            json_query={"model": "agent", "only": ["hostname"]},
+        )
+
+        response = authenticated_client.post(
+            self.url, {"name": "agents", "format": "ndjson"}, format="json"
+        )
+
+        assert response.status_code == status.HTTP_200_OK
+        assert response["Content-Type"] == "application/x-ndjson"
+        rows = b"".join(response.streaming_content).decode().splitlines()
+        assert json.loads(rows[0])["hostname"] == "ExportAgent"
+
+    def test_export_invalid_query(self, authenticated_client):
+        response = authenticated_client.post(
+            self.url, {"json_query": {"model": "agent", "count": True}}, format="json"
+        )
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
+
+        response = authenticated_client.post(self.url, {}, format="json")
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
+
+    def test_unauthenticated_export(self, unauthenticated_client):
+        response = unauthenticated_client.post(self.url, {})
+        assert response.status_code == status.HTTP_401_UNAUTHORIZED
@@ -82,6 +82,7 @@ class TestExportReportTemplate:
                 "type": report_template_with_base_template.type,
                 "depends_on": report_template_with_base_template.depends_on,
                 "template_variables": "",
+                "data_sources_cache_ttl": 0,
             },
             "assets": "some_encoded_assets",
         }
@@ -111,6 +112,7 @@ class TestExportReportTemplate:
                 "type": report_template.type,
                 "depends_on": report_template.depends_on,
                 "template_variables": "",
+                "data_sources_cache_ttl": 0,
             },
             "assets": "some_encoded_assets",
         }
@@ -5,9 +5,11 @@ For details, see: https://license.tacticalrmm.com/ee
 """
 
 import os
+from io import StringIO
 
 import pytest
 from django.core import management
+from model_bakery import baker
 
 
 @pytest.mark.django_db
@@ -21,3 +23,32 @@ class TestSchemaGeneration:
         assert os.path.exists(schema_path)
 
         os.remove(schema_path)
+
+
+@pytest.mark.django_db
+class TestExportDataQuery:
+    def test_export_data_query(self, tmp_path):
+        baker.make_recipe("agents.agent", hostname="ExportAgent")
+        baker.make(
+            "reporting.ReportDataQuery",
+            name="agents",
+            json_query={"model": "agent", "only": ["hostname"]},
+        )
+        output = tmp_path / "agents.csv"
+
+        management.call_command("export_data_query", "agents", output=str(output))
+
+        assert output.read_text().splitlines() == ["hostname", "ExportAgent"]
+
+    def test_export_json_query_to_stdout(self):
+        baker.make_recipe("agents.agent", hostname="ExportAgent")
+        out = StringIO()
+
+        management.call_command(
+            "export_data_query",
+            '{"model": "agent", "only": ["hostname"]}',
+            format="ndjson",
+            stdout=out,
+        )
+
+        assert '"hostname": "ExportAgent"' in out.getvalue()
@@ -0,0 +1,159 @@
+from unittest.mock import patch
+
+import pytest
+import time_machine
+from celery.exceptions import Retry
+from django.utils import timezone as djangotime
+from model_bakery import baker
+
+from core.models import Schedule
+from tacticalrmm.constants import ScheduleType
+
+from ..models import ReportHistory, ReportSchedule, ReportTemplate
+from ..tasks import run_report_schedule_task, scheduled_reports_runner
+from ..utils import run_report
+
+LOCMEM_CACHE = {"default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}}
+
+
+@pytest.fixture
+def report_template():
+    return baker.make(
+        ReportTemplate,
+        template_md="# Report",
+        type="markdown",
+        template_variables="",
+    )
+
+
+@pytest.mark.django_db
+class TestScheduledReportsRunner:
+    @patch("ee.reporting.tasks.run_report_schedule_task.apply_async")
+    def test_due_reports_are_dispatched(self, apply_async, report_template, settings):
+        settings.REPORTING_QUEUE = "reporting"
+        baker.make("core.CoreSettings")
+        now = djangotime.now()
+        due = baker.make(
+            Schedule, schedule_type=ScheduleType.DAILY, run_time=now.time()
+        )
+        not_due = baker.make(
+            Schedule,
+            schedule_type=ScheduleType.DAILY,
+            run_time=(now + djangotime.timedelta(hours=2)).time(),
+        )
+        reports = baker.make(
+            ReportSchedule,
+            report_template=report_template,
+            schedule=due,
+            timezone="UTC",
+            _quantity=2,
+        )
+        baker.make(
+            ReportSchedule,
+            report_template=report_template,
+            schedule=not_due,
+            timezone="UTC",
+        )
+
+        with (
+            time_machine.travel(now, tick=False),
+            patch("ee.reporting.utils.run_scheduled_report") as run_scheduled_report,
+        ):
+            scheduled_reports_runner()
+
+        # nothing is rendered inline
+        run_scheduled_report.assert_not_called()
+        assert apply_async.call_count == 2
+        for report in reports:
+            apply_async.assert_any_call(args=(report.pk,), queue="reporting")
+            report.refresh_from_db()
+            assert report.locked_at is not None
+
+    @patch("ee.reporting.utils.run_scheduled_report", return_value=(None, None))
+    def test_run_report_schedule_task(self, run_scheduled_report, report_template):
+        report = baker.make(ReportSchedule, report_template=report_template)
+
+        assert run_report_schedule_task(report.pk) == "ok"
+        run_scheduled_report.assert_called_once_with(schedule=report)
+
+        assert run_report_schedule_task(report.pk + 100) == "not found"
+
+    @patch("ee.reporting.utils.run_scheduled_report")
+    def test_run_report_schedule_task_no_free_slot(
+        self, run_scheduled_report, report_template, settings
+    ):
+        settings.REPORTING_MAX_CONCURRENT_RUNS = 0
+        report = baker.make(ReportSchedule, report_template=report_template)
+
+        with pytest.raises(Retry):
+            run_report_schedule_task.apply(args=(report.pk,), throw=True)
+
+        run_scheduled_report.assert_not_called()
+
+
+@pytest.mark.django_db
+class TestRunReport:
+    def test_run_report_records_durations(self, report_template):
+        report, error, history = run_report(
+            template=report_template, dependencies={}, format="html"
+        )
+
+        assert error is None
+        assert "Report" in report
+        assert history.render_time is not None
+        assert history.pdf_time is None
+        assert not history.from_cache
+
+    def test_run_report_cache(self, report_template, settings):
+        settings.CACHES = LOCMEM_CACHE
+        settings.REPORTING_RENDER_CACHE_WINDOW = 3600
+
+        with patch(
+            "ee.reporting.utils.generate_html", return_value=("<h1>Report</h1>", {})
+        ) as generate_html:
+            first, _, _ = run_report(
+                template=report_template,
+                dependencies={"client": 1},
+                format="html",
+                use_cache=True,
+            )
+            second, _, history = run_report(
+                template=report_template,
+                dependencies={"client": 1},
+                format="html",
+                use_cache=True,
+            )
+            assert generate_html.call_count == 1
+            assert second == first
+            assert history.from_cache
+            assert history.report_data == first
+
+            # different dependencies render again
+            run_report(
+                template=report_template,
+                dependencies={"client": 2},
+                format="html",
+                use_cache=True,
+            )
+            assert generate_html.call_count == 2
+
+            # so does a changed template
+            report_template.template_md = "# Changed"
+            report_template.save()
+            run_report(
+                template=report_template,
+                dependencies={"client": 1},
+                format="html",
+                use_cache=True,
+            )
+            assert generate_html.call_count == 3
+
+            # runs by users are never cached
+            run_report(
+                template=report_template,
+                dependencies={"client": 1},
+                format="html",
+            )
+            assert generate_html.call_count == 4
+
+        assert ReportHistory.objects.count() == 5
@@ -4,11 +4,15 @@ This file is subject to the EE License Agreement.
 For details, see: https://license.tacticalrmm.com/ee
 """
 
+from unittest.mock import patch
+
 import pytest
 from model_bakery import baker
 
 from datetime import datetime
-from ..utils import db_template_loader, generate_html
+from ..utils import compile_template, db_template_loader, generate_html
+
+LOCMEM_CACHE = {"default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}}
 
 
 @pytest.mark.django_db
@@ -179,3 +183,62 @@ class TestYamlProcessors:
 
         # these will throw an exception is a valid date string isn't returned
         assert isinstance(vars["last_30_days"], datetime)
+
+
+@pytest.mark.django_db
+class TestCompiledTemplateCache:
+    @pytest.fixture(autouse=True)
+    def locmem_cache(self, settings):
+        settings.CACHES = LOCMEM_CACHE
+        compile_template.cache_clear()
+
+    def test_templates_are_compiled_once(self):
+        template = "# Hello {{ name }}"
+        with patch(
+            "ee.reporting.utils.Markdown.convert",
+            return_value="<h1>Hello {{ name }}</h1>",
+        ) as convert:
+            for name in ("John", "Jane"):
+                result, _ = generate_html(
+                    template=template,
+                    template_type="markdown",
+                    variables=f"name: {name}",
+                )
+                assert result == f"<h1>Hello {name}</h1>"
+
+            convert.assert_called_once()
+
+            # other templates are compiled separately
+            generate_html(template="# Bye", template_type="markdown")
+            assert convert.call_count == 2
+
+    def test_saving_templates_invalidates(self):
+        base_template = baker.make(
+            "reporting.ReportHTMLTemplate",
+            name="Base Template",
+            html="<html>{% block content %}{% endblock %}</html>",
+        )
+        template = "{% block content %}<h1>Header</h1>{% endblock %}"
+
+        result, _ = generate_html(
+            template=template, template_type="html", html_template=base_template.id
+        )
+        assert result == "<html><h1>Header</h1></html>"
+
+        # the extended template is reloaded too
+        base_template.html = "<body>{% block content %}{% endblock %}</body>"
+        base_template.save()
+
+        result, _ = generate_html(
+            template=template, template_type="html", html_template=base_template.id
+        )
+        assert result == "<body><h1>Header</h1></body>"
+
+        base_template.name = "Renamed"
+        base_template.save()
+        baker.make("reporting.ReportTemplate")
+
+        result, _ = generate_html(
+            template=template, template_type="html", html_template=base_template.id
+        )
+        assert result == "<body><h1>Header</h1></body>"
@@ -10,12 +10,15 @@ import pytest
 from model_bakery import baker
 
 from ..utils import (
+    get_data_source_cache_key,
     prep_variables_for_template,
     process_chart_variables,
     process_data_sources,
     process_dependencies,
 )
 
+LOCMEM_CACHE = {"default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}}
+
 
 @pytest.mark.django_db
 class TestProcessingDependencies:
@@ -176,6 +179,54 @@ class TestProcessDataSourceVariables:
             # Assert that the "source2" data remains unchanged
             assert result["data_sources"]["source2"] == "some_string_value"
 
+    def test_process_data_sources_cache(self, settings, django_assert_num_queries):
+        settings.CACHES = LOCMEM_CACHE
+        baker.make_recipe("agents.agent", hostname="cached-agent")
+
+        def data_sources():
+            return {
+                "data_sources": {
+                    "agents": {"model": "agent", "only": ["hostname"]},
+                }
+            }
+
+        result = process_data_sources(variables=data_sources(), cache_ttl=60)
+        assert result["data_sources"]["agents"][0]["hostname"] == "cached-agent"
+
+        with django_assert_num_queries(0):
+            cached = process_data_sources(variables=data_sources(), cache_ttl=60)
+        assert cached == result
+
+        # caching is opt in
+        with django_assert_num_queries(1):
+            process_data_sources(variables=data_sources())
+
+    def test_data_source_cache_key(self):
+        data_source = {"model": "agent", "filter": {"site_id": 1}}
+        superuser = baker.make("accounts.User", is_superuser=True)
+        role = baker.make("accounts.Role")
+        role.can_view_sites.set([baker.make("clients.Site")])
+        user = baker.make("accounts.User", role=role)
+        other_user = baker.make("accounts.User", role=role)
+
+        keys = {
+            get_data_source_cache_key(data_source=data_source),
+            get_data_source_cache_key(data_source=data_source, user=superuser),
+            get_data_source_cache_key(data_source=data_source, user=user),
+            get_data_source_cache_key(
+                data_source={"model": "agent", "filter": {"site_id": 2}}, user=user
+            ),
+            get_data_source_cache_key(
+                data_source=data_source, user=user, limit_query_results=1
+            ),
+        }
+        assert len(keys) == 5
+
+        # users with the same visibility share results
+        assert get_data_source_cache_key(
+            data_source=data_source, user=user
+        ) == get_data_source_cache_key(data_source=data_source, user=other_user)
+
 
 class TestProcessChartVariables:
     def test_process_chart_no_replace_data_frame(self):
@@ -34,6 +34,7 @@ urlpatterns = [
     # report data queries
     path("dataqueries/", views.GetAddReportDataQuery.as_view()),
     path("dataqueries/<int:pk>/", views.GetEditDeleteReportDataQuery.as_view()),
+    path("dataqueries/export/", views.ExportReportDataQuery.as_view()),
     # serving assets
     path("assets/<path:path>", views.NginxRedirect.as_view()),
     path("queryschema/", views.QuerySchema.as_view()),
@@ -4,15 +4,25 @@ This file is subject to the EE License Agreement.
 For details, see: https://license.tacticalrmm.com/ee
 """
 
+import copy
+import csv
 import datetime
+import hashlib
 import inspect
+import io
 import json
 import re
+import time
+import uuid
 from enum import Enum
+from functools import lru_cache
+from itertools import islice
 from typing import (
     TYPE_CHECKING,
     Any,
+    Callable,
     Dict,
+    Iterator,
     List,
     Literal,
     Optional,
@@ -26,8 +36,9 @@ from zoneinfo import ZoneInfo
 import yaml
 from django.apps import apps
 from django.conf import settings
+from django.core.cache import cache
 from django.utils import timezone as djangotime
-from jinja2 import FunctionLoader
+from jinja2 import FunctionLoader, Template
 from jinja2.sandbox import SandboxedEnvironment
 from jinja2.exceptions import TemplateError
 from rest_framework.serializers import ValidationError
@@ -39,7 +50,15 @@ from tacticalrmm.logger import logger
 from tacticalrmm.utils import RE_DB_VALUE, get_db_value
 
 from . import custom_filters
-from .constants import REPORTING_MODELS, get_property_fields
+from .constants import (
+    REPORT_COMPILED_TEMPLATE_CACHE_SIZE,
+    REPORT_DATA_SOURCE_CACHE_PREFIX,
+    REPORT_RENDER_CACHE_PREFIX,
+    REPORT_STREAM_CHUNK_SIZE,
+    REPORT_TEMPLATE_VERSION_KEY,
+    REPORTING_MODELS,
+    get_property_fields,
+)
 from .markdown.config import Markdown
 from .models import (
     ReportAsset,
@@ -49,6 +68,7 @@ from .models import (
     ReportSchedule,
     ReportTemplate,
 )
+from .settings import settings as reporting_settings
 
 if TYPE_CHECKING:
     from accounts.models import User
@@ -59,6 +79,11 @@ RE_ASSET_URL = re.compile(
 
 RE_DEPENDENCY_VALUE = re.compile(r"(\{\{\s*(.*)\s*\}\})")
 
+DATA_SOURCE_NOT_CACHED = object()
+
+# operations that turn the data source into a single value instead of rows
+NON_STREAMABLE_OPERATIONS = ("get", "first", "count", "aggregate")
+
 
 # this will lookup the Jinja parent template in the DB
 # Example: {% extends "MASTER_TEMPLATE_NAME or REPORT_TEMPLATE_NAME" %}
@@ -78,10 +103,35 @@ def db_template_loader(template_name: str) -> Optional[str]:
     return None
 
 
+def get_report_template_version() -> str:
+    return cache.get_or_set(
+        REPORT_TEMPLATE_VERSION_KEY, lambda: uuid.uuid4().hex, timeout=None
+    )
+
+
+def invalidate_report_templates() -> None:
+    """
+    Called when a report or base template changes so compiled templates,
+    including the ones loaded through {% extends %}, are rebuilt.
+    """
+    cache.set(REPORT_TEMPLATE_VERSION_KEY, uuid.uuid4().hex, timeout=None)
+
+
+def versioned_template_loader(
+    template_name: str,
+) -> Optional[Tuple[str, None, Callable[[], bool]]]:
+    source = db_template_loader(template_name)
+    if source is None:
+        return None
+
+    version = get_report_template_version()
+    return source, None, lambda: get_report_template_version() == version
+
+
 # sets up Jinja environment wiht the db loader template
 # comment tags needed to be editted because they conflicted with css properties
 env = SandboxedEnvironment(
-    loader=FunctionLoader(db_template_loader),
+    loader=FunctionLoader(versioned_template_loader),
     comment_start_string="{=",
     comment_end_string="=}",
     extensions=["jinja2.ext.do", "jinja2.ext.loopcontrols"],
@@ -120,10 +170,40 @@ def generate_html(
     variables: str = "",
     dependencies: Optional[Dict[str, int]] = None,
     user: Optional["User"] = None,
+    data_sources_cache_ttl: int = 0,
 ) -> Tuple[str, Dict[str, Any]]:
     if dependencies is None:
         dependencies = {}
 
+    tm = compile_template(
+        template=template,
+        template_type=template_type,
+        html_template=html_template,
+        version=get_report_template_version(),
+    )
+
+    variables_dict = prep_variables_for_template(
+        variables=variables,
+        dependencies=dependencies,
+        user=user,
+        data_sources_cache_ttl=data_sources_cache_ttl,
+    )
+
+    return (tm.render(css=css, **variables_dict), variables_dict)
+
+
+@lru_cache(maxsize=REPORT_COMPILED_TEMPLATE_CACHE_SIZE)
+def compile_template(
+    *,
+    template: str,
+    template_type: str,
+    html_template: Optional[int],
+    version: str,
+) -> Template:
+    """
+    Compiled templates are kept per process, keyed by their content. The
+    version changes whenever a report or base template is saved.
+    """
     # validate the template
     env.parse(template)
 
@@ -142,13 +222,7 @@ def generate_html(
         except ReportHTMLTemplate.DoesNotExist:
             pass
 
-    tm = env.from_string(template_string)
-
-    variables_dict = prep_variables_for_template(
-        variables=variables, dependencies=dependencies, user=user
-    )
-
-    return (tm.render(css=css, **variables_dict), variables_dict)
+    return env.from_string(template_string)
 
 
 def make_dataqueries_inline(*, variables: str) -> str:
@@ -176,6 +250,7 @@ def prep_variables_for_template(
     dependencies: Optional[Dict[str, Any]] = None,
     limit_query_results: Optional[int] = None,
     user: Optional["User"] = None,
+    data_sources_cache_ttl: int = 0,
 ) -> Dict[str, Any]:
     if not dependencies:
         dependencies = {}
@@ -191,7 +266,10 @@ def prep_variables_for_template(
     # replace the data_sources with the actual data from DB. This will be passed to the template
     # in the form of {{data_sources.data_source_name}}
     variables_dict = process_data_sources(
-        variables=variables_dict, limit_query_results=limit_query_results, user=user
+        variables=variables_dict,
+        limit_query_results=limit_query_results,
+        user=user,
+        cache_ttl=data_sources_cache_ttl,
     )
 
     # generate and replace charts in the variables
@@ -256,6 +334,37 @@ class InvalidDBOperationException(Exception):
     pass
 
 
+def get_reporting_queryset(*, Model: Any, user: Optional["User"] = None) -> Any:
+    try:
+        if user and hasattr(Model.objects, "filter_by_role"):
+            return Model.objects.filter_by_role(user)
+    except Exception as e:
+        logger.error(str(e))
+
+    return Model.objects.using("default")
+
+
+def get_values_columns(
+    *, Model: Any, columns: Optional[List[str]], defer: Optional[List[str]]
+) -> List[str]:
+    if columns:
+        # remove columns from only if defer is also present
+        if defer:
+            columns = [column for column in columns if column not in defer]
+        if "id" not in columns:
+            columns.append("id")
+
+        return columns
+    elif defer:
+        # Since values seems to ignore only and defer, we need to get all columns and remove the defered ones.
+        # Then we can pass the rest of the columns in
+        return [
+            field.name for field in Model._meta.local_fields if field.name not in defer
+        ]
+
+    return []
+
+
 def build_queryset(
     *,
     data_source: Dict[str, Any],
@@ -282,14 +391,7 @@ def build_queryset(
         properties = [property for property in properties if property in all_properties]
 
     # create a base reporting queryset
-    try:
-        if user and hasattr(Model.objects, "filter_by_role"):
-            queryset = Model.objects.filter_by_role(user)
-        else:
-            queryset = Model.objects.using("default")
-    except Exception as e:
-        logger.error(str(e))
-        queryset = Model.objects.using("default")
+    queryset = get_reporting_queryset(Model=Model, user=user)
 
     properties_queryset = None
 
@@ -350,23 +452,9 @@ def build_queryset(
     if properties:
         properties_queryset = queryset
 
-    if columns:
-        # remove columns from only if defer is also present
-        if defer:
-            columns = [column for column in columns if column not in defer]
-        if "id" not in columns:
-            columns.append("id")
-
-        queryset = queryset.values(*columns)
-    elif defer:
-        # Since values seems to ignore only and defer, we need to get all columns and remove the defered ones.
-        # Then we can pass the rest of the columns in
-        included_fields = [
-            field.name for field in Model._meta.local_fields if field.name not in defer
-        ]
-        queryset = queryset.values(*included_fields)
-    else:
-        queryset = queryset.values()
+    queryset = queryset.values(
+        *get_values_columns(Model=Model, columns=columns, defer=defer)
+    )
 
     if get or first:
         if get:
@@ -521,6 +609,113 @@ def add_fields(
         return data
 
 
+def stream_data_source(
+    *,
+    data_source: Dict[str, Any],
+    format: Literal["csv", "ndjson"],
+    user: Optional["User"] = None,
+    chunk_size: int = REPORT_STREAM_CHUNK_SIZE,
+) -> Iterator[str]:
+    """
+    Streams the rows of a data source as csv or newline delimited json. Rows
+    are read from a server side cursor and custom fields and properties are
+    added a chunk at a time, so memory use doesn't grow with the row count.
+    """
+    local_data_source = resolve_model(data_source=copy.deepcopy(data_source))
+    Model = local_data_source.pop("model")
+    model_name = Model.__name__.lower()
+    defer = local_data_source.get("defer", None)
+    columns = local_data_source.get("only", None)
+    properties = local_data_source.pop("properties", None)
+    custom_fields = []
+    csv_columns = {}
+    limit = None
+
+    # make sure approved properties are in the list
+    if properties:
+        all_properties = get_property_fields(Model)
+        properties = [property for property in properties if property in all_properties]
+
+    queryset = get_reporting_queryset(Model=Model, user=user)
+
+    for operation, values in local_data_source.items():
+        if operation not in [op.value for op in AllowedOperations]:
+            raise InvalidDBOperationException(
+                f"DB operation: {operation} not allowed. Supported operations: {', '.join(op.value for op in AllowedOperations)}"
+            )
+
+        if operation in NON_STREAMABLE_OPERATIONS:
+            raise InvalidDBOperationException(
+                f"DB operation: {operation} doesn't return rows and can't be streamed"
+            )
+        elif operation == "custom_fields" and isinstance(values, list):
+            from core.models import CustomField
+
+            if model_name in ("client", "site", "agent"):
+                existing = set(
+                    CustomField.objects.filter(
+                        model=model_name, name__in=values
+                    ).values_list("name", flat=True)
+                )
+                custom_fields = [field for field in values if field in existing]
+        elif operation == "limit":
+            limit = values
+        elif operation == "csv":
+            if isinstance(values, dict):
+                csv_columns = values
+        elif operation in ("json", "all"):
+            # the output format is picked by the caller
+            continue
+        elif isinstance(values, list):
+            queryset = getattr(queryset, operation)(*values)
+        elif isinstance(values, dict):
+            queryset = getattr(queryset, operation)(**values)
+        else:
+            queryset = getattr(queryset, operation)(values)
+
+    if limit:
+        queryset = queryset[:limit]
+
+    rows = queryset.values(
+        *get_values_columns(Model=Model, columns=columns, defer=defer)
+    ).iterator(chunk_size=chunk_size)
+
+    writer = None
+    buffer = io.StringIO()
+    while chunk := list(islice(rows, chunk_size)):
+        if custom_fields or properties:
+            chunk = add_fields(
+                data=chunk,
+                custom_fields=custom_fields,
+                properties=properties,
+                properties_queryset=Model.objects.filter(
+                    pk__in=[row["id"] for row in chunk]
+                ),
+                model_name=model_name,
+            )
+
+        if format == "ndjson":
+            yield "".join(f"{json.dumps(row, default=str)}\n" for row in chunk)
+            continue
+
+        for row in chunk:
+            row.pop("id", None)
+            for name, value in row.pop("custom_fields", {}).items():
+                row[f"custom_fields.{name}"] = value
+
+            if writer is None:
+                writer = csv.DictWriter(
+                    buffer, fieldnames=list(row.keys()), extrasaction="ignore"
+                )
+                writer.writerow({key: csv_columns.get(key, key) for key in row})
+
+            writer.writerow(row)
+
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+
+
 def normalize_asset_url(text: str, type: Literal["pdf", "html", "plaintext"]) -> str:
     new_text = text
     for url, id in RE_ASSET_URL.findall(text):
@@ -573,17 +768,62 @@ def decode_base64_asset(asset: str) -> bytes:
     return base64.b64decode(asset.encode("utf-8"))
 
 
+def get_data_source_cache_key(
+    *,
+    data_source: Dict[str, Any],
+    limit_query_results: Optional[int] = None,
+    user: Optional["User"] = None,
+) -> str:
+    """
+    Data source results are shared by runs with the same query definition,
+    which already has the report dependencies substituted in, and the same
+    visibility of the user running the report.
+    """
+    if user is None:
+        scope: Any = "system"
+    elif user.is_superuser or (user.role and user.role.is_superuser):
+        scope = "superuser"
+    elif not user.role:
+        scope = "none"
+    else:
+        from accounts.utils import get_role_visibility
+
+        visibility = get_role_visibility(user.role)
+        scope = [sorted(visibility.client_ids), sorted(visibility.site_ids)]
+
+    digest = hashlib.sha256(
+        json.dumps(
+            [data_source, limit_query_results, scope], sort_keys=True, default=str
+        ).encode()
+    ).hexdigest()
+
+    return f"{REPORT_DATA_SOURCE_CACHE_PREFIX}{digest}"
+
+
 def process_data_sources(
     *,
     variables: Dict[str, Any],
     limit_query_results: Optional[int] = None,
     user: Optional["User"] = None,
+    cache_ttl: int = 0,
 ) -> Dict[str, Any]:
     data_sources = variables.get("data_sources")
 
     if isinstance(data_sources, dict):
         for key, value in data_sources.items():
             if isinstance(value, dict):
+                cache_key = None
+                if cache_ttl > 0:
+                    cache_key = get_data_source_cache_key(
+                        data_source=value,
+                        limit_query_results=limit_query_results,
+                        user=user,
+                    )
+                    cached = cache.get(cache_key, DATA_SOURCE_NOT_CACHED)
+                    if cached is not DATA_SOURCE_NOT_CACHED:
+                        data_sources[key] = cached
+                        continue
+
                 modified_datasource = resolve_model(data_source=value)
                 queryset = build_queryset(
                     data_source=modified_datasource,
@@ -592,6 +832,9 @@ def process_data_sources(
                 )
                 data_sources[key] = queryset
 
+                if cache_key:
+                    cache.set(cache_key, queryset, cache_ttl)
+
     return variables
 
 
@@ -719,24 +962,89 @@ def create_report_history(
     report_data: str,
     error_data: Optional[str],
     user: str,
+    render_time: Optional[float] = None,
+    pdf_time: Optional[float] = None,
+    from_cache: bool = False,
 ) -> "ReportHistory":
     return ReportHistory.objects.create(
         report_template=template,
         report_data=report_data,
         error_data=error_data,
         run_by=user,
+        render_time=render_time,
+        pdf_time=pdf_time,
+        from_cache=from_cache,
     )
 
 
+def get_report_cache_key(
+    *,
+    template: "ReportTemplate",
+    dependencies: Dict[str, int],
+    format: str,
+    now: datetime.datetime,
+) -> Optional[str]:
+    """
+    Key of the rendered output of a template for the current cache window.
+    Any change to the template, its base template, variables or dependencies
+    changes the key.
+    """
+    window = reporting_settings.REPORTING_RENDER_CACHE_WINDOW
+    if window <= 0:
+        return None
+
+    digest = hashlib.sha256(
+        json.dumps(
+            [
+                template.pk,
+                template.type,
+                template.template_md,
+                template.template_css,
+                template.template_html.html if template.template_html else None,
+                template.template_variables,
+                dependencies,
+                format,
+            ],
+            sort_keys=True,
+            default=str,
+        ).encode()
+    ).hexdigest()
+
+    return f"{REPORT_RENDER_CACHE_PREFIX}{digest}_{int(now.timestamp()) // window}"
+
+
 def run_report(
     *,
     template: "ReportTemplate",
     dependencies: Dict[str, int],
     format: Literal["html", "pdf", "plaintext"],
     user: Optional["User"] = None,
+    use_cache: bool = False,
 ) -> Tuple[Optional[str] | bytes, Optional[str], "ReportHistory"]:
     error_text = ""
+    cache_key = None
+    if use_cache:
+        cache_key = get_report_cache_key(
+            template=template,
+            dependencies=dependencies,
+            format=format,
+            now=djangotime.now(),
+        )
+
     try:
+        cached = cache.get(cache_key) if cache_key else None
+        if cached:
+            html_report, report = cached
+            history = create_report_history(
+                template=template,
+                report_data=html_report,
+                user=user.username if user else "system",
+                error_data=None,
+                from_cache=True,
+            )
+            return report, None, history
+
+        start = time.monotonic()
         html_report, _ = generate_html(
             template=template.template_md,
             template_type=template.type,
@@ -747,21 +1055,36 @@ def run_report(
             variables=template.template_variables,
             dependencies=dependencies,
             user=user,
+            data_sources_cache_ttl=template.data_sources_cache_ttl,
         )
 
         html_report = normalize_asset_url(html_report, format)
+        render_time = time.monotonic() - start
+
+        pdf_time = None
+        report = html_report
+        if format == "pdf":
+            start = time.monotonic()
+            report = generate_pdf(html=html_report)
+            pdf_time = time.monotonic() - start
+
         history = create_report_history(
             template=template,
             report_data=html_report,
             user=user.username if user else "system",
             error_data=None,
+            render_time=render_time,
+            pdf_time=pdf_time,
         )
 
-        if format != "pdf":
-            return html_report, None, history
-        else:
-            pdf_bytes = generate_pdf(html=html_report)
-            return pdf_bytes, None, history
+        if cache_key:
+            cache.set(
+                cache_key,
+                (html_report, report),
+                reporting_settings.REPORTING_RENDER_CACHE_WINDOW,
+            )
+
+        return report, None, history
     except TemplateError as error:
         if hasattr(error, "lineno"):
             error_text = f"Line {error.lineno}: {error.message}"
@@ -796,6 +1119,8 @@ def run_scheduled_report(
         dependencies=schedule.dependencies,
         format=schedule.format,
         user=user,
+        # reports run by a user are filtered by their permissions
+        use_cache=user is None,
     )
     schedule.last_run = djangotime.now()
     schedule.save(update_fields=["last_run"])
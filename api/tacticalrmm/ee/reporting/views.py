@@ -8,6 +8,7 @@ import json
 import os
 import shutil
 import uuid
+from itertools import chain
 from typing import Any, Dict, List, Literal, Optional, Union
 
 import requests
@@ -19,7 +20,12 @@ from django.core.exceptions import (
 )
 from django.core.files.base import ContentFile
 from django.db import transaction
-from django.http import FileResponse, HttpResponse, JsonResponse
+from django.http import (
+    FileResponse,
+    HttpResponse,
+    JsonResponse,
+    StreamingHttpResponse,
+)
 from django.shortcuts import get_object_or_404
 from jinja2.exceptions import TemplateError
 from rest_framework.permissions import AllowAny, IsAuthenticated
@@ -42,6 +48,7 @@ from rest_framework.views import APIView
 import ee.reporting.tasks
 from tacticalrmm.utils import notify_error
 
+from .constants import REPORT_STREAM_CONTENT_TYPES
 from .models import (
     ReportAsset,
     ReportDataQuery,
@@ -64,6 +71,7 @@ from .utils import (
     prep_variables_for_template,
     run_report,
     run_scheduled_report,
+    stream_data_source,
 )
 
 
@@ -320,6 +328,7 @@ class ExportReportTemplate(APIView):
                     "type": template.type,
                     "depends_on": template.depends_on,
                     "template_variables": template.template_variables,
+                    "data_sources_cache_ttl": template.data_sources_cache_ttl,
                 },
                 "assets": assets,
             }
@@ -1026,6 +1035,53 @@ class GetEditDeleteReportDataQuery(APIView):
         return Response()
 
 
+class ExportReportDataQuery(APIView):
+    permission_classes = [IsAuthenticated, GenerateReportPerms]
+
+    class InputRequest:
+        json_query: Dict[str, Any]
+        name: str
+        format: Literal["csv", "ndjson"]
+
+    class InputSerializer(Serializer[InputRequest]):
+        json_query = JSONField(required=False)
+        name = CharField(required=False)
+        format = ChoiceField(choices=list(REPORT_STREAM_CONTENT_TYPES), default="csv")
+
+    def post(self, request: Request) -> Union[StreamingHttpResponse, Response]:
+        serializer = self.InputSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        data = serializer.validated_data
+
+        if "name" in data:
+            json_query = get_object_or_404(
+                ReportDataQuery, name=data["name"]
+            ).json_query
+        else:
+            json_query = data.get("json_query")
+
+        if not isinstance(json_query, dict):
+            return notify_error("'json_query' or 'name' is required")
+
+        rows = stream_data_source(
+            data_source=json_query, format=data["format"], user=request.user
+        )
+        try:
+            # surface query errors before the response starts
+            first = next(rows, "")
+        except Exception as error:
+            return notify_error(str(error))
+
+        response = StreamingHttpResponse(
+            chain([first], rows),
+            content_type=REPORT_STREAM_CONTENT_TYPES[data["format"]],
+        )
+        response["Content-Disposition"] = (
+            f'attachment; filename="{json_query.get("model", "export")}.{data["format"]}"'
+        )
+        return response
+
+
 class NginxRedirect(APIView):
     permission_classes = (AllowAny,)
 
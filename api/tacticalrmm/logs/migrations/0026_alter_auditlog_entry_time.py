@@ -0,0 +1,19 @@
+# Generated by Django 4.2.30 on 2026-10-18 22:46
+
+from django.db import migrations, models
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("logs", "0025_alter_auditlog_id_alter_debuglog_id_and_more"),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name="auditlog",
+            name="entry_time",
+            field=models.DateTimeField(default=django.utils.timezone.now),
+        ),
+    ]
@@ -1,12 +1,18 @@
+import copy
 import json
 from abc import abstractmethod
 from typing import TYPE_CHECKING, Any, Dict, Literal, Optional, Tuple, Union, cast
 
 from django.conf import settings
+from django.core.cache import cache
 from django.db import models
+from django.db.models import DEFERRED
+from django.utils import timezone as djangotime
 
 from core.utils import get_core_settings
 from tacticalrmm.constants import (
+    AUDIT_LOG_BUFFER_KEY,
+    AUDIT_LOG_FLUSH_BATCH,
     AuditActionType,
     AuditObjType,
     DebugLogLevel,
@@ -23,6 +29,10 @@ if TYPE_CHECKING:
     from core.models import URLAction
 
 
+# bookkeeping fields of BaseAuditModel, changes to them alone are not audited
+AUDIT_MODEL_FIELDS = ("created_by", "created_time", "modified_by", "modified_time")
+
+
 def get_debug_level() -> str:
     return get_core_settings().agent_debug_level
 
@@ -32,7 +42,8 @@ class AuditLog(models.Model):
     username = models.CharField(max_length=255)
     agent = models.CharField(max_length=255, null=True, blank=True)
     agent_id = models.CharField(max_length=255, blank=True, null=True)
-    entry_time = models.DateTimeField(auto_now_add=True)
+    # not auto_now_add so buffered entries keep the time they were recorded at
+    entry_time = models.DateTimeField(default=djangotime.now)
     action = models.CharField(max_length=100, choices=AuditActionType.choices)
     object_type = models.CharField(max_length=100, choices=AuditObjType.choices)
     before_value = models.JSONField(null=True, blank=True)
@@ -43,35 +54,56 @@ class AuditLog(models.Model):
     def __str__(self) -> str:
         return f"{self.username} {self.action} {self.object_type}"
 
+    def truncate_values(self) -> None:
+        # truncate message field if longer than 255 characters
+        if self.message:
+            self.message = (
+                (self.message[:253] + "..") if len(self.message) > 255 else self.message
+            )
+
+        max_bytes = getattr(settings, "AUDIT_MAX_VALUE_BYTES", 512 * 2**10)  # 512 KiB
+        for field in ("before_value", "after_value", "debug_info"):
+            value = getattr(self, field)
+            try:
+                if len(json.dumps(value).encode("utf-8")) > max_bytes:
+                    setattr(
+                        self,
+                        field,
+                        {
+                            "error": "value too large to store in audit log. Check documentation for configuring AUDIT_MAX_VALUE_BYTES"
+                        },
+                    )
+            except Exception:
+                setattr(self, field, {"error": "could not process audit value"})
+
     def save(self, *args: Any, **kwargs: Any) -> None:
         if not self.pk:
-            # truncate message field if longer than 255 characters
-            if self.message:
-                self.message = (
-                    (self.message[:253] + "..")
-                    if len(self.message) > 255
-                    else self.message
-                )
-
-            max_bytes = getattr(
-                settings, "AUDIT_MAX_VALUE_BYTES", 512 * 2**10
-            )  # 512 KiB
-            for field in ("before_value", "after_value", "debug_info"):
-                value = getattr(self, field)
-                try:
-                    if len(json.dumps(value).encode("utf-8")) > max_bytes:
-                        setattr(
-                            self,
-                            field,
-                            {
-                                "error": "value too large to store in audit log. Check documentation for configuring AUDIT_MAX_VALUE_BYTES"
-                            },
-                        )
-                except Exception:
-                    setattr(self, field, {"error": "could not process audit value"})
+            self.truncate_values()
 
         return super().save(*args, **kwargs)
 
+    @staticmethod
+    def record(**kwargs: Any) -> None:
+        """
+        Queues an entry that flush_audit_log_task writes in bulk, so the request
+        doesn't wait on the insert. Written right away if buffering is unavailable.
+        """
+        entry = AuditLog(**kwargs)
+        entry.truncate_values()
+        row = {
+            field.attname: getattr(entry, field.attname)
+            for field in AuditLog._meta.concrete_fields
+            if not field.primary_key
+        }
+
+        length = cache.list_push(AUDIT_LOG_BUFFER_KEY, row)
+        if not length:
+            entry.save()
+        elif length % AUDIT_LOG_FLUSH_BATCH == 0:
+            from logs.tasks import flush_audit_log_task
+
+            flush_audit_log_task.delay()
+
     @staticmethod
     def audit_mesh_session(
         username: str, agent: "Agent", debug_info: Dict[Any, Any] = {}
@@ -114,7 +146,7 @@ class AuditLog(models.Model):
         name: str = "",
         debug_info: Dict[Any, Any] = {},
     ) -> None:
-        AuditLog.objects.create(
+        AuditLog.record(
             username=username,
             object_type=object_type,
             agent=before["hostname"] if object_type == AuditObjType.AGENT else None,
@@ -134,7 +166,7 @@ class AuditLog(models.Model):
         name: str = "",
         debug_info: Dict[Any, Any] = {},
     ) -> None:
-        AuditLog.objects.create(
+        AuditLog.record(
             username=username,
             object_type=object_type,
             agent=after["hostname"] if object_type == AuditObjType.AGENT else None,
@@ -153,7 +185,7 @@ class AuditLog(models.Model):
         name: str = "",
         debug_info: Dict[Any, Any] = {},
     ) -> None:
-        AuditLog.objects.create(
+        AuditLog.record(
             username=username,
             object_type=object_type,
             agent=before["hostname"] if object_type == AuditObjType.AGENT else None,
@@ -517,12 +549,70 @@ class BaseAuditModel(models.Model):
     def serialize(class_name: models.Model) -> Dict[str, Any]:
         pass
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # only saves made by a user are audited, remember what was loaded so
+        # save() can diff against it instead of fetching the row again
+        if get_username():
+            instance._audit_loaded = instance._audit_values(field_names)
+        return instance
+
+    def _audit_values(self, attnames) -> Dict[str, Any]:
+        # json and array fields can be modified in place, copy them
+        return {
+            attname: (
+                copy.deepcopy(value) if isinstance(value, (dict, list)) else value
+            )
+            for attname in attnames
+            if (value := self.__dict__.get(attname, DEFERRED)) is not DEFERRED
+        }
+
+    def _audit_unchanged(self) -> bool:
+        """True if no field changed since the instance was loaded or last saved."""
+        loaded: Optional[Dict[str, Any]] = getattr(self, "_audit_loaded", None)
+        if loaded is None:
+            return False
+
+        return all(
+            f.attname in loaded and loaded[f.attname] == self.__dict__.get(f.attname)
+            for f in self._meta.concrete_fields
+            if f.attname not in AUDIT_MODEL_FIELDS
+        )
+
+    def get_old_instance(self) -> Optional[models.Model]:
+        """
+        Returns the instance as it is stored in the database, built from the
+        values it was loaded with when possible instead of fetching the row.
+        """
+        if not self.pk:
+            return None
+
+        loaded: Optional[Dict[str, Any]] = getattr(self, "_audit_loaded", None)
+        fields = self._meta.concrete_fields
+        if loaded is None or any(f.attname not in loaded for f in fields):
+            return type(self).objects.get(pk=self.pk)
+
+        return type(self).from_db(
+            self._state.db,
+            [f.attname for f in fields],
+            [copy.deepcopy(loaded[f.attname]) for f in fields],
+        )
+
     def save(self, old_model: Optional[models.Model] = None, *args, **kwargs) -> None:
         username = get_username()
         if username:
             object_class = type(self)
             object_name = object_class.__name__.lower()
-            after_value = object_class.serialize(self)
+
+            after_value = None
+            if not self.pk:
+                after_value = object_class.serialize(self)
+            # nothing to audit when no field changed since the instance was loaded
+            elif not self._audit_unchanged():
+                after_value = object_class.serialize(self)
+                if not old_model:
+                    old_model = self.get_old_instance()
 
             # populate created_by and modified_by fields on instance
             if not getattr(self, "created_by", None):
@@ -539,13 +629,8 @@ class BaseAuditModel(models.Model):
                     self.__str__(),
                     debug_info=get_debug_info(),
                 )
-            else:
-                if old_model:
-                    before_value = object_class.serialize(old_model)
-                else:
-                    before_value = object_class.serialize(
-                        object_class.objects.get(pk=self.pk)
-                    )
+            elif after_value is not None:
+                before_value = object_class.serialize(old_model)
                 # only create an audit entry if the values have changed
                 if before_value != after_value and username:
                     AuditLog.audit_object_changed(
@@ -559,6 +644,11 @@ class BaseAuditModel(models.Model):
 
         super().save(*args, **kwargs)
 
+        if username:
+            self._audit_loaded = self._audit_values(
+                f.attname for f in self._meta.concrete_fields
+            )
+
     def delete(self, *args, **kwargs) -> Tuple[int, Dict[str, int]]:
         super().delete(*args, **kwargs)
 
@@ -1,6 +1,13 @@
+from django.core.cache import cache
 from django.utils import timezone as djangotime
 
 from tacticalrmm.celery import app
+from tacticalrmm.constants import (
+    AUDIT_LOG_BUFFER_KEY,
+    AUDIT_LOG_FLUSH_BATCH,
+    FLUSH_AUDIT_LOG_LOCK,
+)
+from tacticalrmm.utils import redis_lock
 
 
 @app.task
@@ -23,3 +30,23 @@ def prune_audit_log(older_than_days: int) -> str:
     ).delete()
 
     return "ok"
+
+
+@app.task(bind=True)
+def flush_audit_log_task(self) -> str:
+    from .models import AuditLog
+
+    with redis_lock(FLUSH_AUDIT_LOG_LOCK, self.app.oid) as acquired:
+        if not acquired:
+            return f"{self.app.oid} still running"
+
+        # entries are only removed from the buffer once they are written, so a
+        # crash between the two writes them again rather than losing them
+        while rows := cache.list_peek_many(AUDIT_LOG_BUFFER_KEY, AUDIT_LOG_FLUSH_BATCH):
+            AuditLog.objects.bulk_create([AuditLog(**row) for row in rows])
+            cache.list_trim_head(AUDIT_LOG_BUFFER_KEY, len(rows))
+
+            if len(rows) < AUDIT_LOG_FLUSH_BATCH:
+                break
+
+    return "ok"
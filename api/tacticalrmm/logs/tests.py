@@ -520,3 +520,113 @@ class TestLogTasks(TacticalTestCase):
         prune_audit_log(30)
 
         self.assertEqual(AuditLog.objects.count(), 6)
+
+
+@patch("logs.models.get_username", return_value="john")
+class TestAuditPipeline(TacticalTestCase):
+    def setUp(self):
+        self.setup_coresettings()
+
+    def test_save_diffs_against_loaded_values(self, get_username):
+        from clients.models import Client
+
+        from .models import AuditLog
+
+        client = Client.objects.get(pk=baker.make("clients.Client", name="Old").pk)
+        AuditLog.objects.all().delete()
+
+        # unchanged, no serialization and no audit entry
+        with patch.object(Client, "serialize") as serialize:
+            client.save()
+            serialize.assert_not_called()
+        self.assertFalse(AuditLog.objects.exists())
+
+        # the row is not fetched again to find the old values
+        client.name = "New"
+        with self.assertNumQueries(2):  # update and audit entry
+            client.save()
+
+        audit = AuditLog.objects.get()
+        self.assertEqual(audit.before_value["name"], "Old")
+        self.assertEqual(audit.after_value["name"], "New")
+
+        # later saves diff against what was last saved
+        client.name = "Newer"
+        client.save()
+        audit = AuditLog.objects.order_by("-id").first()
+        self.assertEqual(audit.before_value["name"], "New")
+        self.assertEqual(audit.after_value["name"], "Newer")
+
+    def test_save_fetches_when_not_loaded(self, get_username):
+        from clients.models import Client
+
+        from .models import AuditLog
+
+        pk = baker.make("clients.Client", name="Old").pk
+        client = Client.objects.only("pk", "name").get(pk=pk)
+        client.name = "New"
+        client.save()
+
+        audit = AuditLog.objects.order_by("-id").first()
+        self.assertEqual(audit.before_value["name"], "Old")
+        self.assertEqual(audit.after_value["name"], "New")
+
+    @patch("logs.tasks.flush_audit_log_task.delay")
+    @patch("logs.models.cache")
+    def test_record_is_buffered(self, mock_cache, flush, get_username):
+        from .models import AuditLog
+
+        mock_cache.list_push.return_value = 1
+        AuditLog.record(username="john", action="modify", object_type="client")
+        self.assertFalse(AuditLog.objects.exists())
+        flush.assert_not_called()
+
+        (key, row), _ = mock_cache.list_push.call_args
+        self.assertEqual(row["username"], "john")
+        self.assertIsNotNone(row["entry_time"])
+        self.assertNotIn("id", row)
+
+        # a full batch is flushed right away
+        with patch("logs.models.AUDIT_LOG_FLUSH_BATCH", 1):
+            AuditLog.record(username="john", action="modify", object_type="client")
+        flush.assert_called_once()
+
+        # falls back to a direct write when buffering is unavailable
+        mock_cache.list_push.return_value = 0
+        AuditLog.record(username="john", action="modify", object_type="client")
+        self.assertEqual(AuditLog.objects.count(), 1)
+
+    @patch("logs.tasks.cache")
+    def test_flush_audit_log_task(self, mock_cache, get_username):
+        from .models import AuditLog
+        from .tasks import flush_audit_log_task
+
+        entry_time = djangotime.now() - djangotime.timedelta(minutes=5)
+        rows = [
+            {
+                "username": "john",
+                "action": "modify",
+                "object_type": "client",
+                "entry_time": entry_time,
+                "message": f"entry {i}",
+            }
+            for i in range(5)
+        ]
+        mock_cache.list_peek_many.side_effect = [rows, []]
+
+        flush_audit_log_task()
+        mock_cache.list_trim_head.assert_called_once_with("audit_log_buffer", 5)
+        self.assertEqual(
+            list(AuditLog.objects.order_by("id").values_list("message", flat=True)),
+            [f"entry {i}" for i in range(5)],
+        )
+        self.assertEqual(AuditLog.objects.filter(entry_time=entry_time).count(), 5)
+
+    @patch("logs.tasks.cache")
+    def test_flush_audit_log_task_failure_keeps_entries(self, mock_cache, get_username):
+        from .tasks import flush_audit_log_task
+
+        mock_cache.list_peek_many.return_value = [{"username": "john", "bad": 1}]
+        with self.assertRaises(TypeError):
+            flush_audit_log_task()
+        mock_cache.list_trim_head.assert_not_called()
@@ -1,15 +1,30 @@
 import hashlib
 import hmac
 import re
-from typing import List
+import uuid
+from typing import List, Optional
 
 from django.contrib.postgres.fields import ArrayField
+from django.core.cache import cache
 from django.db import models
 from django.db.models.fields import CharField, TextField
 
 from logs.models import BaseAuditModel
-from tacticalrmm.constants import ScriptShell, ScriptType
-from tacticalrmm.utils import replace_arg_db_values
+from tacticalrmm.constants import (
+    SCRIPT_SNIPPETS_CACHE_PREFIX,
+    SCRIPT_SNIPPETS_CACHE_TIMEOUT,
+    SCRIPT_SNIPPETS_VERSION_KEY,
+    ScriptShell,
+    ScriptType,
+)
+from tacticalrmm.utils import DBValueContext, replace_arg_db_values
+
+
+def invalidate_script_snippets() -> str:
+    # a new version orphans every cached script body, they expire on their own
+    version = uuid.uuid4().hex
+    cache.set(SCRIPT_SNIPPETS_VERSION_KEY, version, None)
+    return version
 
 
 class Script(BaseAuditModel):
@@ -62,19 +77,36 @@ class Script(BaseAuditModel):
     @classmethod
     def replace_with_snippets(cls, code):
         # check if snippet has been added to script body
-        matches = re.finditer(r"{{(.*)}}", code)
-        if matches:
-            replaced_code = code
-            for snippet in matches:
-                snippet_name = snippet.group(1).strip()
-                if ScriptSnippet.objects.filter(name=snippet_name).exists():
-                    value = ScriptSnippet.objects.get(name=snippet_name).code
-                    replaced_code = re.sub(
-                        snippet.group(), value.replace("\\", "\\\\"), replaced_code
-                    )
+        matches = list(re.finditer(r"{{(.*)}}", code))
+        if not matches:
+            return code
+
+        # expanded bodies are shared until a snippet changes
+        version = cache.get(SCRIPT_SNIPPETS_VERSION_KEY) or invalidate_script_snippets()
+        digest = hashlib.sha256(code.encode(errors="ignore")).hexdigest()
+        cache_key = f"{SCRIPT_SNIPPETS_CACHE_PREFIX}{digest}_{version}"
+
+        replaced_code = cache.get(cache_key)
+        if replaced_code is not None:
             return replaced_code
 
-        return code
+        snippets = dict(
+            ScriptSnippet.objects.filter(
+                name__in={snippet.group(1).strip() for snippet in matches}
+            ).values_list("name", "code")
+        )
+
+        replaced_code = code
+        for snippet in matches:
+            snippet_name = snippet.group(1).strip()
+            if snippet_name in snippets:
+                value = snippets[snippet_name]
+                replaced_code = re.sub(
+                    snippet.group(), value.replace("\\", "\\\\"), replaced_code
+                )
+
+        cache.set(cache_key, replaced_code, SCRIPT_SNIPPETS_CACHE_TIMEOUT)
+        return replaced_code
 
     def hash_script_body(self):
         from django.conf import settings
@@ -202,7 +234,13 @@ class Script(BaseAuditModel):
 
     @classmethod
     # TODO refactor common functionality of parse functions
-    def parse_script_args(cls, agent, shell: str, args: List[str] = []) -> list:
+    def parse_script_args(
+        cls,
+        agent,
+        shell: str,
+        args: List[str] = [],
+        context: Optional[DBValueContext] = None,
+    ) -> list:
         if not args:
             return []
 
@@ -220,6 +258,7 @@ class Script(BaseAuditModel):
                     instance=agent,
                     shell=shell,
                     quotes=shell != ScriptShell.CMD,
+                    context=context,
                 )
 
                 if value:
@@ -240,7 +279,13 @@ class Script(BaseAuditModel):
 
     @classmethod
     # TODO refactor common functionality of parse functions
-    def parse_script_env_vars(cls, agent, shell: str, env_vars: list[str] = []) -> list:
+    def parse_script_env_vars(
+        cls,
+        agent,
+        shell: str,
+        env_vars: list[str] = [],
+        context: Optional[DBValueContext] = None,
+    ) -> list:
         if not env_vars:
             return []
 
@@ -260,6 +305,7 @@ class Script(BaseAuditModel):
                     instance=agent,
                     shell=shell,
                     quotes=False,
+                    context=context,
                 )
 
                 if value:
@@ -285,3 +331,12 @@ class ScriptSnippet(models.Model):
 
     def __str__(self):
         return self.name
+
+    def save(self, *args, **kwargs) -> None:
+        super().save(*args, **kwargs)
+        invalidate_script_snippets()
+
+    def delete(self, *args, **kwargs):
+        ret = super().delete(*args, **kwargs)
+        invalidate_script_snippets()
+        return ret
@@ -1,12 +1,62 @@
-import asyncio
+from typing import Any, Callable, Iterator
 
 from django.conf import settings
 
 from agents.models import Agent, AgentHistory
+from agents.utils import update_bulk_dispatch
 from scripts.models import Script
 from tacticalrmm.celery import app
-from tacticalrmm.constants import AgentHistoryType
-from tacticalrmm.nats_utils import abulk_nats_command
+from tacticalrmm.constants import BULK_DISPATCH_BATCH_SIZE, AgentHistoryType
+from tacticalrmm.logger import logger
+from tacticalrmm.nats_utils import BULK_NATS_TASKS, NATS_DATA, stream_nats_command
+from tacticalrmm.utils import DBValueContext
+
+
+def dispatch_bulk_action(
+    *,
+    agents: list[Agent],
+    history: Callable[[Agent], AgentHistory],
+    nats_data: Callable[[Agent, AgentHistory], NATS_DATA],
+    dispatch_id: str | None = None,
+) -> dict[str, Any]:
+    """
+    Creates the history rows of a bulk action and publishes the nats commands
+    batch by batch, so the first agents get their work while the rest of the
+    batches are still being prepared.
+    """
+
+    def _batches() -> Iterator[BULK_NATS_TASKS]:
+        for i in range(0, len(agents), BULK_DISPATCH_BATCH_SIZE):
+            chunk = agents[i : i + BULK_DISPATCH_BATCH_SIZE]
+            hists = AgentHistory.objects.bulk_create(
+                [history(agent) for agent in chunk]
+            )
+            yield [
+                (agent.agent_id, nats_data(agent, hist))
+                for agent, hist in zip(chunk, hists)
+            ]
+
+    def _on_batch(stats: dict[str, Any]) -> None:
+        if dispatch_id:
+            update_bulk_dispatch(
+                dispatch_id,
+                status="running",
+                dispatched=stats["sent"],
+                failed=stats["failed"],
+            )
+
+    stats = stream_nats_command(batches=_batches(), on_batch=_on_batch)
+    if dispatch_id:
+        # agents that were never reached because nats went down count as failed
+        update_bulk_dispatch(
+            dispatch_id,
+            status="completed",
+            dispatched=stats["sent"],
+            failed=len(agents) - stats["sent"],
+        )
+
+    logger.debug(f"dispatch_bulk_action: {stats}")
+    return stats
 
 
 @app.task
@@ -18,8 +68,8 @@ def bulk_command_task(
     timeout: int,
     username: str,
     run_as_user: bool = False,
+    dispatch_id: str | None = None,
 ) -> None:
-    items = []
     nats_data = {
         "func": "rawcmd",
         "timeout": timeout,
@@ -29,19 +79,17 @@ def bulk_command_task(
         },
         "run_as_user": run_as_user,
     }
-    agent: "Agent"
-    for agent in Agent.objects.filter(pk__in=agent_pks):
-        hist = AgentHistory.objects.create(
+    dispatch_bulk_action(
+        agents=list(Agent.objects.filter(pk__in=agent_pks).only("pk", "agent_id")),
+        history=lambda agent: AgentHistory(
             agent=agent,
             type=AgentHistoryType.CMD_RUN,
             command=cmd,
             username=username,
-        )
-        tmp = {**nats_data}
-        tmp["id"] = hist.pk
-        items.append((agent.agent_id, tmp))
-
-    asyncio.run(abulk_nats_command(items=items))
+        ),
+        nats_data=lambda agent, hist: {**nats_data, "id": hist.pk},
+        dispatch_id=dispatch_id,
+    )
 
 
 @app.task
@@ -57,6 +105,7 @@ def bulk_script_task(
     custom_field_pk: int | None,
     collector_all_output: bool = False,
     save_to_agent_note: bool = False,
+    dispatch_id: str | None = None,
 ) -> None:
     script = Script.objects.get(pk=script_pk)
     # always override if set on script model
@@ -69,10 +118,13 @@ def bulk_script_task(
 
         custom_field = CustomField.objects.get(pk=custom_field_pk)
 
-    items = []
-    agent: "Agent"
-    for agent in Agent.objects.filter(pk__in=agent_pks):
-        hist = AgentHistory.objects.create(
+    agents = list(Agent.objects.filter(pk__in=agent_pks).select_related("site__client"))
+    # placeholders are resolved for every agent from a few prefetched queries
+    context = DBValueContext.for_args(args=[*args, *env_vars], instances=agents)
+    code = script.code
+
+    def _history(agent: Agent) -> AgentHistory:
+        return AgentHistory(
             agent=agent,
             type=AgentHistoryType.SCRIPT_RUN,
             script=script,
@@ -81,21 +133,30 @@ def bulk_script_task(
             collector_all_output=collector_all_output,
             save_to_agent_note=save_to_agent_note,
         )
-        data = {
+
+    def _nats_data(agent: Agent, hist: AgentHistory) -> NATS_DATA:
+        return {
             "func": "runscriptfull",
             "id": hist.pk,
             "timeout": timeout,
-            "script_args": script.parse_script_args(agent, script.shell, args),
+            "script_args": script.parse_script_args(
+                agent, script.shell, args, context=context
+            ),
             "payload": {
-                "code": script.code,
+                "code": code,
                 "shell": script.shell,
             },
             "run_as_user": run_as_user,
-            "env_vars": script.parse_script_env_vars(agent, script.shell, env_vars),
+            "env_vars": script.parse_script_env_vars(
+                agent, script.shell, env_vars, context=context
+            ),
             "nushell_enable_config": settings.NUSHELL_ENABLE_CONFIG,
             "deno_default_permissions": settings.DENO_DEFAULT_PERMISSIONS,
         }
-        tup = (agent.agent_id, data)
-        items.append(tup)
 
-    asyncio.run(abulk_nats_command(items=items))
+    dispatch_bulk_action(
+        agents=agents,
+        history=_history,
+        nats_data=_nats_data,
+        dispatch_id=dispatch_id,
+    )
@@ -3,13 +3,17 @@ from unittest.mock import patch
 from django.test import override_settings
 from model_bakery import baker
 
+from agents.models import Agent, AgentHistory
+from agents.utils import get_bulk_dispatches, start_bulk_dispatch
 from tacticalrmm.constants import (
+    AgentHistoryType,
     CustomFieldModel,
     CustomFieldType,
     ScriptShell,
     ScriptType,
 )
 from tacticalrmm.test import TacticalTestCase
+from tacticalrmm.utils import DBValueContext
 
 from .models import Script, ScriptSnippet
 from .serializers import (
@@ -17,6 +21,9 @@ from .serializers import (
     ScriptSnippetSerializer,
     ScriptTableSerializer,
 )
+from .tasks import bulk_command_task, bulk_script_task
+
+LOCMEM_CACHE = {"default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}}
 
 
 class TestScriptViews(TacticalTestCase):
@@ -670,3 +677,246 @@ class TestScriptSnippetViews(TacticalTestCase):
         # test text with no snippets
         result = Script.replace_with_snippets(test_no_snippet)
         self.assertEqual(result, test_no_snippet)
+
+    @override_settings(CACHES=LOCMEM_CACHE)
+    def test_snippet_replacement_cache(self):
+        snippet = baker.make("scripts.ScriptSnippet", name="snippet1", code="Code 1")
+        code = "Snippet: {{snippet1}}\nMissing: {{missing}}"
+
+        self.assertEqual(
+            Script.replace_with_snippets(code), "Snippet: Code 1\nMissing: {{missing}}"
+        )
+        with self.assertNumQueries(0):
+            Script.replace_with_snippets(code)
+
+        snippet.code = "Code 2"
+        snippet.save()
+        self.assertEqual(
+            Script.replace_with_snippets(code), "Snippet: Code 2\nMissing: {{missing}}"
+        )
+
+        baker.make("scripts.ScriptSnippet", name="missing", code="Found")
+        self.assertEqual(
+            Script.replace_with_snippets(code), "Snippet: Code 2\nMissing: Found"
+        )
+
+
+class TestDBValueContext(TacticalTestCase):
+    def setUp(self):
+        self.setup_coresettings()
+
+    def test_context_matches_direct_lookups(self):
+        agents = baker.make_recipe("agents.agent", _quantity=3)
+        agent_field = baker.make(
+            "core.CustomField",
+            name="Agent Field",
+            model=CustomFieldModel.AGENT,
+            type=CustomFieldType.TEXT,
+            default_value_string="AGENT DEFAULT",
+        )
+        client_field = baker.make(
+            "core.CustomField",
+            name="Client Field",
+            model=CustomFieldModel.CLIENT,
+            type=CustomFieldType.CHECKBOX,
+            default_value_bool=False,
+        )
+        site_field = baker.make(
+            "core.CustomField",
+            name="Site Field",
+            model=CustomFieldModel.SITE,
+            type=CustomFieldType.MULTIPLE,
+            default_values_multiple=["a", "b"],
+        )
+        baker.make(
+            "agents.AgentCustomField",
+            field=agent_field,
+            agent=agents[0],
+            string_value="AGENT VALUE",
+        )
+        baker.make(
+            "clients.ClientCustomField",
+            field=client_field,
+            client=agents[1].client,
+            bool_value=True,
+        )
+        baker.make(
+            "clients.SiteCustomField",
+            field=site_field,
+            site=agents[2].site,
+            multiple_value=["c"],
+        )
+        baker.make("core.GlobalKVStore", name="token", value="SECRET")
+
+        args = [
+            "-Agent {{agent.Agent Field}}",
+            "-Client {{client.Client Field}}",
+            "-Site {{site.Site Field}}",
+            "-Global {{global.token}}",
+            "-Hostname {{agent.hostname}}",
+            "-ClientName {{client.name}}",
+            "-NotAField {{agent.Not A Field}}",
+            "-Plain",
+        ]
+        env_vars = ["AGENT={{agent.Agent Field}}", "GLOBAL={{global.token}}"]
+
+        expected = [
+            (
+                Script.parse_script_args(agent, ScriptShell.POWERSHELL, args),
+                Script.parse_script_env_vars(agent, ScriptShell.POWERSHELL, env_vars),
+            )
+            for agent in agents
+        ]
+
+        agents = list(
+            Agent.objects.filter(pk__in=[agent.pk for agent in agents])
+            .select_related("site__client")
+            .order_by("pk")
+        )
+        with self.assertNumQueries(5):
+            context = DBValueContext.for_args(args=[*args, *env_vars], instances=agents)
+
+        with self.assertNumQueries(0):
+            resolved = [
+                (
+                    Script.parse_script_args(
+                        agent, ScriptShell.POWERSHELL, args, context=context
+                    ),
+                    Script.parse_script_env_vars(
+                        agent, ScriptShell.POWERSHELL, env_vars, context=context
+                    ),
+                )
+                for agent in agents
+            ]
+
+        self.assertEqual(resolved, expected)
+        self.assertEqual(resolved[0][0][0], "-Agent 'AGENT VALUE'")
+        self.assertEqual(resolved[1][0][0], "-Agent 'AGENT DEFAULT'")
+        self.assertEqual(resolved[1][0][1], "-Client $True")
+        self.assertEqual(resolved[2][0][2], "-Site 'c'")
+        self.assertEqual(resolved[0][1][1], "GLOBAL=SECRET")
+
+    def test_context_falls_back_for_other_instances(self):
+        agent, other = baker.make_recipe("agents.agent", _quantity=2)
+        field = baker.make(
+            "core.CustomField",
+            name="Agent Field",
+            model=CustomFieldModel.AGENT,
+            type=CustomFieldType.TEXT,
+        )
+        baker.make(
+            "agents.AgentCustomField", field=field, agent=other, string_value="OTHER"
+        )
+        args = ["{{agent.Agent Field}}", "{{global.late}}"]
+        context = DBValueContext.for_args(args=args, instances=[agent])
+        baker.make("core.GlobalKVStore", name="late", value="LATE")
+
+        self.assertEqual(
+            Script.parse_script_args(other, ScriptShell.CMD, args, context=context),
+            ["OTHER", "{{global.late}}"],
+        )
+
+
+@override_settings(CACHES=LOCMEM_CACHE)
+class TestBulkTasks(TacticalTestCase):
+    def setUp(self):
+        self.setup_coresettings()
+        self.agents = baker.make_recipe("agents.online_agent", _quantity=5)
+
+    def _stream(self, batches, on_batch=None):
+        # consume the batches like the real publisher does
+        stats = {"total": 0, "sent": 0, "failed": 0, "batches": 0}
+        for items in batches:
+            self.published.append(items)
+            stats["total"] += len(items)
+            stats["sent"] += len(items)
+            stats["batches"] += 1
+            if on_batch is not None:
+                on_batch(stats)
+        return stats
+
+    @patch("scripts.tasks.BULK_DISPATCH_BATCH_SIZE", 2)
+    @patch("scripts.tasks.stream_nats_command")
+    def test_bulk_command_task(self, stream_nats_command):
+        self.published = []
+        progress = []
+        stream_nats_command.side_effect = lambda batches, on_batch: self._stream(
+            batches,
+            lambda stats: (
+                on_batch(stats),
+                progress.extend(get_bulk_dispatches("bob")),
+            ),
+        )
+        dispatch_id = start_bulk_dispatch(username="bob", mode="command", total=5)
+
+        bulk_command_task(
+            agent_pks=[agent.pk for agent in self.agents],
+            cmd="whoami",
+            shell="cmd",
+            timeout=30,
+            username="bob",
+            dispatch_id=dispatch_id,
+        )
+
+        self.assertEqual([len(i) for i in self.published], [2, 2, 1])
+        history = AgentHistory.objects.filter(type=AgentHistoryType.CMD_RUN)
+        self.assertEqual(history.count(), 5)
+        for agent_id, data in [i for batch in self.published for i in batch]:
+            hist = history.get(pk=data["id"])
+            self.assertEqual(hist.agent.agent_id, agent_id)
+            self.assertEqual(hist.command, "whoami")
+            self.assertEqual(data["payload"]["command"], "whoami")
+
+        self.assertEqual([i["dispatched"] for i in progress], [2, 4, 5])
+        (dispatch,) = get_bulk_dispatches("bob")
+        self.assertEqual(dispatch["status"], "completed")
+        self.assertEqual(dispatch["dispatched"], 5)
+        self.assertEqual(dispatch["failed"], 0)
+        self.assertIsNotNone(dispatch["finished"])
+
+    @patch("scripts.tasks.stream_nats_command")
+    def test_bulk_script_task(self, stream_nats_command):
+        self.published = []
+        stream_nats_command.side_effect = self._stream
+        script = baker.make(
+            "scripts.Script",
+            script_body="Write-Output hi",
+            shell=ScriptShell.POWERSHELL,
+        )
+
+        # script, agents, placeholder context and a single history insert
+        with self.assertNumQueries(4):
+            bulk_script_task(
+                script_pk=script.pk,
+                agent_pks=[agent.pk for agent in self.agents],
+                args=["-Name {{agent.hostname}}"],
+                timeout=30,
+                username="bob",
+                custom_field_pk=None,
+            )
+
+        (items,) = self.published
+        self.assertEqual(len(items), 5)
+        agents = {agent.agent_id: agent for agent in self.agents}
+        for agent_id, data in items:
+            hist = AgentHistory.objects.get(pk=data["id"])
+            self.assertEqual(hist.type, AgentHistoryType.SCRIPT_RUN)
+            self.assertEqual(hist.script_id, script.pk)
+            self.assertEqual(
+                data["script_args"], [f"-Name '{agents[agent_id].hostname}'"]
+            )
+
+    def test_bulk_progress_view(self):
+        url = "/agents/actions/bulk/progress/"
+        first = start_bulk_dispatch(username="john", mode="script", total=3)
+        second = start_bulk_dispatch(username="john", mode="command", total=1)
+        start_bulk_dispatch(username="someone_else", mode="command", total=1)
+
+        self.authenticate()
+        r = self.client.get(url)
+        self.assertEqual(r.status_code, 200)
+        self.assertEqual([i["id"] for i in r.data], [second, first])
+        self.assertEqual(r.data[1]["status"], "queued")
+        self.assertEqual(r.data[1]["total"], 3)
+
+        self.check_not_authenticated("get", url)
@@ -1,4 +1,4 @@
-from typing import Optional
+from typing import Any, Optional
 
 from django.core.cache.backends.dummy import DummyCache
 from django.core.cache.backends.redis import RedisCache
@@ -22,7 +22,62 @@ class TacticalRedisCache(RedisCache):
     def raw_ttl(self, key: bytes) -> int:
         return self._cache.get_client().ttl(key)
 
+    def list_push(self, key: str, *values: Any, version: Optional[int] = None) -> int:
+        """Appends values to a redis list, returns the new length of the list"""
+        key = self.make_and_validate_key(key, version=version)
+        client = self._cache.get_client(key, write=True)
+        return client.rpush(key, *(self._cache._serializer.dumps(v) for v in values))
+
+    def list_pop_many(
+        self, key: str, count: int, version: Optional[int] = None
+    ) -> list[Any]:
+        """Atomically removes and returns up to count values from the head of a redis list"""
+        key = self.make_and_validate_key(key, version=version)
+        client = self._cache.get_client(key, write=True)
+        with client.pipeline() as pipe:
+            pipe.lrange(key, 0, count - 1)
+            pipe.ltrim(key, count, -1)
+            items, _ = pipe.execute()
+
+        return [self._cache._serializer.loads(i) for i in items]
+
+    def list_peek_many(
+        self, key: str, count: int, version: Optional[int] = None
+    ) -> list[Any]:
+        """Returns up to count values from the head of a redis list without removing them"""
+        key = self.make_and_validate_key(key, version=version)
+        client = self._cache.get_client(key)
+        return [
+            self._cache._serializer.loads(i) for i in client.lrange(key, 0, count - 1)
+        ]
+
+    def list_trim_head(
+        self, key: str, count: int, version: Optional[int] = None
+    ) -> None:
+        """Removes count values from the head of a redis list"""
+        key = self.make_and_validate_key(key, version=version)
+        client = self._cache.get_client(key, write=True)
+        client.ltrim(key, count, -1)
+
 
 class TacticalDummyCache(DummyCache):
     def delete_many_pattern(self, pattern: str, version: Optional[int] = None) -> None:
         return None
+
+    def list_push(self, key: str, *values: Any, version: Optional[int] = None) -> int:
+        return 0
+
+    def list_pop_many(
+        self, key: str, count: int, version: Optional[int] = None
+    ) -> list[Any]:
+        return []
+
+    def list_peek_many(
+        self, key: str, count: int, version: Optional[int] = None
+    ) -> list[Any]:
+        return []
+
+    def list_trim_head(
+        self, key: str, count: int, version: Optional[int] = None
+    ) -> None:
+        return None
@@ -51,7 +51,7 @@ app.conf.beat_schedule = {
     },
     "cache-db-fields-task": {
         "task": "core.tasks.cache_db_fields_task",
-        "schedule": crontab(minute="*/3", hour="*"),
+        "schedule": crontab(minute="*/10", hour="*"),
     },
     "sync-scheduled-tasks": {
         "task": "core.tasks.sync_scheduled_tasks",
@@ -65,6 +65,14 @@ app.conf.beat_schedule = {
         "task": "core.tasks.resolve_pending_actions",
         "schedule": timedelta(seconds=100.0),
     },
+    "flush-check-history": {
+        "task": "checks.tasks.flush_check_history_task",
+        "schedule": timedelta(seconds=30.0),
+    },
+    "flush-audit-log": {
+        "task": "logs.tasks.flush_audit_log_task",
+        "schedule": timedelta(seconds=10.0),
+    },
     "resolve-alerts-task": {
         "task": "core.tasks.resolve_alerts_task",
         "schedule": timedelta(seconds=80.0),
@@ -19,9 +19,20 @@ class MeshAgentIdent(Enum):
 
 
 CORESETTINGS_CACHE_KEY = "core_settings"
+POLICY_INDEX_CACHE_KEY = "policy_index_v1"
 ROLE_CACHE_PREFIX = "role_"
+ROLE_VISIBILITY_CACHE_PREFIX = "visibility_role_"
+ROLE_VISIBILITY_VERSION_KEY = "visibility_role_version"
+SCRIPT_SNIPPETS_CACHE_PREFIX = "script_snippets_"
+SCRIPT_SNIPPETS_VERSION_KEY = "script_snippets_version"
+SCRIPT_SNIPPETS_CACHE_TIMEOUT = 60 * 60 * 24
+BULK_DISPATCH_CACHE_PREFIX = "bulk_dispatch_"
+BULK_DISPATCH_CACHE_TIMEOUT = 60 * 60 * 6
 AGENT_TBL_PEND_ACTION_CNT_CACHE_PREFIX = "agent_tbl_pendingactions_"
 AGENT_CHECKS_CACHE_PREFIX = "agent_checks_data_"
+AGENT_FAILING_DATA_CACHE_PREFIX = "agent_failing_data_"
+CHECK_HISTORY_BUFFER_KEY = "check_history_buffer"
+AUDIT_LOG_BUFFER_KEY = "audit_log_buffer"
 
 AGENT_STATUS_ONLINE = "online"
 AGENT_STATUS_OFFLINE = "offline"
@@ -34,6 +45,25 @@ AGENT_OUTAGES_LOCK = "agent-outages-task-lock-key"
 ORPHANED_WIN_TASK_LOCK = "orphaned-win-task-lock-key"
 SYNC_MESH_PERMS_TASK_LOCK = "sync-mesh-perms-lock-key"
 CACHE_DB_FIELDS_TASK_LOCK = "cache-db-fields-task-lock-key"
+FLUSH_CHECK_HISTORY_LOCK = "flush-check-history-lock-key"
+FLUSH_AUDIT_LOG_LOCK = "flush-audit-log-lock-key"
+
+# max number of scheduled task syncs in flight at once
+SYNC_SCHED_TASK_CONCURRENCY = getattr(settings, "SYNC_SCHED_TASK_CONCURRENCY", 100)
+
+# rate (commands per second) and burst of the windows update bulk tasks fan-out
+WINUPDATE_FANOUT_RATE = getattr(settings, "WINUPDATE_FANOUT_RATE", 40)
+WINUPDATE_FANOUT_BURST = getattr(settings, "WINUPDATE_FANOUT_BURST", 40)
+
+# bulk command/script runs create history rows and publish in batches of this size
+BULK_DISPATCH_BATCH_SIZE = getattr(settings, "BULK_DISPATCH_BATCH_SIZE", 250)
+# number of recent bulk runs per user whose progress the dashboard can poll
+BULK_DISPATCH_HISTORY = 10
+
+# buffered check history rows are written in batches of this size
+CHECK_HISTORY_FLUSH_BATCH = getattr(settings, "CHECK_HISTORY_FLUSH_BATCH", 1000)
+# buffered audit log entries are written in batches of this size
+AUDIT_LOG_FLUSH_BATCH = getattr(settings, "AUDIT_LOG_FLUSH_BATCH", 500)
 
 TRMM_WS_MAX_SIZE = getattr(settings, "TRMM_WS_MAX_SIZE", 100 * 2**20)
 TRMM_MAX_REQUEST_SIZE = getattr(settings, "TRMM_MAX_REQUEST_SIZE", 10 * 2**20)
@@ -332,6 +362,17 @@ FIELDS_TRIGGER_TASK_UPDATE_AGENT = [
     "task_instance_policy",
 ]
 
+# changing any of these invalidates the stored next run of the task's results
+TASK_SCHEDULE_FIELDS = [
+    "task_type",
+    "enabled",
+    "run_time_date",
+    "run_time_bit_weekdays",
+    "monthly_days_of_month",
+    "monthly_months_of_year",
+    "monthly_weeks_of_month",
+]
+
 POLICY_TASK_FIELDS_TO_COPY = [
     "alert_severity",
     "email_alert",
@@ -9,6 +9,8 @@ if TYPE_CHECKING:
 class PermissionQuerySet(models.QuerySet):
     # filters queryset based on permissions. Works different for Agent, Client, and Site
     def filter_by_role(self, user: "User") -> "models.QuerySet":
+        from accounts.utils import get_role_visibility
+
         role = user.role
 
         # returns normal queryset if user is superuser
@@ -18,8 +20,9 @@ class PermissionQuerySet(models.QuerySet):
         if not role:
             return self.none()
 
-        can_view_clients = role.can_view_clients.all() if role else None
-        can_view_sites = role.can_view_sites.all() if role else None
+        visibility = get_role_visibility(role)
+        can_view_clients = visibility.client_ids
+        can_view_sites = visibility.site_ids
 
         clients_queryset = models.Q()
         sites_queryset = models.Q()
@@ -29,43 +32,37 @@ class PermissionQuerySet(models.QuerySet):
         # checks which sites and clients the user has access to and filters agents
         if model_name in ("Agent", "Deployment"):
             if can_view_clients:
-                clients_queryset = models.Q(site__client__in=can_view_clients)
+                clients_queryset = models.Q(site__client_id__in=can_view_clients)
 
             if can_view_sites:
-                sites_queryset = models.Q(site__in=can_view_sites)
+                sites_queryset = models.Q(site_id__in=can_view_sites)
 
             return self.filter(clients_queryset | sites_queryset)
 
         # checks which sites and clients the user has access to and filters clients and sites
         elif model_name == "Client" and (can_view_clients or can_view_sites):
             if can_view_sites:
-                sites_queryset = models.Q(
-                    pk__in=[site.client.pk for site in can_view_sites]
-                )
+                sites_queryset = models.Q(pk__in=visibility.site_client_ids)
 
             if can_view_clients:
-                clients_queryset = models.Q(
-                    pk__in=can_view_clients.values_list("pk", flat=True)
-                )
+                clients_queryset = models.Q(pk__in=can_view_clients)
 
             return self.filter(sites_queryset | clients_queryset)
 
         elif model_name == "Site" and (can_view_sites or can_view_clients):
             if can_view_clients:
-                clients_queryset = models.Q(client__in=can_view_clients)
+                clients_queryset = models.Q(client_id__in=can_view_clients)
             if can_view_sites:
-                sites_queryset = models.Q(
-                    pk__in=can_view_sites.values_list("pk", flat=True)
-                )
+                sites_queryset = models.Q(pk__in=can_view_sites)
 
             return self.filter(clients_queryset | sites_queryset)
 
         elif model_name == "Alert":
             custom_alert_queryset = models.Q()
             if can_view_clients:
-                clients_queryset = models.Q(agent__site__client__in=can_view_clients)
+                clients_queryset = models.Q(agent__site__client_id__in=can_view_clients)
             if can_view_sites:
-                sites_queryset = models.Q(agent__site__in=can_view_sites)
+                sites_queryset = models.Q(agent__site_id__in=can_view_sites)
             if can_view_clients or can_view_sites:
                 custom_alert_queryset = models.Q(
                     agent=None, assigned_check=None, assigned_task=None
@@ -87,8 +84,8 @@ class PermissionQuerySet(models.QuerySet):
                 agent_queryset = models.Q(agent=None)  # dont filter if agent is None
 
             if can_view_clients:
-                clients_queryset = models.Q(agent__site__client__in=can_view_clients)
+                clients_queryset = models.Q(agent__site__client_id__in=can_view_clients)
             if can_view_sites:
-                sites_queryset = models.Q(agent__site__in=can_view_sites)
+                sites_queryset = models.Q(agent__site_id__in=can_view_sites)
 
             return self.filter(clients_queryset | sites_queryset | agent_queryset)
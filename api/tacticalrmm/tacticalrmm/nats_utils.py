@@ -1,5 +1,12 @@
 import asyncio
-from typing import TYPE_CHECKING, Any
+import atexit
+import logging
+import os
+import threading
+import time
+from concurrent.futures import Future
+from contextlib import suppress
+from typing import TYPE_CHECKING, Any, Awaitable, Callable, Iterable, TypeVar
 
 import msgpack
 import nats
@@ -15,6 +22,157 @@ NATS_DATA = dict[str, Any]
 
 BULK_NATS_TASKS = list[tuple[str, Any]]
 
+T = TypeVar("T")
+
+logger = logging.getLogger("trmm")
+
+# reconnect behaviour of the pooled connection once it has been established.
+# The initial dial keeps the bounded settings from setup_nats_options() so
+# callers still get NatsDown quickly when nats-server is unreachable.
+NATS_POOL_RECONNECT_OPTS = {
+    "max_reconnect_attempts": -1,
+    "reconnect_time_wait": 2,
+}
+
+
+class NatsConnectionManager:
+    """
+    Long-lived, per-process NATS connection.
+
+    The connection is owned by a private event loop running in a daemon thread,
+    so it outlives the short-lived loops created by asyncio.run() / async_to_sync
+    at the call sites. Work is submitted as a coroutine function that receives
+    the connected client and is executed on the manager's loop.
+    """
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._pid: int | None = None
+        self._loop: asyncio.AbstractEventLoop | None = None
+        self._thread: threading.Thread | None = None
+        self._nc: "NClient | None" = None
+        self._connect_lock: asyncio.Lock | None = None
+
+    @staticmethod
+    def _run_loop(loop: asyncio.AbstractEventLoop, started: threading.Event) -> None:
+        asyncio.set_event_loop(loop)
+        loop.call_soon(started.set)
+        loop.run_forever()
+
+    def _ensure_loop(self) -> asyncio.AbstractEventLoop:
+        with self._lock:
+            # a forked child (celery prefork, uwsgi workers) inherits the parent's
+            # state but not its thread, so start over with a fresh loop and connection
+            if self._loop is None or self._pid != os.getpid():
+                loop = asyncio.new_event_loop()
+                started = threading.Event()
+                thread = threading.Thread(
+                    target=self._run_loop,
+                    args=(loop, started),
+                    name="trmm-nats",
+                    daemon=True,
+                )
+                thread.start()
+                started.wait()
+                self._loop = loop
+                self._thread = thread
+                self._pid = os.getpid()
+                self._nc = None
+                self._connect_lock = None
+
+            return self._loop
+
+    @staticmethod
+    def _is_healthy(nc: "NClient | None") -> bool:
+        return (
+            nc is not None
+            and not nc.is_closed
+            and (nc.is_connected or nc.is_reconnecting)
+        )
+
+    async def _get_client(self) -> "NClient":
+        if self._connect_lock is None:
+            self._connect_lock = asyncio.Lock()
+
+        async with self._connect_lock:
+            if self._is_healthy(self._nc):
+                return self._nc  # type: ignore
+
+            if self._nc is not None:
+                with suppress(Exception):
+                    await self._nc.close()
+                self._nc = None
+
+            opts = setup_nats_options()
+            opts.update(
+                disconnected_cb=self._disconnected_cb,
+                reconnected_cb=self._reconnected_cb,
+            )
+            try:
+                nc = await nats.connect(**opts)
+            except Exception as e:
+                logger.error(f"Unable to connect to NATS: {e}")
+                raise NatsDown from e
+
+            # from here on keep reconnecting in the background instead of giving up
+            nc.options.update(NATS_POOL_RECONNECT_OPTS)
+            self._nc = nc
+            return nc
+
+    @staticmethod
+    async def _disconnected_cb() -> None:
+        logger.warning("Pooled NATS connection lost, reconnecting")
+
+    @staticmethod
+    async def _reconnected_cb() -> None:
+        logger.info("Pooled NATS connection re-established")
+
+    async def _call(self, fn: Callable[["NClient"], Awaitable[T]]) -> T:
+        nc = await self._get_client()
+        return await fn(nc)
+
+    async def arun(self, fn: Callable[["NClient"], Awaitable[T]]) -> T:
+        """
+        Run fn(nc) on the pooled connection from any event loop.
+        Raises NatsDown if a connection cannot be established.
+        """
+        loop = self._ensure_loop()
+        if asyncio.get_running_loop() is loop:
+            return await self._call(fn)
+
+        fut = asyncio.run_coroutine_threadsafe(self._call(fn), loop)
+        return await asyncio.wrap_future(fut)
+
+    def submit(self, fn: Callable[["NClient"], Awaitable[T]]) -> "Future[T]":
+        """
+        Schedule fn(nc) on the pooled connection without waiting for it,
+        so the caller can keep working while it runs.
+        """
+        loop = self._ensure_loop()
+        if threading.current_thread() is self._thread:
+            raise RuntimeError("submit() cannot be called from the NATS loop")
+
+        return asyncio.run_coroutine_threadsafe(self._call(fn), loop)
+
+    def run(self, fn: Callable[["NClient"], Awaitable[T]]) -> T:
+        """Sync facade of arun() for code that is not running inside an event loop."""
+        return self.submit(fn).result()
+
+    def close(self) -> None:
+        with self._lock:
+            loop, nc = self._loop, self._nc
+            self._nc = None
+            if loop is None or self._pid != os.getpid():
+                return
+
+        if nc is not None and not nc.is_closed:
+            with suppress(Exception):
+                asyncio.run_coroutine_threadsafe(nc.close(), loop).result(timeout=5)
+
+
+nats_pool = NatsConnectionManager()
+atexit.register(nats_pool.close)
+
 
 async def _anats_message(*, nc: "NClient", subject: str, data: "NATS_DATA") -> None:
     try:
@@ -27,16 +185,134 @@ async def _anats_message(*, nc: "NClient", subject: str, data: "NATS_DATA") -> N
 
 async def abulk_nats_command(*, items: "BULK_NATS_TASKS") -> None:
     """Fire and forget"""
-    opts = setup_nats_options()
-    try:
-        nc = await nats.connect(**opts)
-    except Exception:
-        raise NatsDown
-
-    tasks = [_anats_message(nc=nc, subject=item[0], data=item[1]) for item in items]
-    await asyncio.gather(*tasks)
-    await nc.flush()
-    await nc.close()
+
+    async def _publish(nc: "NClient") -> None:
+        tasks = [_anats_message(nc=nc, subject=item[0], data=item[1]) for item in items]
+        await asyncio.gather(*tasks)
+        await nc.flush()
+
+    await nats_pool.arun(_publish)
+
+
+class TokenBucket:
+    """
+    Lets `rate` acquisitions through per second on average, with bursts of
+    up to `burst` after a quiet period.
+    """
+
+    def __init__(self, *, rate: float, burst: int) -> None:
+        self.rate = rate
+        self.burst = max(burst, 1)
+        self._tokens = float(self.burst)
+        self._updated = time.monotonic()
+
+    async def acquire(self) -> None:
+        while True:
+            now = time.monotonic()
+            self._tokens = min(
+                self.burst, self._tokens + (now - self._updated) * self.rate
+            )
+            self._updated = now
+            if self._tokens >= 1:
+                self._tokens -= 1
+                return
+
+            await asyncio.sleep((1 - self._tokens) / self.rate)
+
+
+def fanout_nats_command(
+    *, items: "BULK_NATS_TASKS", rate: float, burst: int
+) -> dict[str, Any]:
+    """
+    Fire and forget publish of every item over the pooled connection,
+    rate limited by a token bucket. Returns stats of the run.
+    """
+    stats: dict[str, Any] = {"total": len(items), "sent": 0, "failed": 0}
+    start = time.monotonic()
+
+    async def _publish(nc: "NClient") -> None:
+        bucket = TokenBucket(rate=rate, burst=burst)
+        for subject, data in items:
+            await bucket.acquire()
+            try:
+                await nc.publish(subject=subject, payload=msgpack.dumps(data))
+            except Exception as e:
+                logger.debug(f"Unable to publish to {subject}: {e}")
+                stats["failed"] += 1
+            else:
+                stats["sent"] += 1
+
+        with suppress(Exception):
+            await nc.flush()
+
+    if items:
+        try:
+            nats_pool.run(_publish)
+        except NatsDown:
+            stats["failed"] = stats["total"] - stats["sent"]
+
+    stats["elapsed"] = round(time.monotonic() - start, 2)
+    return stats
+
+
+def stream_nats_command(
+    *,
+    batches: Iterable["BULK_NATS_TASKS"],
+    on_batch: Callable[[dict[str, Any]], None] | None = None,
+) -> dict[str, Any]:
+    """
+    Fire and forget publish of batches over the pooled connection as they
+    are produced. Each batch is published while the caller prepares the next
+    one, and on_batch is called with the running stats once it is sent.
+    Stops consuming batches if nats is down.
+    """
+    stats: dict[str, Any] = {"total": 0, "sent": 0, "failed": 0, "batches": 0}
+    start = time.monotonic()
+
+    def _publisher(items: "BULK_NATS_TASKS") -> Callable[["NClient"], Awaitable[int]]:
+        async def _publish(nc: "NClient") -> int:
+            failed = 0
+            for subject, data in items:
+                try:
+                    await nc.publish(subject=subject, payload=msgpack.dumps(data))
+                except Exception as e:
+                    logger.debug(f"Unable to publish to {subject}: {e}")
+                    failed += 1
+
+            with suppress(Exception):
+                await nc.flush()
+            return failed
+
+        return _publish
+
+    def _collect(fut: "Future[int]", size: int) -> bool:
+        connected = True
+        try:
+            failed = fut.result()
+        except NatsDown:
+            failed, connected = size, False
+
+        stats["batches"] += 1
+        stats["sent"] += size - failed
+        stats["failed"] += failed
+        if on_batch is not None:
+            on_batch(stats)
+        return connected
+
+    pending: "tuple[Future[int], int] | None" = None
+    for items in batches:
+        if pending is not None and not _collect(*pending):
+            pending = None
+            break
+
+        stats["total"] += len(items)
+        pending = (nats_pool.submit(_publisher(items)), len(items))
+
+    if pending is not None:
+        _collect(*pending)
+
+    stats["elapsed"] = round(time.monotonic() - start, 2)
+    return stats
 
 
 async def a_nats_cmd(
@@ -3,8 +3,8 @@ from typing import TYPE_CHECKING
 from django.db.models import Q
 from django.shortcuts import get_object_or_404
 
+from accounts.utils import get_role_visibility
 from agents.models import Agent
-from tacticalrmm.constants import AGENT_DEFER
 
 if TYPE_CHECKING:
     from accounts.models import User
@@ -24,8 +24,6 @@ def _has_perm(request, perm: str) -> bool:
 
 
 def _has_perm_on_agent(user: "User", agent_id: str) -> bool:
-    from agents.models import Agent
-
     if user.is_installer_user:
         return False
 
@@ -37,23 +35,12 @@ def _has_perm_on_agent(user: "User", agent_id: str) -> bool:
     elif not role:
         return False
 
-    agent = get_object_or_404(
-        Agent.objects.defer(*AGENT_DEFER).select_related("site__client"),
-        agent_id=agent_id,
-    )
-    can_view_clients = role.can_view_clients.all() if role else None
-    can_view_sites = role.can_view_sites.all() if role else None
-
-    if not can_view_clients and not can_view_sites:
-        return True
-
-    elif can_view_clients and agent.client in can_view_clients:
+    visibility = get_role_visibility(role)
+    if visibility.unrestricted:
         return True
 
-    elif can_view_sites and agent.site in can_view_sites:
-        return True
-
-    return False
+    agent = get_object_or_404(Agent.objects.only("site_id"), agent_id=agent_id)
+    return agent.site_id in visibility.all_site_ids
 
 
 def _has_perm_on_client(user: "User", client_id: int) -> bool:
@@ -67,16 +54,12 @@ def _has_perm_on_client(user: "User", client_id: int) -> bool:
     elif not role:
         return False
 
-    client = get_object_or_404(Client, pk=client_id)
-    can_view_clients = role.can_view_clients.all() if role else None
-
-    if not can_view_clients:
-        return True
-
-    elif can_view_clients and client in can_view_clients:
+    visibility = get_role_visibility(role)
+    if not visibility.client_ids:
         return True
 
-    return False
+    client = get_object_or_404(Client.objects.only("pk"), pk=client_id)
+    return client.pk in visibility.client_ids
 
 
 def _has_perm_on_site(user: "User", site_id: int) -> bool:
@@ -90,20 +73,12 @@ def _has_perm_on_site(user: "User", site_id: int) -> bool:
     elif not role:
         return False
 
-    site = get_object_or_404(Site, pk=site_id)
-    can_view_clients = role.can_view_clients.all() if role else None
-    can_view_sites = role.can_view_sites.all() if role else None
-
-    if not can_view_clients and not can_view_sites:
-        return True
-
-    elif can_view_sites and site in can_view_sites:
+    visibility = get_role_visibility(role)
+    if visibility.unrestricted:
         return True
 
-    elif can_view_clients and site.client in can_view_clients:
-        return True
-
-    return False
+    site = get_object_or_404(Site.objects.only("pk"), pk=site_id)
+    return site.pk in visibility.all_site_ids
 
 
 def _audit_log_filter(user: "User") -> Q:
@@ -118,20 +93,19 @@ def _audit_log_filter(user: "User") -> Q:
     sites_queryset = Q()
     clients_queryset = Q()
     agent_filter = Q()
-    can_view_clients = role.can_view_clients.all() if role else None
-    can_view_sites = role.can_view_sites.all() if role else None
+    visibility = get_role_visibility(role)
 
-    if can_view_sites:
-        agents = Agent.objects.filter(site__in=can_view_sites).values_list(
+    if visibility.site_ids:
+        agents = Agent.objects.filter(site_id__in=visibility.site_ids).values_list(
             "agent_id", flat=True
         )
         sites_queryset = Q(agent_id__in=agents)
         agent_filter = Q(agent_id=None)
 
-    if can_view_clients:
-        agents = Agent.objects.filter(site__client__in=can_view_clients).values_list(
-            "agent_id", flat=True
-        )
+    if visibility.client_ids:
+        agents = Agent.objects.filter(
+            site__client_id__in=visibility.client_ids
+        ).values_list("agent_id", flat=True)
         sites_queryset = Q(agent_id__in=agents)
         agent_filter = Q(agent_id=None)
 
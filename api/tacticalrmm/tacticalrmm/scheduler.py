@@ -1,9 +1,12 @@
 import calendar
+import datetime as dt
 from zoneinfo import ZoneInfo
 
 from tacticalrmm.constants import (
     MONTH_DAYS,
     WEEKS,
+    TaskRunStatus,
+    TaskType,
 )
 from tacticalrmm.helpers import is_month_in_bitmask, is_weekday_in_bitmask
 
@@ -124,6 +127,123 @@ def should_run_monthly_task(task, agent, current_time) -> bool:
     return False
 
 
+# stored as the next run of task results that will never fire again so the
+# runner doesn't have to evaluate them every minute
+NEVER = dt.datetime(9999, 1, 1, tzinfo=dt.timezone.utc)
+
+# long enough to find a monthly task scheduled only on february 29th
+NEXT_RUN_LOOKAHEAD_DAYS = 366 * 4 + 1
+
+
+def get_next_run(task, agent, task_result, after: dt.datetime) -> dt.datetime:
+    """
+    Returns the first minute, in UTC, at or after the given time in which
+    scheduled_task_runner will run the task on the agent, or NEVER.
+    Candidate days are walked in the agent's timezone and checked with the
+    same should_run_* functions the runner used to call every minute.
+    """
+    after = after.astimezone(dt.timezone.utc).replace(second=0, microsecond=0)
+
+    if task.task_type == TaskType.ONBOARDING:
+        if not task_result.last_run and task_result.run_status not in {
+            TaskRunStatus.RUNNING,
+            TaskRunStatus.COMPLETED,
+        }:
+            return after
+
+        return NEVER
+
+    if not task.run_time_date:
+        return NEVER
+
+    agent_timezone = ZoneInfo(agent.timezone)
+
+    if task.task_type == TaskType.RUN_ONCE:
+        if task_result.last_run:
+            return NEVER
+
+        run_time = task.run_time_date.replace(
+            tzinfo=agent_timezone, second=0, microsecond=0
+        ).astimezone(dt.timezone.utc)
+        return run_time if run_time >= after else NEVER
+
+    should_run = {
+        TaskType.DAILY: should_run_daily_task,
+        TaskType.WEEKLY: should_run_weekly_task,
+        TaskType.MONTHLY: should_run_monthly_task,
+        TaskType.MONTHLY_DOW: should_run_monthly_dow_task,
+    }.get(task.task_type)
+
+    if should_run is None:
+        return NEVER
+
+    day = after.astimezone(agent_timezone).date()
+    hour, minute = task.run_time_date.hour, task.run_time_date.minute
+    for _ in range(NEXT_RUN_LOOKAHEAD_DAYS):
+        # fold=1 is the second occurrence of a wall time repeated by a dst change
+        for fold in (0, 1):
+            candidate = dt.datetime.combine(
+                day, dt.time(hour, minute, fold=fold), tzinfo=agent_timezone
+            ).astimezone(dt.timezone.utc)
+
+            if candidate >= after and should_run(task, agent, candidate):
+                return candidate
+
+        day += dt.timedelta(days=1)
+
+    return NEVER
+
+
+def is_patch_day(patch_policy, day: dt.date) -> bool:
+    if patch_policy.run_time_frequency == "daily":
+        return day.weekday() in (patch_policy.run_time_days or [])
+
+    if patch_policy.run_time_frequency == "monthly":
+        run_time_day = patch_policy.run_time_day
+        if run_time_day > 28:
+            months_with_30_days = [3, 6, 9, 11]
+            if day.month == 2:
+                run_time_day = 28
+            elif day.month in months_with_30_days:
+                run_time_day = 30
+
+        return day.day == run_time_day
+
+    return False
+
+
+def get_next_patch_window(patch_policy, agent, after: dt.datetime) -> dt.datetime:
+    """
+    Returns the start, in UTC, of the first patch window of the agent that
+    hasn't ended at the given time, or NEVER. A window is the hour of the
+    patch policy's run_time_hour on a patch day, in the agent's timezone.
+    """
+    if patch_policy.run_time_frequency not in ("daily", "monthly"):
+        return NEVER
+
+    agent_timezone = ZoneInfo(agent.timezone)
+    hour = patch_policy.run_time_hour
+    day = after.astimezone(agent_timezone).date()
+    for _ in range(NEXT_RUN_LOOKAHEAD_DAYS):
+        if is_patch_day(patch_policy, day):
+            # fold=1 is the second occurrence of an hour repeated by a dst change
+            for fold in (0, 1):
+                start = dt.datetime.combine(
+                    day, dt.time(hour, fold=fold), tzinfo=agent_timezone
+                ).astimezone(dt.timezone.utc)
+
+                # the hour doesn't exist on days clocks are moved forward
+                if start.astimezone(agent_timezone).hour != hour:
+                    continue
+
+                if start + dt.timedelta(hours=1) > after:
+                    return start
+
+        day += dt.timedelta(days=1)
+
+    return NEVER
+
+
 # new schedule functions
 LAST_DAY_OF_MONTH = 32
 LAST_WEEK_OF_MONTH = 5
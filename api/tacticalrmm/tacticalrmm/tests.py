@@ -1,4 +1,6 @@
-from unittest.mock import mock_open, patch
+import asyncio
+import time
+from unittest.mock import AsyncMock, mock_open, patch
 
 import requests
 from django.test import override_settings
@@ -12,6 +14,14 @@ from tacticalrmm.constants import (
     POLICY_CHECK_FIELDS_TO_COPY,
     POLICY_TASK_FIELDS_TO_COPY,
 )
+from tacticalrmm.exceptions import NatsDown
+from tacticalrmm.nats_utils import (
+    NatsConnectionManager,
+    TokenBucket,
+    abulk_nats_command,
+    fanout_nats_command,
+    stream_nats_command,
+)
 from tacticalrmm.test import TacticalTestCase
 
 from .utils import bitdays_to_string, generate_winagent_exe, get_bit_days, reload_nats
@@ -134,3 +144,190 @@ class TestUtils(TacticalTestCase):
 
         for i in CHECK_RESULT_DEFER:
             self.assertIn(i, check_result_fields)
+
+
+class TestNatsConnectionManager(TacticalTestCase):
+    def setUp(self):
+        self.pool = NatsConnectionManager()
+
+    def tearDown(self):
+        self.pool.close()
+
+    @staticmethod
+    def _fake_nc():
+        nc = AsyncMock()
+        nc.is_closed = False
+        nc.is_connected = True
+        nc.is_reconnecting = False
+        nc.options = {"max_reconnect_attempts": 2}
+        return nc
+
+    @patch("tacticalrmm.nats_utils.nats.connect")
+    def test_connection_reused_across_event_loops(self, mock_connect):
+        nc = self._fake_nc()
+        mock_connect.return_value = nc
+
+        async def publish(nc):
+            await nc.publish("agent", b"data")
+            return "ok"
+
+        for _ in range(3):
+            self.assertEqual(asyncio.run(self.pool.arun(publish)), "ok")
+        self.assertEqual(self.pool.run(publish), "ok")
+
+        mock_connect.assert_awaited_once()
+        self.assertEqual(nc.publish.await_count, 4)
+        nc.close.assert_not_awaited()
+
+    @patch("tacticalrmm.nats_utils.nats.connect")
+    def test_reconnects_when_connection_closed(self, mock_connect):
+        nc1, nc2 = self._fake_nc(), self._fake_nc()
+        mock_connect.side_effect = [nc1, nc2]
+
+        async def noop(nc):
+            return nc
+
+        self.assertIs(self.pool.run(noop), nc1)
+        nc1.is_closed = True
+        self.assertIs(self.pool.run(noop), nc2)
+        self.assertEqual(mock_connect.await_count, 2)
+
+    @patch("tacticalrmm.nats_utils.nats.connect")
+    def test_reconnecting_connection_is_kept(self, mock_connect):
+        nc = self._fake_nc()
+        mock_connect.return_value = nc
+
+        async def noop(nc):
+            return nc
+
+        self.assertIs(self.pool.run(noop), nc)
+        # nats-py is reconnecting on its own, don't dial a second connection
+        nc.is_connected = False
+        nc.is_reconnecting = True
+        self.assertIs(self.pool.run(noop), nc)
+
+        mock_connect.assert_awaited_once()
+        nc.close.assert_not_awaited()
+
+    @patch("tacticalrmm.nats_utils.nats.connect")
+    def test_pooled_connection_reconnects_indefinitely(self, mock_connect):
+        nc = self._fake_nc()
+        mock_connect.return_value = nc
+
+        async def noop(nc):
+            return nc
+
+        self.pool.run(noop)
+
+        # initial dial stays bounded so callers fail fast when nats is down
+        self.assertEqual(mock_connect.call_args.kwargs["max_reconnect_attempts"], 2)
+        self.assertEqual(nc.options["max_reconnect_attempts"], -1)
+        self.assertEqual(nc.options["reconnect_time_wait"], 2)
+
+    @patch("tacticalrmm.nats_utils.nats.connect")
+    def test_connect_failure_raises_nats_down(self, mock_connect):
+        mock_connect.side_effect = Exception("connection refused")
+
+        async def noop(nc):
+            return nc
+
+        with self.assertRaises(NatsDown):
+            self.pool.run(noop)
+
+    @patch("tacticalrmm.nats_utils.nats_pool", new_callable=NatsConnectionManager)
+    @patch("tacticalrmm.nats_utils.nats.connect")
+    def test_abulk_nats_command(self, mock_connect, mock_pool):
+        nc = self._fake_nc()
+        mock_connect.return_value = nc
+
+        items = [("agent1", {"func": "ping"}), ("agent2", {"func": "ping"})]
+        asyncio.run(abulk_nats_command(items=items))
+        asyncio.run(abulk_nats_command(items=items))
+
+        mock_connect.assert_awaited_once()
+        self.assertEqual(nc.publish.await_count, 4)
+        self.assertEqual(nc.flush.await_count, 2)
+        mock_pool.close()
+
+    @patch("tacticalrmm.nats_utils.nats_pool", new_callable=NatsConnectionManager)
+    @patch("tacticalrmm.nats_utils.nats.connect")
+    def test_fanout_nats_command(self, mock_connect, mock_pool):
+        nc = self._fake_nc()
+        nc.publish.side_effect = [None, Exception("slow consumer"), None]
+        mock_connect.return_value = nc
+
+        items = [(f"agent{i}", {"func": "getwinupdates"}) for i in range(3)]
+        stats = fanout_nats_command(items=items, rate=1000, burst=10)
+
+        mock_connect.assert_awaited_once()
+        self.assertEqual(nc.publish.await_count, 3)
+        self.assertEqual(stats["total"], 3)
+        self.assertEqual(stats["sent"], 2)
+        self.assertEqual(stats["failed"], 1)
+        mock_pool.close()
+
+    @patch("tacticalrmm.nats_utils.nats_pool", new_callable=NatsConnectionManager)
+    @patch("tacticalrmm.nats_utils.nats.connect")
+    def test_fanout_nats_command_nats_down(self, mock_connect, mock_pool):
+        mock_connect.side_effect = Exception("connection refused")
+
+        items = [(f"agent{i}", {"func": "getwinupdates"}) for i in range(3)]
+        stats = fanout_nats_command(items=items, rate=1000, burst=10)
+        self.assertEqual(stats["sent"], 0)
+        self.assertEqual(stats["failed"], 3)
+        mock_pool.close()
+
+    @patch("tacticalrmm.nats_utils.nats_pool", new_callable=NatsConnectionManager)
+    @patch("tacticalrmm.nats_utils.nats.connect")
+    def test_stream_nats_command(self, mock_connect, mock_pool):
+        nc = self._fake_nc()
+        mock_connect.return_value = nc
+        progress = []
+
+        batches = (
+            [(f"agent{i}{j}", {"func": "ping"}) for j in range(i + 1)] for i in range(3)
+        )
+        stats = stream_nats_command(
+            batches=batches, on_batch=lambda s: progress.append(s["sent"])
+        )
+        mock_connect.assert_awaited_once()
+        self.assertEqual(nc.publish.await_count, 6)
+        self.assertEqual(nc.flush.await_count, 3)
+        self.assertEqual(progress, [1, 3, 6])
+        self.assertEqual(stats["total"], 6)
+        self.assertEqual(stats["sent"], 6)
+        self.assertEqual(stats["batches"], 3)
+        mock_pool.close()
+
+    @patch("tacticalrmm.nats_utils.nats_pool", new_callable=NatsConnectionManager)
+    @patch("tacticalrmm.nats_utils.nats.connect")
+    def test_stream_nats_command_nats_down(self, mock_connect, mock_pool):
+        mock_connect.side_effect = Exception("connection refused")
+        produced = []
+
+        def batches():
+            for i in range(3):
+                produced.append(i)
+                yield [(f"agent{i}", {"func": "ping"})]
+
+        stats = stream_nats_command(batches=batches())
+        # stops preparing batches once nats is known to be down
+        self.assertLess(len(produced), 3)
+        self.assertEqual(stats["sent"], 0)
+        self.assertEqual(stats["failed"], stats["total"])
+        mock_pool.close()
+
+    def test_token_bucket(self):
+        async def acquire(n: int) -> None:
+            bucket = TokenBucket(rate=100, burst=5)
+            for _ in range(n):
+                await bucket.acquire()
+
+        start = time.monotonic()
+        asyncio.run(acquire(5))
+        self.assertLess(time.monotonic() - start, 0.05)
+
+        # 5 in the initial burst then 10 more at 100 per second
+        start = time.monotonic()
+        asyncio.run(acquire(15))
+        self.assertGreaterEqual(time.monotonic() - start, 0.09)
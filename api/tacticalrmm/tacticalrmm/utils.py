@@ -5,8 +5,9 @@ import socket
 import subprocess
 import tempfile
 import time
+from collections import defaultdict
 from contextlib import contextmanager
-from typing import TYPE_CHECKING, List, Literal, Optional, Union
+from typing import TYPE_CHECKING, Any, Iterable, List, Literal, Optional, Union
 from zoneinfo import ZoneInfo
 
 import requests
@@ -45,6 +46,7 @@ from tacticalrmm.helpers import (
 if TYPE_CHECKING:
     from alerts.models import Alert
     from clients.models import Client, Site
+    from core.models import CustomField
 
 
 def generate_winagent_exe(
@@ -317,8 +319,104 @@ RE_DB_VALUE = re.compile(
 # This will recursively lookup values for relations. {{ client.site.id }}
 #
 # You can also use {{ global.value }} without an obj instance to use the global key store
+# a {{placeholder}} anywhere in a script argument or environment variable
+RE_SCRIPT_PLACEHOLDER = re.compile(".*\\{\\{(.*)\\}\\}.*")
+
+
+class DBValueContext:
+    """
+    Lookups of get_db_value prefetched for a set of placeholders and the
+    instances they will be resolved for, so that resolving them for many
+    agents takes a few queries in total instead of a few per agent and
+    placeholder. Anything that wasn't prefetched is looked up as usual.
+    """
+
+    def __init__(self, *, strings: Iterable[str], instances: Iterable[Any]) -> None:
+        from core.models import CustomField, GlobalKVStore
+
+        props = {tuple(string.strip().split(".")) for string in strings}
+        instances = list(instances)
+
+        self.global_names = {p[1] for p in props if p[0] == "global" and len(p) == 2}
+        self.global_values: dict[str, str] = {}
+        if self.global_names:
+            self.global_values = dict(
+                GlobalKVStore.objects.filter(name__in=self.global_names).values_list(
+                    "name", "value"
+                )
+            )
+
+        field_keys = {p for p in props if p[0] != "global" and len(p) == 2}
+        self.field_keys = field_keys
+        self.custom_fields: dict[tuple[str, str], "CustomField"] = {}
+        if field_keys:
+            for field in CustomField.objects.filter(
+                model__in={model for model, _ in field_keys},
+                name__in={name for _, name in field_keys},
+            ):
+                if (field.model, field.name) in field_keys:
+                    self.custom_fields[(field.model, field.name)] = field
+
+        fields_by_model = defaultdict(list)
+        for field in self.custom_fields.values():
+            fields_by_model[field.model].append(field)
+
+        # (custom field pk, agent/site/client pk) -> AgentCustomField etc.
+        self.related_pks: dict[str, set[int]] = {}
+        self.custom_field_values: dict[tuple[int, int], Any] = {}
+        for model, fields in fields_by_model.items():
+            self.related_pks[model] = {
+                related.pk
+                for related in (self.get_related(i, model) for i in instances)
+                if related is not None
+            }
+            ValueModel = CustomField._meta.get_field(f"{model}_fields").related_model
+            for value in ValueModel.objects.filter(
+                field__in=fields, **{f"{model}_id__in": self.related_pks[model]}
+            ).select_related("field"):
+                key = (value.field_id, getattr(value, f"{model}_id"))
+                self.custom_field_values[key] = value
+
+    @classmethod
+    def for_args(
+        cls, *, args: Iterable[str], instances: Iterable[Any]
+    ) -> "DBValueContext":
+        return cls(
+            strings=[
+                match.group(1)
+                for arg in args
+                if arg and (match := RE_SCRIPT_PLACEHOLDER.match(arg))
+            ],
+            instances=instances,
+        )
+
+    @staticmethod
+    def get_related(instance: Any, model: str) -> Any:
+        if model == instance.__class__.__name__.lower():
+            return instance
+
+        return getattr(instance, model, None)
+
+    def has_custom_field(self, model: str, name: str) -> bool:
+        return (model, name) in self.field_keys
+
+    def has_custom_field_value(self, field: "CustomField", instance: Any) -> bool:
+        related = self.get_related(instance, field.model)
+        return related is not None and related.pk in self.related_pks.get(
+            field.model, ()
+        )
+
+    def get_custom_field_value(self, field: "CustomField", instance: Any) -> Any:
+        # raises KeyError when the instance has no value for the field
+        related = self.get_related(instance, field.model)
+        return self.custom_field_values[(field.pk, related.pk)].value
+
+
 def get_db_value(
-    *, string: str, instance: Optional[Union["Agent", "Client", "Site", "Alert"]] = None
+    *,
+    string: str,
+    instance: Optional[Union["Agent", "Client", "Site", "Alert"]] = None,
+    context: Optional[DBValueContext] = None,
 ) -> Union[str, List[str], Literal[True], Literal[False], None]:
     from core.models import CustomField, GlobalKVStore
 
@@ -328,6 +426,12 @@ def get_db_value(
     # value is in the global keystore and replace value
     if props[0] == "global" and len(props) == 2:
         try:
+            if context and props[1] in context.global_names:
+                if props[1] not in context.global_values:
+                    raise GlobalKVStore.DoesNotExist
+
+                return context.global_values[props[1]]
+
             return GlobalKVStore.objects.get(name=props[1]).value
         except GlobalKVStore.DoesNotExist:
             DebugLog.error(
@@ -344,12 +448,20 @@ def get_db_value(
     try:
         # looking up custom field directly on this instance
         if len(props) == 2:
-            field = CustomField.objects.get(model=props[0], name=props[1])
+            if context and context.has_custom_field(props[0], props[1]):
+                if (props[0], props[1]) not in context.custom_fields:
+                    raise CustomField.DoesNotExist
+
+                field = context.custom_fields[(props[0], props[1])]
+            else:
+                field = CustomField.objects.get(model=props[0], name=props[1])
             model_fields = getattr(field, f"{props[0]}_fields")
 
             try:
                 # resolve the correct model id
-                if props[0] != instance.__class__.__name__.lower():
+                if context and context.has_custom_field_value(field, instance):
+                    value = context.get_custom_field_value(field, instance)
+                elif props[0] != instance.__class__.__name__.lower():
                     value = model_fields.get(
                         **{props[0]: getattr(instance, props[0])}
                     ).value
@@ -393,10 +505,14 @@ def get_db_value(
 
 
 def replace_arg_db_values(
-    string: str, instance=None, shell: str = None, quotes=True  # type: ignore
+    string: str,
+    instance=None,
+    shell: str = None,  # type: ignore
+    quotes=True,
+    context: Optional[DBValueContext] = None,
 ) -> Union[str, None]:
     # resolve the value
-    value = get_db_value(string=string, instance=instance)
+    value = get_db_value(string=string, instance=instance, context=context)
 
     # check for model and property
     if value is None:
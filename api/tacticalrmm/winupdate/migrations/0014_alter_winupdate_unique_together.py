@@ -0,0 +1,26 @@
+# Generated by Django 4.2.30 on 2026-10-18 21:19
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("agents", "0062_agent_default_shell_agent_default_shell_custom"),
+        ("winupdate", "0013_alter_winupdate_id"),
+    ]
+
+    operations = [
+        # keep the newest row of duplicated updates, older scans created them
+        migrations.RunSQL(
+            sql=(
+                "DELETE FROM winupdate_winupdate a USING winupdate_winupdate b "
+                "WHERE a.agent_id = b.agent_id AND a.guid = b.guid AND a.id < b.id"
+            ),
+            reverse_sql=migrations.RunSQL.noop,
+        ),
+        migrations.AlterUniqueTogether(
+            name="winupdate",
+            unique_together={("agent", "guid")},
+        ),
+    ]
@@ -82,6 +82,9 @@ class WinUpdate(models.Model):
     result = models.CharField(max_length=255, default="n/a")
     date_installed = models.DateTimeField(null=True, blank=True)
 
+    class Meta:
+        unique_together = (("agent", "guid"),)
+
     def __str__(self):
         return f"{self.agent.hostname} {self.kb}"
 
@@ -141,6 +144,23 @@ class WinUpdatePolicy(BaseAuditModel):
     reprocess_failed_times = models.PositiveIntegerField(default=5)
     email_if_fail = models.BooleanField(default=False)
 
+    def save(self, *args, **kwargs):
+        super().save(*args, **kwargs)
+        self._invalidate_patch_windows()
+
+    def delete(self, *args, **kwargs):
+        super().delete(*args, **kwargs)
+        self._invalidate_patch_windows()
+
+    def _invalidate_patch_windows(self) -> None:
+        from .utils import invalidate_patch_windows
+
+        # a policy's patch policy can apply to any agent
+        if self.policy_id:
+            invalidate_patch_windows()
+        elif self.agent_id:
+            invalidate_patch_windows(Agent.objects.filter(pk=self.agent_id))
+
     def __str__(self):
         if self.agent:
             return self.agent.hostname
@@ -1,35 +1,71 @@
 import asyncio
 import datetime as dt
-import time
-from contextlib import suppress
+from typing import Any, Optional
 from zoneinfo import ZoneInfo
 
 from django.conf import settings
+from django.db.models import Q
 from django.utils import timezone as djangotime
 from packaging import version as pyver
 
 from agents.models import Agent
 from logs.models import DebugLog
 from tacticalrmm.celery import app
-from tacticalrmm.constants import AGENT_STATUS_ONLINE, DebugLogType
+from tacticalrmm.constants import (
+    AGENT_STATUS_ONLINE,
+    ONLINE_AGENTS,
+    WINUPDATE_FANOUT_BURST,
+    WINUPDATE_FANOUT_RATE,
+    AgentPlat,
+    DebugLogType,
+)
+from tacticalrmm.logger import logger
+from tacticalrmm.nats_utils import BULK_NATS_TASKS, fanout_nats_command
+from tacticalrmm.scheduler import get_next_patch_window
+
+from .utils import (
+    bulk_approve_updates,
+    bulk_delete_superseded_updates,
+    get_approved_update_guids,
+    get_patch_policies,
+)
+
+
+def fanout_winupdate_command(items: BULK_NATS_TASKS) -> dict[str, Any]:
+    return fanout_nats_command(
+        items=items, rate=WINUPDATE_FANOUT_RATE, burst=WINUPDATE_FANOUT_BURST
+    )
+
+
+def get_winupdate_agents(pks: Optional[list[int]] = None) -> list[Agent]:
+    agents = Agent.objects.only(
+        "pk",
+        "agent_id",
+        "version",
+        "last_seen",
+        "overdue_time",
+        "offline_time",
+        "site_id",
+        "policy_id",
+        "monitoring_type",
+        "block_policy_inheritance",
+    )
+    if pks is not None:
+        agents = agents.filter(pk__in=pks)
+
+    return list(agents)
 
 
 @app.task
-def auto_approve_updates_task() -> None:
+def auto_approve_updates_task() -> Optional[dict[str, Any]]:
     # scheduled task that checks and approves updates daily
 
     if getattr(settings, "TRMM_DISABLE_APPROVE_UPDATES_TASK", False):
-        return
+        return None
 
-    agents = Agent.objects.only(
-        "pk", "agent_id", "version", "last_seen", "overdue_time", "offline_time"
-    )
-    for agent in agents:
-        agent.delete_superseded_updates()
-        try:
-            agent.approve_updates()
-        except:
-            continue
+    agents = get_winupdate_agents()
+    bulk_delete_superseded_updates(agent.pk for agent in agents)
+    approved = bulk_approve_updates(agents)
 
     online = [
         i
@@ -38,11 +74,12 @@ def auto_approve_updates_task() -> None:
         and pyver.parse(i.version) >= pyver.parse("1.3.0")
     ]
 
-    chunks = (online[i : i + 40] for i in range(0, len(online), 40))
-    for chunk in chunks:
-        for agent in chunk:
-            asyncio.run(agent.nats_cmd({"func": "getwinupdates"}, wait=False))
-        time.sleep(1)
+    stats = fanout_winupdate_command(
+        [(agent.agent_id, {"func": "getwinupdates"}) for agent in online]
+    )
+    stats["approved"] = approved
+    logger.debug(f"auto_approve_updates_task: {stats}")
+    return stats
 
 
 @app.task
@@ -51,103 +88,117 @@ def check_agent_update_schedule_task() -> None:
     if getattr(settings, "TRMM_DISABLE_WINUPDATES_INSTALL_TASK", False):
         return
     # scheduled task that installs updates on agents if enabled
-    for agent in Agent.online_agents(min_version="1.3.0"):
-        if agent.is_posix:
+    now = djangotime.now()
+
+    # only agents whose patch window is open or was missed, and agents whose
+    # window was cleared by a patch policy, assignment or timezone change
+    agents = (
+        Agent.objects.exclude(plat__in=[AgentPlat.LINUX, AgentPlat.DARWIN])
+        .filter(Q(next_patch_window__lte=now) | Q(next_patch_window__isnull=True))
+        .only(
+            *ONLINE_AGENTS,
+            "hostname",
+            "time_zone",
+            "patches_last_installed",
+            "next_patch_window",
+            "site_id",
+            "policy_id",
+            "monitoring_type",
+            "block_policy_inheritance",
+        )
+    )
+    agents = list(agents)
+    if not agents:
+        return
+
+    patch_policies = get_patch_policies(agents)
+
+    for agent in agents:
+        patch_policy = patch_policies[agent.pk]
+        if (
+            agent.next_patch_window is None
+            or agent.next_patch_window + dt.timedelta(hours=1) <= now
+        ):
+            agent.next_patch_window = get_next_patch_window(patch_policy, agent, now)
+
+        if agent.next_patch_window > now:
+            continue
+
+        # the window is open, the next check is at the following one
+        window_end = agent.next_patch_window + dt.timedelta(hours=1)
+        agent.next_patch_window = get_next_patch_window(patch_policy, agent, window_end)
+
+        if agent.status != AGENT_STATUS_ONLINE or pyver.parse(
+            agent.version
+        ) < pyver.parse("1.3.0"):
             continue
 
         agent.delete_superseded_updates()
-        install = False
         updates_to_install = agent.get_approved_update_guids()
 
         # check if agent has approved update to install
-        if updates_to_install:
-
-            patch_policy = agent.get_patch_policy()
+        if not updates_to_install:
+            continue
 
-            # get current time in agent local time
+        if agent.patches_last_installed:
+            # get agent last installed time in local time zone
             timezone = ZoneInfo(agent.timezone)
-            agent_localtime_now = dt.datetime.now(timezone)
-            weekday = agent_localtime_now.weekday()
-            hour = agent_localtime_now.hour
-            day = agent_localtime_now.day
-
-            if agent.patches_last_installed:
-                # get agent last installed time in local time zone
-                last_installed = agent.patches_last_installed.astimezone(timezone)
-
-                # check if patches were already run for this cycle and exit if so
-                if last_installed.strftime("%d/%m/%Y") == agent_localtime_now.strftime(
-                    "%d/%m/%Y"
-                ):
-                    continue
-
-            # check if schedule is set to daily/weekly and if now is the time to run
-            if (
-                patch_policy.run_time_frequency == "daily"
-                and weekday in patch_policy.run_time_days
-                and patch_policy.run_time_hour == hour
-            ):
-                install = True
-
-            elif patch_policy.run_time_frequency == "monthly":
-                if patch_policy.run_time_day > 28:
-                    months_with_30_days = [3, 6, 9, 11]
-                    current_month = agent_localtime_now.month
-                    if current_month == 2:
-                        patch_policy.run_time_day = 28
-                    elif current_month in months_with_30_days:
-                        patch_policy.run_time_day = 30
-
-                # check if patches were scheduled to run today and now
-                if (
-                    day == patch_policy.run_time_day
-                    and patch_policy.run_time_hour == hour
-                ):
-                    install = True
-
-            if install:
-                # initiate update on agent asynchronously and don't worry about ret code
-                DebugLog.info(
-                    agent=agent,
-                    log_type=DebugLogType.WIN_UPDATES,
-                    message=f"Installing windows updates on {agent.hostname}",
-                )
-                nats_data = {
-                    "func": "installwinupdates",
-                    "guids": updates_to_install,
-                }
-                asyncio.run(agent.nats_cmd(nats_data, wait=False))
-                agent.patches_last_installed = djangotime.now()
-                agent.save(update_fields=["patches_last_installed"])
+            last_installed = agent.patches_last_installed.astimezone(timezone)
 
+            # check if patches were already run for this cycle and exit if so
+            if last_installed.date() == now.astimezone(timezone).date():
+                continue
 
-@app.task
-def bulk_install_updates_task(pks: list[int]) -> None:
-    q = Agent.objects.filter(pk__in=pks)
-    agents = [i for i in q if pyver.parse(i.version) >= pyver.parse("1.3.0")]
-    chunks = (agents[i : i + 40] for i in range(0, len(agents), 40))
-    for chunk in chunks:
-        for agent in chunk:
-            agent.delete_superseded_updates()
+        # initiate update on agent asynchronously and don't worry about ret code
+        DebugLog.info(
+            agent=agent,
+            log_type=DebugLogType.WIN_UPDATES,
+            message=f"Installing windows updates on {agent.hostname}",
+        )
+        nats_data = {
+            "func": "installwinupdates",
+            "guids": updates_to_install,
+        }
+        asyncio.run(agent.nats_cmd(nats_data, wait=False))
+        agent.patches_last_installed = djangotime.now()
+        agent.save(update_fields=["patches_last_installed"])
+
+    Agent.objects.bulk_update(agents, fields=["next_patch_window"], batch_size=500)
 
-            with suppress(Exception):
-                agent.approve_updates()
 
-            nats_data = {
-                "func": "installwinupdates",
-                "guids": agent.get_approved_update_guids(),
-            }
-            asyncio.run(agent.nats_cmd(nats_data, wait=False))
-        time.sleep(1)
+@app.task
+def bulk_install_updates_task(pks: list[int]) -> dict[str, Any]:
+    agents = [
+        i
+        for i in get_winupdate_agents(pks)
+        if pyver.parse(i.version) >= pyver.parse("1.3.0")
+    ]
+    bulk_delete_superseded_updates(agent.pk for agent in agents)
+    approved = bulk_approve_updates(agents)
+
+    guids = get_approved_update_guids(agent.pk for agent in agents)
+    stats = fanout_winupdate_command(
+        [
+            (agent.agent_id, {"func": "installwinupdates", "guids": guids[agent.pk]})
+            for agent in agents
+        ]
+    )
+    stats["approved"] = approved
+    logger.debug(f"bulk_install_updates_task: {stats}")
+    return stats
 
 
 @app.task
-def bulk_check_for_updates_task(pks: list[int]) -> None:
-    q = Agent.objects.filter(pk__in=pks)
-    agents = [i for i in q if pyver.parse(i.version) >= pyver.parse("1.3.0")]
-    chunks = (agents[i : i + 40] for i in range(0, len(agents), 40))
-    for chunk in chunks:
-        for agent in chunk:
-            agent.delete_superseded_updates()
-            asyncio.run(agent.nats_cmd({"func": "getwinupdates"}, wait=False))
-        time.sleep(1)
+def bulk_check_for_updates_task(pks: list[int]) -> dict[str, Any]:
+    agents = [
+        i
+        for i in get_winupdate_agents(pks)
+        if pyver.parse(i.version) >= pyver.parse("1.3.0")
+    ]
+    bulk_delete_superseded_updates(agent.pk for agent in agents)
+
+    stats = fanout_winupdate_command(
+        [(agent.agent_id, {"func": "getwinupdates"}) for agent in agents]
+    )
+    logger.debug(f"bulk_check_for_updates_task: {stats}")
+    return stats
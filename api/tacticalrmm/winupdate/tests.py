@@ -1,11 +1,16 @@
-# from itertools import cycle
+import datetime as dt
+from itertools import cycle
 from unittest.mock import patch
+from zoneinfo import ZoneInfo
 
+import time_machine
+from django.utils import timezone as djangotime
 from model_bakery import baker
 
+from tacticalrmm.scheduler import NEVER, get_next_patch_window
 from tacticalrmm.test import TacticalTestCase
 
-from .models import WinUpdate
+from .models import WinUpdate, WinUpdatePolicy
 from .serializers import WinUpdateSerializer
 
 base_url = "/winupdate"
@@ -161,34 +166,178 @@ class WinupdateTasks(TacticalTestCase):
         )
         self.offline_agent = baker.make_recipe("agents.agent", site=site)
 
-    # @patch("agents.models.Agent.nats_cmd")
-    # @patch("time.sleep")
-    # def test_auto_approve_task(self, mock_sleep, nats_cmd):
-    #     from .tasks import auto_approve_updates_task
-
-    #     # Setup data
-    #     baker.make_recipe(
-    #         "winupdate.winupdate",
-    #         agent=cycle(
-    #             [self.online_agents[0], self.online_agents[1], self.offline_agent]
-    #         ),
-    #         _quantity=20,
-    #     )
-    #     baker.make_recipe(
-    #         "winupdate.winupdate_approve",
-    #         agent=cycle(
-    #             [self.online_agents[0], self.online_agents[1], self.offline_agent]
-    #         ),
-    #         _quantity=3,
-    #     )
-
-    #     # run task synchronously
-    #     auto_approve_updates_task()
-
-    #     # make sure the check_for_updates_task was run once for each online agent
-    #     self.assertEqual(nats_cmd.call_count, 2)
-
-    #     # check if all of the created updates were approved
-    #     winupdates = WinUpdate.objects.all()
-    #     for update in winupdates:
-    #         self.assertEqual(update.action, "approve")
+    @patch("winupdate.tasks.fanout_nats_command")
+    def test_auto_approve_task(self, fanout_nats_command):
+        from .tasks import auto_approve_updates_task
+
+        fanout_nats_command.return_value = {"total": 2, "sent": 2, "failed": 0}
+        agents = [*self.online_agents, self.offline_agent]
+        baker.make_recipe("winupdate.winupdate_approve", agent=agents[0])
+        baker.make_recipe(
+            "winupdate.winupdate_policy", agent=agents[1], critical="approve"
+        )
+        baker.make_recipe("winupdate.winupdate", agent=cycle(agents), _quantity=15)
+        # superseded by the second one
+        for version in ("1.2.3.0", "1.2.10.0"):
+            baker.make(
+                "winupdate.WinUpdate",
+                agent=agents[2],
+                kb="KB2267602",
+                title=f"Defender Antivirus (Version {version})",
+            )
+
+        stats = auto_approve_updates_task()
+
+        self.assertEqual(stats["approved"], 5 + 1)
+        self.assertEqual(
+            WinUpdate.objects.filter(agent=agents[0], action="approve").count(), 5
+        )
+        self.assertEqual(
+            list(
+                WinUpdate.objects.filter(agent=agents[1], action="approve").values_list(
+                    "severity", flat=True
+                )
+            ),
+            ["Critical"],
+        )
+        self.assertEqual(
+            list(
+                WinUpdate.objects.filter(kb="KB2267602").values_list("title", flat=True)
+            ),
+            ["Defender Antivirus (Version 1.2.10.0)"],
+        )
+
+        # scan requested from online agents only
+        fanout_nats_command.assert_called_once()
+        items = fanout_nats_command.call_args.kwargs["items"]
+        self.assertEqual(
+            {item[0] for item in items},
+            {agent.agent_id for agent in self.online_agents},
+        )
+
+    @patch("winupdate.tasks.fanout_nats_command")
+    def test_bulk_install_updates_task(self, fanout_nats_command):
+        from .tasks import bulk_install_updates_task
+
+        fanout_nats_command.return_value = {"total": 2, "sent": 2, "failed": 0}
+        agent = self.online_agents[0]
+        baker.make_recipe("winupdate.winupdate_approve", agent=agent)
+        updates = baker.make_recipe("winupdate.winupdate", agent=agent, _quantity=5)
+        baker.make_recipe(
+            "winupdate.winupdate", agent=agent, installed=True, severity="Critical"
+        )
+
+        stats = bulk_install_updates_task([a.pk for a in self.online_agents])
+        self.assertEqual(stats["approved"], 5)
+
+        items = dict(fanout_nats_command.call_args.kwargs["items"])
+        self.assertEqual(set(items[agent.agent_id]["guids"]), {u.guid for u in updates})
+        self.assertEqual(items[self.online_agents[1].agent_id]["guids"], [])
+
+
+class TestPatchWindows(TacticalTestCase):
+    def setUp(self):
+        self.setup_coresettings()
+        self.la = ZoneInfo("America/Los_Angeles")
+
+    def test_get_next_patch_window(self):
+        agent = baker.prepare("agents.Agent", time_zone="America/Los_Angeles")
+        # mondays and wednesdays at 3am
+        daily = WinUpdatePolicy(
+            run_time_frequency="daily", run_time_hour=3, run_time_days=[0, 2]
+        )
+        after = dt.datetime(2025, 3, 11, 10, tzinfo=self.la)  # tuesday
+        self.assertEqual(
+            get_next_patch_window(daily, agent, after),
+            dt.datetime(2025, 3, 12, 3, tzinfo=self.la),
+        )
+        # the window that is still open is returned
+        after = dt.datetime(2025, 3, 12, 3, 59, tzinfo=self.la)
+        self.assertEqual(
+            get_next_patch_window(daily, agent, after),
+            dt.datetime(2025, 3, 12, 3, tzinfo=self.la),
+        )
+
+        # 2am doesn't exist on sunday march 9th 2025
+        daily = WinUpdatePolicy(
+            run_time_frequency="daily", run_time_hour=2, run_time_days=[6]
+        )
+        after = dt.datetime(2025, 3, 8, tzinfo=self.la)
+        self.assertEqual(
+            get_next_patch_window(daily, agent, after),
+            dt.datetime(2025, 3, 16, 2, tzinfo=self.la),
+        )
+
+        monthly = WinUpdatePolicy(
+            run_time_frequency="monthly", run_time_hour=22, run_time_day=31
+        )
+        after = dt.datetime(2025, 6, 1, tzinfo=self.la)
+        self.assertEqual(
+            get_next_patch_window(monthly, agent, after),
+            dt.datetime(2025, 6, 30, 22, tzinfo=self.la),
+        )
+
+        inherit = WinUpdatePolicy(run_time_frequency="inherit")
+        self.assertEqual(get_next_patch_window(inherit, agent, after), NEVER)
+
+    @patch("agents.models.Agent.nats_cmd")
+    def test_check_agent_update_schedule_task(self, nats_cmd):
+        from .tasks import check_agent_update_schedule_task
+
+        wednesday = dt.datetime(2025, 3, 12, 3, 5, tzinfo=self.la)
+        with time_machine.travel(wednesday, tick=False):
+            online = baker.make_recipe(
+                "agents.agent",
+                last_seen=djangotime.now(),
+                time_zone="America/Los_Angeles",
+            )
+            offline = baker.make_recipe(
+                "agents.agent",
+                last_seen=djangotime.now() - dt.timedelta(days=1),
+                time_zone="America/Los_Angeles",
+            )
+            for agent in (online, offline):
+                baker.make(
+                    "winupdate.WinUpdatePolicy",
+                    agent=agent,
+                    run_time_frequency="daily",
+                    run_time_hour=3,
+                    run_time_days=[2],
+                )
+                baker.make_recipe("winupdate.approved_winupdate", agent=agent)
+
+            check_agent_update_schedule_task()
+
+            nats_cmd.assert_called_once()
+            next_window = dt.datetime(2025, 3, 19, 3, tzinfo=self.la)
+            online.refresh_from_db()
+            offline.refresh_from_db()
+            self.assertEqual(online.patches_last_installed, djangotime.now())
+            self.assertEqual(online.next_patch_window, next_window)
+            self.assertEqual(offline.next_patch_window, next_window)
+
+            # nothing is due until next week
+            with self.assertNumQueries(1):
+                check_agent_update_schedule_task()
+            nats_cmd.assert_called_once()
+
+        # changing the patch policy clears the window
+        patch_policy = online.winupdatepolicy.get()
+        patch_policy.run_time_hour = 4
+        patch_policy.save()
+        online.refresh_from_db()
+        offline.refresh_from_db()
+        self.assertIsNone(online.next_patch_window)
+        self.assertEqual(offline.next_patch_window, next_window)
+
+        with time_machine.travel(wednesday + dt.timedelta(hours=1), tick=False):
+            online.last_seen = djangotime.now()
+            online.save(update_fields=["last_seen"])
+            check_agent_update_schedule_task()
+
+        # already patched today
+        nats_cmd.assert_called_once()
+        online.refresh_from_db()
+        self.assertEqual(
+            online.next_patch_window, dt.datetime(2025, 3, 19, 4, tzinfo=self.la)
+        )
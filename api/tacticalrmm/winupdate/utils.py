@@ -0,0 +1,221 @@
+import copy
+import re
+from collections import defaultdict
+from typing import TYPE_CHECKING, Iterable, Optional
+
+from django.db.models import Count
+from packaging.version import Version as LooseVersion
+
+from automation.models import Policy
+
+from .models import WinUpdate, WinUpdatePolicy
+
+if TYPE_CHECKING:
+    from django.db.models import QuerySet
+
+    from agents.models import Agent
+
+# patch policy field -> severity reported by windows update
+APPROVAL_SEVERITIES = {
+    "critical": "Critical",
+    "important": "Important",
+    "moderate": "Moderate",
+    "low": "Low",
+    "other": "",
+}
+
+SUPERSEDED_VERSION_PATTERN = r"\((Version|Versão)(.*?)\)"
+
+
+def get_superseded_update_pks(updates: list[tuple[int, Optional[str]]]) -> list[int]:
+    """
+    Takes the (pk, title) of an agent's updates sharing a kb, ordered by pk,
+    and returns the pks of all but the latest version.
+    """
+    if len(updates) < 2:
+        return []
+
+    # extract the version from the title and sort from oldest to newest
+    # skip if no version info is available therefore nothing to parse
+    try:
+        vers = [
+            re.search(SUPERSEDED_VERSION_PATTERN, title, flags=re.IGNORECASE)
+            .group(2)
+            .strip()
+            for _, title in updates
+        ]
+        sorted_vers = sorted(vers, key=LooseVersion)
+    except:
+        return []
+
+    return [
+        next(pk for pk, title in updates if ver in title) for ver in sorted_vers[:-1]
+    ]
+
+
+def bulk_delete_superseded_updates(agent_pks: Iterable[int]) -> int:
+    agent_pks = list(agent_pks)
+    dupes = (
+        WinUpdate.objects.filter(agent_id__in=agent_pks, kb__isnull=False)
+        .values("agent_id", "kb")
+        .annotate(count=Count("id"))
+        .filter(count__gt=1)
+    )
+    dupe_keys = {(dupe["agent_id"], dupe["kb"]) for dupe in dupes}
+    if not dupe_keys:
+        return 0
+
+    grouped = defaultdict(list)
+    for pk, agent_id, kb, title in (
+        WinUpdate.objects.filter(
+            agent_id__in={agent_id for agent_id, _ in dupe_keys},
+            kb__in={kb for _, kb in dupe_keys},
+        )
+        .order_by("pk")
+        .values_list("pk", "agent_id", "kb", "title")
+    ):
+        if (agent_id, kb) in dupe_keys:
+            grouped[(agent_id, kb)].append((pk, title))
+
+    pks = {
+        pk for updates in grouped.values() for pk in get_superseded_update_pks(updates)
+    }
+    if not pks:
+        return 0
+
+    deleted, _ = WinUpdate.objects.filter(pk__in=pks).delete()
+    return deleted
+
+
+def merge_patch_policy(
+    agent_policy: WinUpdatePolicy, patch_policy: Optional[WinUpdatePolicy]
+) -> WinUpdatePolicy:
+    """
+    Returns the policy's patch policy with the agent's overrides applied, or
+    the agent's patch policy if no policy applied to the agent has one.
+    """
+    # if policy doesn't exist return the agent patch policy
+    if not patch_policy:
+        return agent_policy
+
+    patch_policy = copy.copy(patch_policy)
+
+    # patch policy exists. check if any agent settings are set to override patch policy
+    for field in APPROVAL_SEVERITIES:
+        if getattr(agent_policy, field) != "inherit":
+            setattr(patch_policy, field, getattr(agent_policy, field))
+
+    if agent_policy.run_time_frequency != "inherit":
+        patch_policy.run_time_frequency = agent_policy.run_time_frequency
+        patch_policy.run_time_hour = agent_policy.run_time_hour
+        patch_policy.run_time_days = agent_policy.run_time_days
+
+    if agent_policy.reboot_after_install != "inherit":
+        patch_policy.reboot_after_install = agent_policy.reboot_after_install
+
+    if not agent_policy.reprocess_failed_inherit:
+        patch_policy.reprocess_failed = agent_policy.reprocess_failed
+        patch_policy.reprocess_failed_times = agent_policy.reprocess_failed_times
+        patch_policy.email_if_fail = agent_policy.email_if_fail
+
+    return patch_policy
+
+
+def get_patch_policies(agents: "Iterable[Agent]") -> dict[int, WinUpdatePolicy]:
+    """
+    Effective patch policy of every agent, resolved like
+    Agent.get_patch_policy() with a fixed number of queries.
+    """
+    agents = list(agents)
+    agent_policies: dict[int, WinUpdatePolicy] = {}
+    for patch_policy in WinUpdatePolicy.objects.filter(
+        agent_id__in=[agent.pk for agent in agents]
+    ).order_by("-pk"):
+        # the first one wins like winupdatepolicy.first()
+        agent_policies[patch_policy.agent_id] = patch_policy
+
+    missing = [
+        WinUpdatePolicy(agent=agent)
+        for agent in agents
+        if agent.pk not in agent_policies
+    ]
+    for patch_policy in WinUpdatePolicy.objects.bulk_create(missing):
+        agent_policies[patch_policy.agent_id] = patch_policy
+
+    active = set(Policy.objects.filter(active=True).values_list("pk", flat=True))
+    policy_patch_policies: dict[int, WinUpdatePolicy] = {}
+    for patch_policy in WinUpdatePolicy.objects.filter(policy_id__in=active).order_by(
+        "-pk"
+    ):
+        policy_patch_policies[patch_policy.policy_id] = patch_policy
+
+    patch_policies = {}
+    for agent in agents:
+        policy_patch_policy = next(
+            (
+                policy_patch_policies[pk]
+                for pk in agent.get_agent_policy_ids().values()
+                if pk in policy_patch_policies
+            ),
+            None,
+        )
+        patch_policies[agent.pk] = merge_patch_policy(
+            agent_policies[agent.pk], policy_patch_policy
+        )
+
+    return patch_policies
+
+
+def get_approval_severities(patch_policy: WinUpdatePolicy) -> tuple[str, ...]:
+    return tuple(
+        severity
+        for field, severity in APPROVAL_SEVERITIES.items()
+        if getattr(patch_policy, field) == "approve"
+    )
+
+
+def bulk_approve_updates(agents: "Iterable[Agent]") -> int:
+    """
+    Approves the updates of every agent according to its patch policy with
+    one update query per distinct set of approved severities.
+    """
+    by_severities = defaultdict(list)
+    for agent_pk, patch_policy in get_patch_policies(agents).items():
+        severities = get_approval_severities(patch_policy)
+        if severities:
+            by_severities[severities].append(agent_pk)
+
+    approved = 0
+    for severities, agent_pks in by_severities.items():
+        approved += (
+            WinUpdate.objects.filter(
+                agent_id__in=agent_pks, severity__in=severities, installed=False
+            )
+            .exclude(action="approve")
+            .update(action="approve")
+        )
+
+    return approved
+
+
+def invalidate_patch_windows(agents: "Optional[QuerySet[Agent]]" = None) -> None:
+    """
+    Clears the stored next patch window of the agents, all of them by
+    default, so check_agent_update_schedule_task recomputes it.
+    """
+    from agents.models import Agent
+
+    if agents is None:
+        agents = Agent.objects.all()
+
+    agents.update(next_patch_window=None)
+
+
+def get_approved_update_guids(agent_pks: Iterable[int]) -> dict[int, list[str]]:
+    guids = defaultdict(list)
+    for agent_id, guid in WinUpdate.objects.filter(
+        agent_id__in=list(agent_pks), action="approve", installed=False
+    ).values_list("agent_id", "guid"):
+        guids[agent_id].append(guid)
+
+    return guids